@@ -1,25 +1,129 @@
+import logging
+import os
 from flask import Flask
 from flask_login import LoginManager
 from extensions import db  # lấy db từ extensions.py
-from models import User  # import các model sau khi db được khởi tạo
+from database import configure_database
+from models import Student  # import các model sau khi db được khởi tạo
+from utils import get_vietnam_time
+import user_cache
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key'  # bạn có thể lấy từ biến môi trường nếu cần
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///lophanhphuc.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
+# Các module này đăng ký event listener của SQLAlchemy khi được import:
+# bảng thống kê cập nhật cùng giao dịch điểm danh, và luồng sự kiện SSE.
+# live chỉ được import vì tác dụng phụ này (kể cả khi không gọi create_app)
+import stats
+import live  # noqa: F401
 
 # Thiết lập Flask-Login
 login_manager = LoginManager()
-login_manager.login_view = 'login'
-login_manager.init_app(app)
+login_manager.login_view = 'auth.login'
 
+# Người dùng (kèm giáo viên) được cache ngắn hạn, xem user_cache.py
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load_user(int(user_id))
+
+
+def create_app(config=None):
+    """
+    Tạo và cấu hình ứng dụng Flask.
+
+    Args:
+        config (dict): Cấu hình ghi đè, ví dụ SQLALCHEMY_DATABASE_URI
+
+    Returns:
+        Flask: Ứng dụng đã đăng ký blueprint và lệnh CLI, cơ sở dữ liệu đã migrate
+
+    Worker đồng bộ Google Sheets chỉ chạy khi SHEET_SYNC_WORKER=1 (mặc định).
+    Với gunicorn --preload, gunicorn.conf.py tắt nó trong tiến trình master
+    và khởi động nó trong từng worker sau khi fork.
+    """
+    config = config or {}
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your_secret_key'  # bạn có thể lấy từ biến môi trường nếu cần
+    # Cơ sở dữ liệu lấy từ DATABASE_URL (mặc định SQLite); pool và PRAGMA xem database.py
+    configure_database(app, config.get('SQLALCHEMY_DATABASE_URI'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Import route trong factory để import app.py vẫn nhẹ và không vòng lặp
+    from auth import auth_bp
+    from attendance import attendance_bp
+    from reports import reports_bp
+    from payroll import payroll_bp
+    from export import export_bp
+    from ingest import ingest_bp
+    # Đo số truy vấn, thời gian SQL và độ trễ theo route (/admin/metrics)
+    from metrics import metrics_bp
+    # Bảng điều khiển admin nhận thay đổi điểm danh trực tiếp qua SSE
+    from live import live_bp
+    # Ảnh học sinh: thumbnail, WebP và tên file theo nội dung (xem photos.py)
+    from photos import photos_bp
+    # File tĩnh có mã băm trong tên và bản nén sẵn; nén HTML/JSON theo Accept-Encoding
+    from assets import assets_bp, asset_url
+
+    for blueprint in (auth_bp, attendance_bp, reports_bp, payroll_bp, export_bp, ingest_bp,
+                      metrics_bp, live_bp, photos_bp, assets_bp):
+        app.register_blueprint(blueprint)
+    app.add_template_global(asset_url)
+
+    @app.context_processor
+    def inject_current_datetime():
+        return {'current_datetime': get_vietnam_time()}
+
+    register_commands(app)
+
+    # Tạo bảng còn thiếu và áp dụng các migration chưa chạy
+    import migrations
+    with app.app_context():
+        migrations.run_migrations()
+
+    # Worker nền gửi hàng đợi điểm danh lên Google Sheets
+    if os.environ.get('SHEET_SYNC_WORKER', '1') == '1':
+        import sheet_sync
+        sheet_sync.start_worker(app)
+
+    return app
+
+
+def register_commands(app):
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Áp dụng các migration cơ sở dữ liệu còn thiếu."""
+        import migrations
+        applied = migrations.run_migrations()
+        print(f"Đã áp dụng migration: {applied}" if applied else "Cơ sở dữ liệu đã cập nhật.")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Tính lại bảng thống kê giáo viên/tháng và học sinh/ngày."""
+        with db.engine.begin() as conn:
+            teacher_rows, student_rows = stats.rebuild_stats(conn)
+        print(f"Đã tính lại {teacher_rows} dòng giáo viên/tháng, {student_rows} dòng học sinh/ngày.")
+
+    @app.cli.command('backfill-photos')
+    def backfill_photos_command():
+        """Tạo thumbnail và bản WebP cho ảnh học sinh đã tải lên trước đây."""
+        import photos
+        processed, missing, failed = photos.backfill(Student.query.all(), app.static_folder)
+        db.session.commit()
+        print(f"Đã xử lý {processed} ảnh, {missing} ảnh không tìm thấy, {failed} ảnh lỗi.")
+
+    @app.cli.command('build-face-index')
+    def build_face_index_command():
+        """Tính embedding khuôn mặt cho ảnh học sinh (chỉ ảnh mới hoặc đã đổi)."""
+        import faces
+        embedded, reused, skipped = faces.refresh_index(Student.query.filter(Student.active == True).all())
+        print(f"Đã tính {embedded} embedding, dùng lại {reused}, {skipped} ảnh không có khuôn mặt.")
 
-# Import route sau khi app và db được thiết lập
-import auth
-import attendance
-import reports
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Tạo bản có mã băm và bản nén gzip/brotli của các file trong static/."""
+        import assets
+        manifest = assets.build(app.static_folder)
+        print(f"Đã tạo {len(manifest)} file trong {os.path.join(app.static_folder, assets.DIST_DIR)}.")
@@ -0,0 +1,190 @@
+"""
+Fingerprinted, precompressed static assets and compression of dynamic
+responses (see README.md).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import threading
+import zlib
+
+from flask import Blueprint, request, send_from_directory, url_for, abort, current_app
+
+assets_bp = Blueprint('assets', __name__)
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Only text is worth compressing; images and fonts already are
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+# Dynamic responses compressed per request
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json'}
+# Below this size the compressed response is not meaningfully smaller
+MIN_COMPRESS_SIZE = 500
+GZIP_LEVEL = 6
+# Brotli levels above ~5 cost more CPU than they save bytes per request
+BROTLI_LEVEL = 4
+
+_manifest_lock = threading.Lock()
+_manifest = None  # (mtime, {source path: hashed path})
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _dist_root(static_folder):
+    return os.path.join(static_folder, DIST_DIR)
+
+
+def _hashed_name(path, digest):
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest[:HASH_LENGTH]}{ext}'
+
+
+def build(static_folder):
+    """
+    Fingerprint and precompress every file under static_folder.
+
+    Returns:
+        dict: The manifest, source path -> fingerprinted path
+    """
+    dist = _dist_root(static_folder)
+    brotli = _brotli()
+    manifest = {}
+
+    for directory, subdirectories, files in os.walk(static_folder):
+        # Never fingerprint the output of a previous build
+        if os.path.abspath(directory) == os.path.abspath(static_folder):
+            subdirectories[:] = [name for name in subdirectories if name != DIST_DIR]
+        for name in sorted(files):
+            source = os.path.join(directory, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            hashed = _hashed_name(relative, hashlib.sha256(data).hexdigest())
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                # mtime=0 keeps the .gz bytes identical across builds
+                with open(f'{target}.gz', 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(f'{target}.br', 'wb') as f:
+                        f.write(brotli.compress(data, quality=11))
+
+            manifest[relative] = hashed
+
+    with open(os.path.join(dist, f'{MANIFEST}.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(os.path.join(dist, f'{MANIFEST}.tmp'), os.path.join(dist, MANIFEST))
+    return manifest
+
+
+def _load_manifest(static_folder):
+    global _manifest
+    path = os.path.join(_dist_root(static_folder), MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _manifest_lock:
+        if _manifest is None or _manifest[0] != mtime:
+            with open(path) as f:
+                _manifest = (mtime, json.load(f))
+        return _manifest[1]
+
+
+def asset_url(filename):
+    """
+    URL of a static file, fingerprinted if `flask build-assets` has run
+    """
+    hashed = _load_manifest(current_app.static_folder).get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.asset', filename=hashed)
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    dist = _dist_root(current_app.static_folder)
+    if filename not in set(_load_manifest(current_app.static_folder).values()):
+        abort(404)
+
+    encoding = None
+    accepted = request.accept_encodings
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.exists(os.path.join(dist, filename + suffix)):
+            encoding = candidate
+            break
+
+    if encoding is None:
+        response = send_from_directory(dist, filename, max_age=IMMUTABLE_MAX_AGE)
+    else:
+        suffix = '.br' if encoding == 'br' else '.gz'
+        response = send_from_directory(dist, filename + suffix, max_age=IMMUTABLE_MAX_AGE)
+        # Served as the original file type, only encoded
+        response.content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response.headers['Content-Encoding'] = encoding
+
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if accepted['br'] and _brotli() is not None:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+@assets_bp.after_app_request
+def compress_response(response):
+    if (
+        request.method == 'HEAD'
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    if encoding == 'br':
+        compressed = _brotli().compress(data, quality=BROTLI_LEVEL)
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+        compressed = compressor.compress(data) + compressor.flush()
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # The encoded body differs byte for byte, so a strong ETag would be wrong
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
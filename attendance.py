@@ -3,16 +3,35 @@ from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 import calendar
 import pytz
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
 
-from app import db
+from extensions import db
+from database import is_unique_violation
 from models import Teacher, Student, TeacherAttendance, StudentAttendance
-from gsheet import add_attendance_to_sheet, delete_attendance_from_sheet
+from reports import month_range, shift_totals
+from conditional import conditional_get
+from schedule import get_schedule
+import sheet_sync
+import faces
 
 attendance_bp = Blueprint('attendance', __name__)
 vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
+
+def _unique_index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+# Only violations of these mean "already recorded"; any other integrity
+# error is a real failure and is raised
+TEACHER_ONCE_PER_SHIFT = _unique_index(TeacherAttendance, 'uq_teacher_attendance_teacher_date_shift')
+STUDENT_ONCE_PER_DAY = _unique_index(StudentAttendance, 'uq_student_attendance_student_date')
+
+
 @attendance_bp.route('/teacher/home')
 @login_required
+@conditional_get
 def teacher_home():
     if current_user.is_admin:
         return redirect(url_for('auth.admin_dashboard'))
@@ -34,69 +53,12 @@ def teacher_home():
         return redirect(url_for('auth.logout'))
     
     # Determine which shift buttons to show
-    show_morning = (
-        not is_sunday and
-        current_time >= datetime.strptime('06:00', '%H:%M').time() and 
-        current_time <= datetime.strptime('12:00', '%H:%M').time()
-    )
-    
-    show_afternoon = (
-        not is_sunday and
-        current_time >= datetime.strptime('12:00', '%H:%M').time() and 
-        current_time <= datetime.strptime('16:45', '%H:%M').time()
-    )
-    
-    show_1on1 = (
-        not is_sunday and
-        current_time >= datetime.strptime('16:45', '%H:%M').time() and 
-        current_time <= datetime.strptime('21:00', '%H:%M').time()
-    )
-    
-    # Check if teacher has already clocked in for any shift today
-    morning_attended = db.session.query(TeacherAttendance).filter_by(
-        teacher_id=teacher.id, 
-        date=today,
-        shift_type='morning'
-    ).first() is not None
-    
-    afternoon_attended = db.session.query(TeacherAttendance).filter_by(
-        teacher_id=teacher.id, 
-        date=today,
-        shift_type='afternoon'
-    ).first() is not None
-    
-    oneon1_1h_attended = db.session.query(TeacherAttendance).filter_by(
-        teacher_id=teacher.id, 
-        date=today,
-        shift_type='1on1_1h'
-    ).first() is not None
-    
-    oneon1_15h_attended = db.session.query(TeacherAttendance).filter_by(
-        teacher_id=teacher.id, 
-        date=today,
-        shift_type='1on1_1.5h'
-    ).first() is not None
+    schedule = get_schedule()
+    open_shifts = [] if is_sunday else schedule.open_shifts(current_time)
     
-    oneon1_2h_attended = db.session.query(TeacherAttendance).filter_by(
-        teacher_id=teacher.id, 
-        date=today,
-        shift_type='1on1_2h'
-    ).first() is not None
-    
-    # Get all active students with their attendance status for today
-    students_with_status = []
-    active_students = Student.query.filter_by(active=True).all()
-    
-    for student in active_students:
-        attendance = StudentAttendance.query.filter_by(
-            student_id=student.id, 
-            date=today
-        ).first()
-        
-        students_with_status.append({
-            'student': student,
-            'present': attendance is not None
-        })
+    show_morning = any(shift.code == 'morning' for shift in open_shifts)
+    show_afternoon = any(shift.code == 'afternoon' for shift in open_shifts)
+    show_1on1 = any(shift.one_on_one for shift in open_shifts)
     
     # Generate calendar data for the current month
     cal_year = now.year
@@ -105,11 +67,13 @@ def teacher_home():
     # Get the calendar for this month
     cal = calendar.monthcalendar(cal_year, cal_month)
     
-    # Get all teacher attendance records for this month
-    first_day = datetime(cal_year, cal_month, 1).date()
-    last_day = datetime(cal_year, cal_month, calendar.monthrange(cal_year, cal_month)[1]).date()
+    # Get all teacher attendance records for this month (today's included)
+    first_day, last_day = month_range(cal_year, cal_month)
     
-    attendance_records = TeacherAttendance.query.filter(
+    attendance_records = db.session.query(
+        TeacherAttendance.date,
+        TeacherAttendance.shift_type
+    ).filter(
         TeacherAttendance.teacher_id == teacher.id,
         TeacherAttendance.date >= first_day,
         TeacherAttendance.date <= last_day
@@ -117,56 +81,33 @@ def teacher_home():
     
     # Create a dict to easily look up attendance by date
     attendance_by_date = {}
+    shift_counts = {}
     for record in attendance_records:
         date_str = record.date.strftime('%Y-%m-%d')
         if date_str not in attendance_by_date:
             attendance_by_date[date_str] = []
         attendance_by_date[date_str].append(record.shift_type)
+        shift_counts[record.shift_type] = shift_counts.get(record.shift_type, 0) + 1
     
-    # Calculate summary statistics
-    total_morning = TeacherAttendance.query.filter(
-        TeacherAttendance.teacher_id == teacher.id,
-        TeacherAttendance.date >= first_day,
-        TeacherAttendance.date <= last_day,
-        TeacherAttendance.shift_type == 'morning'
-    ).count()
-    
-    total_afternoon = TeacherAttendance.query.filter(
-        TeacherAttendance.teacher_id == teacher.id,
-        TeacherAttendance.date >= first_day,
-        TeacherAttendance.date <= last_day,
-        TeacherAttendance.shift_type == 'afternoon'
-    ).count()
+    # Check if teacher has already clocked in for any shift today
+    attended_today = set(attendance_by_date.get(today.strftime('%Y-%m-%d'), []))
     
-    total_1on1_1h = TeacherAttendance.query.filter(
-        TeacherAttendance.teacher_id == teacher.id,
-        TeacherAttendance.date >= first_day,
-        TeacherAttendance.date <= last_day,
-        TeacherAttendance.shift_type == '1on1_1h'
-    ).count()
+    # Get all active students with their attendance status for today,
+    # LEFT JOINed so absent students come back with no attendance id
+    students_with_status = []
+    student_rows = db.session.query(Student, StudentAttendance.id).outerjoin(
+        StudentAttendance,
+        and_(StudentAttendance.student_id == Student.id, StudentAttendance.date == today)
+    ).filter(Student.active == True).order_by(Student.id).all()
     
-    total_1on1_15h = TeacherAttendance.query.filter(
-        TeacherAttendance.teacher_id == teacher.id,
-        TeacherAttendance.date >= first_day,
-        TeacherAttendance.date <= last_day,
-        TeacherAttendance.shift_type == '1on1_1.5h'
-    ).count()
+    for student, attendance_id in student_rows:
+        students_with_status.append({
+            'student': student,
+            'present': attendance_id is not None
+        })
     
-    total_1on1_2h = TeacherAttendance.query.filter(
-        TeacherAttendance.teacher_id == teacher.id,
-        TeacherAttendance.date >= first_day,
-        TeacherAttendance.date <= last_day,
-        TeacherAttendance.shift_type == '1on1_2h'
-    ).count()
-    
-    # Calculate total hours
-    total_hours = (
-        total_morning * 6 +  # 6 hours for morning shift
-        total_afternoon * 4.75 +  # 4.75 hours for afternoon shift
-        total_1on1_1h * 1 +  # 1 hour for 1on1_1h shift
-        total_1on1_15h * 1.5 +  # 1.5 hours for 1on1_1.5h shift
-        total_1on1_2h * 2  # 2 hours for 1on1_2h shift
-    )
+    # Calculate summary statistics from the records already loaded
+    stats = shift_totals(shift_counts)
     
     # Format the month name in Vietnamese
     month_names_vi = [
@@ -181,25 +122,68 @@ def teacher_home():
         show_morning=show_morning,
         show_afternoon=show_afternoon,
         show_1on1=show_1on1,
-        morning_attended=morning_attended,
-        afternoon_attended=afternoon_attended,
-        oneon1_1h_attended=oneon1_1h_attended,
-        oneon1_15h_attended=oneon1_15h_attended,
-        oneon1_2h_attended=oneon1_2h_attended,
+        shifts=schedule.by_code,
+        morning_attended='morning' in attended_today,
+        afternoon_attended='afternoon' in attended_today,
+        oneon1_1h_attended='1on1_1h' in attended_today,
+        oneon1_15h_attended='1on1_1.5h' in attended_today,
+        oneon1_2h_attended='1on1_2h' in attended_today,
         students=students_with_status,
         calendar=cal,
         today=today,
         attendance_by_date=attendance_by_date,
-        total_morning=total_morning,
-        total_afternoon=total_afternoon,
-        total_1on1=total_1on1_1h + total_1on1_15h + total_1on1_2h,
-        total_hours=total_hours,
+        total_morning=stats['morning'],
+        total_afternoon=stats['afternoon'],
+        total_1on1=stats['one_on_one'],
+        total_hours=stats['total_hours'],
         year=cal_year,
         month=cal_month,
         month_name=month_name,
-        is_sunday=is_sunday
+        is_sunday=is_sunday,
+        camera_enabled=faces.available()
     )
 
+def clock_in(teacher, shift, now, marked_by):
+    """
+    Record a teacher's attendance for a shift and queue the sheet append.
+    The caller commits and calls sheet_sync.notify().
+
+    Args:
+        teacher (Teacher): The teacher clocking in
+        shift (CompiledShift): The shift, from the schedule
+        now (datetime): Time of the clock-in, in Vietnam timezone
+        marked_by (User): The user recording it
+
+    Returns:
+        TeacherAttendance
+
+    Raises:
+        IntegrityError: The teacher already clocked in for this shift that day
+    """
+    attendance_record = TeacherAttendance(
+        teacher_id=teacher.id,
+        date=now.date(),
+        time=now.time(),
+        shift_type=shift.code,
+        shift_id=shift.id,
+        marked_by_id=marked_by.id
+    )
+    db.session.add(attendance_record)
+    db.session.flush()  # Get ID without committing
+    
+    # Queue the Google Sheet append; it is sent by the sync worker after commit
+    sheet_sync.enqueue_append(
+        attendance_record,
+        date=now.strftime('%Y-%m-%d'),
+        time=now.strftime('%H:%M'),
+        name=teacher.name,
+        status="Có mặt",
+        shift=shift.code,
+        marked_by=marked_by.name,
+        is_student=False
+    )
+    return attendance_record
+
 @attendance_bp.route('/teacher/clock-in', methods=['POST'])
 @login_required
 def teacher_clock_in():
@@ -209,7 +193,6 @@ def teacher_clock_in():
     
     # Get the current date and time in Vietnam timezone
     now = datetime.now(vietnam_tz)
-    today = now.date()
     current_time = now.time()
     
     # Check if today is Sunday
@@ -219,77 +202,32 @@ def teacher_clock_in():
     
     # Get the shift type from the form
     shift_type = request.form.get('shift_type')
-    valid_shift_types = ['morning', 'afternoon', '1on1_1h', '1on1_1.5h', '1on1_2h']
+    shift = get_schedule().get(shift_type)
     
-    if shift_type not in valid_shift_types:
+    if shift is None:
         flash('Loại ca không hợp lệ.', 'danger')
         return redirect(url_for('attendance.teacher_home'))
     
     # Validate if the current time is within the allowed range for the selected shift
-    if shift_type == 'morning' and (
-        current_time < datetime.strptime('06:00', '%H:%M').time() or 
-        current_time > datetime.strptime('12:00', '%H:%M').time()
-    ):
-        flash('Không thể chấm công ca sáng ngoài giờ quy định (06:00 - 12:00).', 'danger')
-        return redirect(url_for('attendance.teacher_home'))
-    
-    if shift_type == 'afternoon' and (
-        current_time < datetime.strptime('12:00', '%H:%M').time() or 
-        current_time > datetime.strptime('16:45', '%H:%M').time()
-    ):
-        flash('Không thể chấm công ca chiều ngoài giờ quy định (12:00 - 16:45).', 'danger')
-        return redirect(url_for('attendance.teacher_home'))
-    
-    if shift_type.startswith('1on1') and (
-        current_time < datetime.strptime('16:45', '%H:%M').time() or 
-        current_time > datetime.strptime('21:00', '%H:%M').time()
-    ):
-        flash('Không thể chấm công ca 1-1 ngoài giờ quy định (16:45 - 21:00).', 'danger')
+    if not (shift.start <= current_time <= shift.end):
+        flash(f'Không thể chấm công {shift.name.lower()} ngoài giờ quy định ({shift.start_time} - {shift.end_time}).', 'danger')
         return redirect(url_for('attendance.teacher_home'))
     
-    # Check if teacher has already clocked in for this shift today
-    teacher = current_user.teacher
-    existing_record = TeacherAttendance.query.filter_by(
-        teacher_id=teacher.id,
-        date=today,
-        shift_type=shift_type
-    ).first()
-    
-    if existing_record:
-        flash(f'Bạn đã chấm công cho ca này hôm nay rồi.', 'warning')
+    # The unique index on (teacher_id, date, shift_type) rejects a second clock-in
+    try:
+        clock_in(current_user.teacher, shift, now, current_user)
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_unique_violation(e, TEACHER_ONCE_PER_SHIFT):
+            raise
+        flash('Bạn đã chấm công cho ca này hôm nay rồi.', 'warning')
         return redirect(url_for('attendance.teacher_home'))
     
-    # Create new attendance record
-    attendance_record = TeacherAttendance(
-        teacher_id=teacher.id,
-        date=today,
-        time=current_time,
-        shift_type=shift_type,
-        marked_by_id=current_user.id
-    )
-    
-    db.session.add(attendance_record)
-    db.session.flush()  # Get ID without committing
-    
     try:
-        # Add to Google Sheet
-        row_id = add_attendance_to_sheet(
-            date=today.strftime('%Y-%m-%d'),
-            time=current_time.strftime('%H:%M'),
-            name=teacher.name,
-            status="Có mặt",
-            shift=shift_type,
-            marked_by=current_user.name,
-            is_student=False
-        )
-        
-        # Save the Google Sheet row ID if available
-        if row_id:
-            attendance_record.gsheet_row_id = row_id
-        
         db.session.commit()
+        sheet_sync.notify()
         
-        flash(f'Đã chấm công thành công.', 'success')
+        flash('Đã chấm công thành công.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Đã xảy ra lỗi: {str(e)}', 'danger')
@@ -317,16 +255,6 @@ def mark_student_attendance():
         flash('Không tìm thấy học sinh.', 'danger')
         return redirect(url_for('attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'))
     
-    # Check if student has already been marked today
-    existing_record = StudentAttendance.query.filter_by(
-        student_id=student.id,
-        date=today
-    ).first()
-    
-    if existing_record:
-        flash(f'Học sinh {student.name} đã được điểm danh hôm nay rồi.', 'warning')
-        return redirect(url_for('attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'))
-    
     # Create new attendance record
     attendance_record = StudentAttendance(
         student_id=student.id,
@@ -336,11 +264,21 @@ def mark_student_attendance():
     )
     
     db.session.add(attendance_record)
-    db.session.flush()  # Get ID without committing
     
+    # The unique index on (student_id, date) rejects a second mark for today
     try:
-        # Add to Google Sheet
-        row_id = add_attendance_to_sheet(
+        db.session.flush()  # Get ID without committing
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_unique_violation(e, STUDENT_ONCE_PER_DAY):
+            raise
+        flash(f'Học sinh {student.name} đã được điểm danh hôm nay rồi.', 'warning')
+        return redirect(url_for('attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'))
+    
+    try:
+        # Queue the Google Sheet append; it is sent by the sync worker after commit
+        sheet_sync.enqueue_append(
+            attendance_record,
             date=today.strftime('%Y-%m-%d'),
             time=current_time.strftime('%H:%M'),
             name=student.name,
@@ -350,11 +288,8 @@ def mark_student_attendance():
             is_student=True
         )
         
-        # Save the Google Sheet row ID if available
-        if row_id:
-            attendance_record.gsheet_row_id = row_id
-        
         db.session.commit()
+        sheet_sync.notify()
         
         flash(f'Đã điểm danh học sinh {student.name} thành công.', 'success')
     except Exception as e:
@@ -363,6 +298,173 @@ def mark_student_attendance():
     
     return redirect(url_for('attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'))
 
+def mark_students(student_ids, now, marked_by):
+    """
+    Mark a set of students present for now.date() in one transaction.
+
+    Students already marked are found with a single LEFT JOIN query, the
+    missing rows are inserted with one flush, and their sheet appends are
+    queued together so the sync worker sends them as one append_rows batch.
+    The caller commits and calls sheet_sync.notify().
+
+    Args:
+        student_ids (iterable): Student IDs to mark
+        now (datetime): Time of the mark, in Vietnam timezone
+        marked_by (User): The user marking attendance
+
+    Returns:
+        dict: student_id -> 'marked', 'already_marked' or 'not_found'
+            (unknown and inactive students)
+    """
+    today = now.date()
+    student_ids = set(student_ids)
+    results = {student_id: 'not_found' for student_id in student_ids}
+    if not student_ids:
+        return results
+
+    rows = db.session.query(Student, StudentAttendance.id).outerjoin(
+        StudentAttendance,
+        and_(StudentAttendance.student_id == Student.id, StudentAttendance.date == today)
+    ).filter(Student.id.in_(student_ids), Student.active == True).all()
+
+    new_records = []
+    for student, attendance_id in rows:
+        if attendance_id is not None:
+            results[student.id] = 'already_marked'
+            continue
+        record = StudentAttendance(
+            student_id=student.id,
+            date=today,
+            time=now.time(),
+            marked_by_id=marked_by.id
+        )
+        db.session.add(record)
+        new_records.append((student, record))
+        results[student.id] = 'marked'
+
+    # Raises IntegrityError if another request marked one of them meanwhile
+    db.session.flush()
+
+    for student, record in new_records:
+        sheet_sync.enqueue_append(
+            record,
+            date=today.strftime('%Y-%m-%d'),
+            time=now.strftime('%H:%M'),
+            name=student.name,
+            status="Có mặt",
+            shift="Học sinh",
+            marked_by=marked_by.name,
+            is_student=True
+        )
+
+    return results
+
+def _commit_marks(student_ids, now):
+    # A concurrent mark can hit the unique index; the retry re-reads who is
+    # already marked and only inserts the rest
+    for attempt in range(2):
+        try:
+            results = mark_students(student_ids, now, current_user)
+            db.session.commit()
+            break
+        except IntegrityError as e:
+            db.session.rollback()
+            if attempt or not is_unique_violation(e, STUDENT_ONCE_PER_DAY):
+                raise
+    sheet_sync.notify()
+    return results
+
+@attendance_bp.route('/student/mark-attendance/bulk', methods=['POST'])
+@login_required
+def bulk_mark_student_attendance():
+    redirect_to = 'attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'
+    now = datetime.now(vietnam_tz)
+    
+    if now.weekday() == 6:
+        if request.is_json:
+            return jsonify({'error': 'sunday'}), 400
+        flash('Không thể điểm danh vào Chủ Nhật.', 'danger')
+        return redirect(url_for(redirect_to))
+    
+    # IDs come either as a JSON body or as repeated form fields
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        student_ids = data.get('student_ids', [])
+    else:
+        student_ids = request.form.getlist('student_ids')
+    
+    try:
+        student_ids = {int(i) for i in student_ids}
+    except (TypeError, ValueError):
+        if request.is_json:
+            return jsonify({'error': 'invalid id'}), 400
+        flash('Mã học sinh không hợp lệ.', 'danger')
+        return redirect(url_for(redirect_to))
+    
+    results = _commit_marks(student_ids, now)
+    
+    if request.is_json:
+        return jsonify({'results': {str(k): v for k, v in sorted(results.items())}})
+    
+    marked = sum(1 for status in results.values() if status == 'marked')
+    already = sum(1 for status in results.values() if status == 'already_marked')
+    if marked:
+        flash(f'Đã điểm danh {marked} học sinh thành công.', 'success')
+    if already:
+        flash(f'{already} học sinh đã được điểm danh hôm nay rồi.', 'warning')
+    if not marked and not already:
+        flash('Chưa chọn học sinh nào.', 'warning')
+    return redirect(url_for(redirect_to))
+
+@attendance_bp.route('/student/mark-attendance/camera', methods=['POST'])
+@login_required
+def camera_mark_student_attendance():
+    redirect_to = 'attendance.teacher_home' if not current_user.is_admin else 'auth.admin_dashboard'
+    now = datetime.now(vietnam_tz)
+    
+    if now.weekday() == 6:
+        flash('Không thể điểm danh vào Chủ Nhật.', 'danger')
+        return redirect(url_for(redirect_to))
+    
+    upload = request.files.get('photo')
+    if not upload or not upload.filename:
+        flash('Vui lòng chụp hoặc chọn ảnh.', 'danger')
+        return redirect(url_for(redirect_to))
+    
+    # One photo can contain the whole class; every recognised face is
+    # marked in a single batch
+    try:
+        matches, face_count = faces.match_photo(upload.read(faces.MAX_UPLOAD_BYTES + 1))
+    except faces.FaceRecognitionError as e:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': str(e)}), 503
+        flash(str(e), 'danger')
+        return redirect(url_for(redirect_to))
+    
+    results = _commit_marks({student_id for student_id, _ in matches}, now)
+    
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'faces': face_count,
+            'results': {
+                str(student_id): {'status': results[student_id], 'similarity': round(similarity, 3)}
+                for student_id, similarity in matches
+            }
+        })
+    
+    marked = sum(1 for status in results.values() if status == 'marked')
+    already = sum(1 for status in results.values() if status == 'already_marked')
+    if marked:
+        flash(f'Đã nhận diện và điểm danh {marked} học sinh.', 'success')
+    if already:
+        flash(f'{already} học sinh đã được điểm danh hôm nay rồi.', 'warning')
+    unknown = face_count - len(matches)
+    if unknown > 0:
+        flash(f'Có {unknown} khuôn mặt không nhận ra được.', 'warning')
+    if not face_count:
+        flash('Không tìm thấy khuôn mặt nào trong ảnh.', 'warning')
+    return redirect(url_for(redirect_to))
+
 @attendance_bp.route('/admin/delete-attendance', methods=['POST'])
 @login_required
 def delete_attendance():
@@ -382,20 +484,72 @@ def delete_attendance():
         flash('Không tìm thấy bản ghi điểm danh.', 'danger')
         return redirect(url_for('auth.admin_dashboard'))
     
-    # Delete from Google Sheet if row_id exists
-    if attendance.gsheet_row_id:
-        try:
-            delete_attendance_from_sheet(attendance.gsheet_row_id)
-        except Exception as e:
-            flash(f'Lỗi khi xóa từ Google Sheet: {str(e)}', 'warning')
+    # Queue the Google Sheet deletion in the same transaction
+    sheet_sync.enqueue_delete(attendance)
     
     # Delete from database
     db.session.delete(attendance)
     db.session.commit()
+    sheet_sync.notify()
     
     flash('Đã xóa bản ghi điểm danh thành công.', 'success')
     return redirect(url_for('auth.admin_dashboard'))
 
+@attendance_bp.route('/admin/delete-attendance/bulk', methods=['POST'])
+@login_required
+def bulk_delete_attendance():
+    if not current_user.is_admin:
+        if request.is_json:
+            return jsonify({'error': 'forbidden'}), 403
+        flash('Bạn không có quyền thực hiện thao tác này.', 'danger')
+        return redirect(url_for('attendance.teacher_home'))
+    
+    # IDs come either as a JSON body or as repeated form fields
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        teacher_ids = data.get('teacher_ids', [])
+        student_ids = data.get('student_ids', [])
+    else:
+        teacher_ids = request.form.getlist('teacher_ids')
+        student_ids = request.form.getlist('student_ids')
+    
+    try:
+        teacher_ids = {int(i) for i in teacher_ids}
+        student_ids = {int(i) for i in student_ids}
+    except (TypeError, ValueError):
+        if request.is_json:
+            return jsonify({'error': 'invalid id'}), 400
+        flash('Mã bản ghi không hợp lệ.', 'danger')
+        return redirect(url_for('auth.admin_dashboard'))
+    
+    records = []
+    if teacher_ids:
+        records += TeacherAttendance.query.filter(TeacherAttendance.id.in_(teacher_ids)).all()
+    if student_ids:
+        records += StudentAttendance.query.filter(StudentAttendance.id.in_(student_ids)).all()
+    
+    # One transaction for all rows; the sheet deletions go out as one batch
+    sheet_sync.enqueue_deletes(records)
+    for record in records:
+        db.session.delete(record)
+    db.session.commit()
+    sheet_sync.notify()
+    
+    deleted_teacher = sorted(r.id for r in records if isinstance(r, TeacherAttendance))
+    deleted_student = sorted(r.id for r in records if isinstance(r, StudentAttendance))
+    
+    if request.is_json:
+        return jsonify({
+            'deleted': {'teacher': deleted_teacher, 'student': deleted_student},
+            'not_found': {
+                'teacher': sorted(teacher_ids - set(deleted_teacher)),
+                'student': sorted(student_ids - set(deleted_student))
+            }
+        })
+    
+    flash(f'Đã xóa {len(records)} bản ghi điểm danh.', 'success')
+    return redirect(url_for('auth.admin_dashboard'))
+
 @attendance_bp.route('/admin/attendance/today')
 @login_required
 def admin_attendance_today():
@@ -1,13 +1,20 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
-from app import app, db
-from models import User, Teacher, Student, StudentAttendance, TeacherAttendance, Shift
+from extensions import db
+from models import User, Teacher, Student, StudentAttendance, TeacherAttendance, PayrollLine
 from sqlalchemy import func
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Email
 from utils import get_vietnam_time
+from conditional import conditional_get
+from schedule import get_schedule
+import photos
+import faces
+import live
+
+auth_bp = Blueprint('auth', __name__)
 
 
 class LoginForm(FlaskForm):
@@ -17,7 +24,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Đăng nhập')
 
 
-@app.route('/')
+@auth_bp.route('/')
 def index():
     if current_user.is_authenticated:
         if current_user.is_admin:
@@ -27,7 +34,7 @@ def index():
     return redirect('/login')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         return redirect('/')
@@ -82,7 +89,7 @@ def login():
     return render_template('login.html', form=form)
 
 
-@app.route('/logout')
+@auth_bp.route('/logout')
 @login_required
 def logout():
     logout_user()
@@ -90,64 +97,67 @@ def logout():
     return redirect('/login')
 
 
-@app.route('/admin/dashboard')
+@auth_bp.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
         flash('Bạn không có quyền truy cập trang này!', 'danger')
         return redirect('/')
     
+    # Lấy vị trí luồng sự kiện trước khi truy vấn, để không bỏ lỡ thay đổi nào
+    # xảy ra trong lúc trang được tạo (trang tự cập nhật qua SSE, xem live.py)
+    live.broker.start(current_app._get_current_object())
+    live_position = live.broker.position
+    
     students = Student.query.all()
+    teachers = Teacher.query.all()
     today = get_vietnam_time().date()
     
-    student_attendance = {}
-    for student in students:
-        attendance = StudentAttendance.query.filter_by(
-            student_id=student.id,
-            date=today
-        ).first()
-        student_attendance[student.id] = attendance
+    student_attendance = {
+        attendance.student_id: attendance
+        for attendance in StudentAttendance.query.filter_by(date=today)
+    }
     
-    teacher_count_today = db.session.query(func.count(TeacherAttendance.teacher_id.distinct())).\
-        filter(TeacherAttendance.date == today).scalar() or 0
+    teacher_records = TeacherAttendance.query.filter_by(date=today).all()
+    teacher_count_today = len({record.teacher_id for record in teacher_records})
     
     current_time = get_vietnam_time().time()
-    current_hour = current_time.hour
+    teacher_names = {teacher.id: teacher.name for teacher in teachers}
     
-    shifts = Shift.query.all()
     active_shifts = []
     
-    for shift in shifts:
-        shift_start_hour = int(shift.start_time.split(':')[0])
-        shift_end_hour = int(shift.end_time.split(':')[0])
+    for shift in get_schedule().open_shifts(current_time):
+        teachers_in_shift = [
+            {'id': record.teacher_id, 'record_id': record.id, 'name': teacher_names.get(record.teacher_id, '')}
+            for record in teacher_records if record.shift_type == shift.code
+        ]
         
-        if shift_start_hour <= current_hour < shift_end_hour:
-            teachers_in_shift = db.session.query(Teacher).\
-                join(TeacherAttendance, Teacher.id == TeacherAttendance.teacher_id).\
-                filter(
-                    TeacherAttendance.date == today,
-                    TeacherAttendance.shift_id == shift.id
-                ).all()
-            
-            active_shifts.append({
-                'shift': shift,
-                'teachers': teachers_in_shift,
-                'count': len(teachers_in_shift)
-            })
+        active_shifts.append({
+            'shift': shift,
+            'teachers': teachers_in_shift,
+            'count': len(teachers_in_shift)
+        })
     
-    return render_template(
+    response = make_response(render_template(
         'admin/dashboard.html', 
         students=students, 
         student_attendance=student_attendance,
+        teacher_names=teacher_names,
+        teacher_records=[[record.id, record.teacher_id] for record in teacher_records],
         today=today,
         teacher_count_today=teacher_count_today,
         active_shifts=active_shifts,
-        current_time=current_time
-    )
+        current_time=current_time,
+        live_position=live_position
+    ))
+    # Trang chứa vị trí luồng sự kiện, bản lưu cache sẽ phát lại từ vị trí cũ
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
-@app.route('/teacher/dashboard')
+@auth_bp.route('/teacher/dashboard')
 @login_required
+@conditional_get
 def teacher_dashboard():
     if current_user.is_admin:
         return redirect('/admin/dashboard')
@@ -155,7 +165,6 @@ def teacher_dashboard():
     students = Student.query.all()
     today = get_vietnam_time().date()
     current_time = get_vietnam_time().time()
-    current_hour = current_time.hour
     
     student_attendance = {}
     for student in students:
@@ -169,9 +178,7 @@ def teacher_dashboard():
     if hasattr(current_user, 'teacher'):
         teacher = current_user.teacher
     
-    all_shifts = Shift.query.all()
     teacher_attendance = {}
-    active_shifts = set()
     
     if teacher:
         attendance_records = TeacherAttendance.query.filter_by(
@@ -182,14 +189,8 @@ def teacher_dashboard():
         for record in attendance_records:
             teacher_attendance[record.shift_id] = record
     
-    shifts = []
-    for shift in all_shifts:
-        shift_start_hour = int(shift.start_time.split(':')[0])
-        shift_end_hour = int(shift.end_time.split(':')[0])
-        
-        if shift_start_hour <= current_hour < shift_end_hour:
-            shifts.append(shift)
-            active_shifts.add(shift.id)
+    shifts = get_schedule().open_shifts(current_time)
+    active_shifts = {shift.id for shift in shifts}
     
     return render_template(
         'teacher/dashboard.html', 
@@ -202,3 +203,125 @@ def teacher_dashboard():
         active_shifts=active_shifts,
         current_time=current_time
     )
+
+
+@auth_bp.route('/admin/students', methods=['GET', 'POST'])
+@login_required
+def manage_students():
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập trang này!', 'danger')
+        return redirect('/')
+    
+    if request.method == 'POST':
+        action = request.form.get('action')
+        student = None
+        if action != 'add':
+            student = Student.query.get(request.form.get('student_id', type=int))
+            if not student:
+                flash('Không tìm thấy học sinh.', 'danger')
+                return redirect(url_for('auth.manage_students'))
+        
+        if action == 'add':
+            name = request.form.get('name', '').strip()
+            if not name:
+                flash('Vui lòng nhập tên học sinh.', 'danger')
+                return redirect(url_for('auth.manage_students'))
+            db.session.add(Student(name=name, active=True))
+            flash(f'Đã thêm học sinh {name}.', 'success')
+        elif action == 'edit':
+            student.name = request.form.get('name', student.name).strip() or student.name
+            student.active = 'active' in request.form
+            flash(f'Đã cập nhật học sinh {student.name}.', 'success')
+        elif action == 'delete':
+            # Students with attendance history are kept for the reports
+            if StudentAttendance.query.filter_by(student_id=student.id).first():
+                student.active = False
+                flash(f'Học sinh {student.name} đã có dữ liệu điểm danh nên chỉ được chuyển sang không hoạt động.', 'warning')
+            else:
+                db.session.delete(student)
+                flash(f'Đã xóa học sinh {student.name}.', 'success')
+        elif action == 'upload_photo':
+            upload = request.files.get('photo')
+            if not upload or not upload.filename:
+                flash('Vui lòng chọn ảnh.', 'danger')
+                return redirect(url_for('auth.manage_students'))
+            try:
+                # Thumbnails and WebP variants are written under content-hashed names
+                student.photo = photos.process_photo(upload.read(photos.MAX_UPLOAD_BYTES + 1))
+            except photos.PhotoError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('auth.manage_students'))
+            flash(f'Đã cập nhật ảnh của {student.name}.', 'success')
+        else:
+            flash('Thao tác không hợp lệ.', 'danger')
+            return redirect(url_for('auth.manage_students'))
+        
+        db.session.commit()
+        
+        # Only new or changed photos are embedded again
+        if faces.available():
+            try:
+                faces.refresh_index(Student.query.filter(Student.active == True).all())
+            except faces.FaceRecognitionError as e:
+                flash(str(e), 'warning')
+        return redirect(url_for('auth.manage_students'))
+    
+    students = Student.query.order_by(Student.name).all()
+    return render_template('admin/students.html', students=students)
+
+
+@auth_bp.route('/admin/teachers', methods=['GET', 'POST'])
+@login_required
+def manage_teachers():
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập trang này!', 'danger')
+        return redirect('/')
+    
+    if request.method == 'POST':
+        action = request.form.get('action')
+        teacher = None
+        if action != 'add':
+            teacher = Teacher.query.get(request.form.get('teacher_id', type=int))
+            if not teacher:
+                flash('Không tìm thấy giáo viên.', 'danger')
+                return redirect(url_for('auth.manage_teachers'))
+        
+        if action in ('add', 'edit'):
+            name = request.form.get('name', '').strip()
+            email = request.form.get('email', '').strip().lower()
+            if not name or not email:
+                flash('Vui lòng nhập tên và email giáo viên.', 'danger')
+                return redirect(url_for('auth.manage_teachers'))
+            other = Teacher.query.filter(func.lower(Teacher.email) == email).first()
+            if other and other is not teacher:
+                flash(f'Email {email} đã được dùng cho giáo viên {other.name}.', 'danger')
+                return redirect(url_for('auth.manage_teachers'))
+        
+        if action == 'add':
+            # Liên kết với tài khoản đăng nhập có cùng email, nếu đã có
+            user = User.query.filter(func.lower(User.email) == email).first()
+            db.session.add(Teacher(name=name, email=email, active=True, user_id=user.id if user else None))
+            flash(f'Đã thêm giáo viên {name}.', 'success')
+        elif action == 'edit':
+            teacher.name = name
+            teacher.email = email
+            teacher.active = 'active' in request.form
+            flash(f'Đã cập nhật giáo viên {teacher.name}.', 'success')
+        elif action == 'delete':
+            # Giáo viên đã có dữ liệu chấm công được giữ lại cho báo cáo và bảng lương
+            if (TeacherAttendance.query.filter_by(teacher_id=teacher.id).first()
+                    or PayrollLine.query.filter_by(teacher_id=teacher.id).first()):
+                teacher.active = False
+                flash(f'Giáo viên {teacher.name} đã có dữ liệu chấm công nên chỉ được chuyển sang không hoạt động.', 'warning')
+            else:
+                db.session.delete(teacher)
+                flash(f'Đã xóa giáo viên {teacher.name}.', 'success')
+        else:
+            flash('Thao tác không hợp lệ.', 'danger')
+            return redirect(url_for('auth.manage_teachers'))
+        
+        db.session.commit()
+        return redirect(url_for('auth.manage_teachers'))
+    
+    teachers = Teacher.query.order_by(Teacher.name).all()
+    return render_template('admin/teachers.html', teachers=teachers)
@@ -0,0 +1,129 @@
+"""
+Benchmark the payroll engine over synthetic attendance history.
+
+    python benchmarks/payroll_bench.py --teachers 40 --years 3
+
+Compares compute_payroll() (grouped aggregation, whole months read from
+teacher_month_stats) with a naive per-teacher ORM loop over the raw rows.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from extensions import db
+from models import Teacher, TeacherAttendance, Shift
+from schedule import DEFAULT_SHIFTS
+from stats import rebuild_stats
+from payroll import compute_payroll
+
+
+CLOCK_IN_TIMES = {'morning': clock(6, 30), 'afternoon': clock(12, 15), '1on1': clock(17, 0)}
+
+
+def make_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(teachers, days, end, rng):
+    db.create_all()
+    db.session.execute(Shift.__table__.insert(), DEFAULT_SHIFTS)
+    db.session.execute(Teacher.__table__.insert(), [
+        {'id': i, 'name': f'Giáo viên {i}', 'email': f'gv{i}@example.com', 'hourly_rate': rng.choice([50000, 60000, 80000])}
+        for i in range(1, teachers + 1)
+    ])
+
+    one_on_one = ['1on1_1h', '1on1_1.5h', '1on1_2h']
+    rows = []
+    day = end - timedelta(days=days - 1)
+    while day <= end:
+        if day.weekday() != 6:
+            for teacher_id in range(1, teachers + 1):
+                for shift_type, chance in (('morning', 0.7), ('afternoon', 0.6), (rng.choice(one_on_one), 0.3)):
+                    if rng.random() < chance:
+                        rows.append({
+                            'teacher_id': teacher_id,
+                            'date': day,
+                            'time': CLOCK_IN_TIMES.get(shift_type, CLOCK_IN_TIMES['1on1']),
+                            'shift_type': shift_type
+                        })
+        day += timedelta(days=1)
+
+    for i in range(0, len(rows), 5000):
+        db.session.execute(TeacherAttendance.__table__.insert(), rows[i:i + 5000])
+    db.session.commit()
+
+    with db.engine.begin() as conn:
+        rebuild_stats(conn)
+    return len(rows)
+
+
+def naive_payroll(start, end):
+    durations = {shift.code: shift.duration for shift in Shift.query.all()}
+    result = []
+    for teacher in Teacher.query.all():
+        records = TeacherAttendance.query.filter(
+            TeacherAttendance.teacher_id == teacher.id,
+            TeacherAttendance.date >= start,
+            TeacherAttendance.date <= end
+        ).all()
+        hours = sum(durations.get(record.shift_type, 0) for record in records)
+        result.append((teacher.id, hours, round(hours * (teacher.hourly_rate or 0))))
+    return result
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--teachers', type=int, default=20)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--database', default='sqlite://')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    app = make_app(args.database)
+    end = date(2025, 12, 31)
+    with app.app_context():
+        started = time.perf_counter()
+        count = seed(args.teachers, args.years * 365, end, random.Random(args.seed))
+        print(f"Seeded {count} attendance rows for {args.teachers} teachers in {time.perf_counter() - started:.2f}s")
+
+        periods = [
+            ('1 month', date(2025, 12, 1), end),
+            ('partial months', date(2025, 3, 17), date(2025, 9, 9)),
+            (f'{args.years} years', end - timedelta(days=args.years * 365 - 1), end),
+        ]
+        print(f"{'period':<16}{'engine (ms)':>14}{'naive (ms)':>14}{'speedup':>10}")
+        for label, start, stop in periods:
+            engine_time, lines = timed(compute_payroll, start, stop)
+            naive_time, naive = timed(naive_payroll, start, stop)
+
+            # Both must agree on every teacher's hours
+            engine_hours = {line['teacher_id']: round(line['total_hours'], 2) for line in lines}
+            naive_hours = {teacher_id: round(hours, 2) for teacher_id, hours, _ in naive if hours}
+            assert engine_hours == naive_hours, f"Mismatch for {label}"
+
+            print(f"{label:<16}{engine_time * 1000:>14.1f}{naive_time * 1000:>14.1f}{naive_time / engine_time:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
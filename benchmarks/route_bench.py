@@ -0,0 +1,245 @@
+"""
+Time the main pages and clock-in against synthetic classes of several sizes.
+
+    python benchmarks/route_bench.py --sizes small medium --save-baseline
+    python benchmarks/route_bench.py --sizes small medium
+
+Each size is seeded into a fresh SQLite file with seed_data.seed(), then
+every route is requested through the Flask test client as an admin or a
+teacher. For each route the median and p95 latency and the number of SQL
+statements per request are reported. Report caches are cleared before
+every request, so cached views are measured doing their real work.
+
+Results are compared with benchmarks/route_baseline.json (written with
+--save-baseline on the same machine). A route regresses when it issues
+more queries than the baseline, or when its median is more than
+--tolerance slower and by more than the noise floor. The exit status is
+1 if anything regressed.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# create_app() reads the database location from the environment
+_directory = tempfile.mkdtemp(prefix='route-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+os.environ['SHEET_SYNC_WORKER'] = '0'
+
+from sqlalchemy import event, text
+
+from app import create_app
+from extensions import db
+from models import Teacher
+import attendance
+import report_cache
+import schedule
+import user_cache
+import migrations
+from seed_data import seed, vietnam_tz
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'route_baseline.json')
+NOISE_FLOOR_MS = 2.0
+
+app = create_app()
+
+SIZES = {
+    'small': {'teachers': 5, 'students': 15, 'years': 1},
+    'medium': {'teachers': 20, 'students': 60, 'years': 3},
+    'large': {'teachers': 50, 'students': 150, 'years': 5}
+}
+
+ADMIN_ID = 1
+TEACHER_ID = 2  # user id of the first seeded teacher
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def _frozen_datetime(moment):
+    """
+    datetime replacement whose now() is fixed, so clock-in always lands
+    inside the morning shift on a day without seeded attendance
+    """
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment.astimezone(tz) if tz else moment.replace(tzinfo=None)
+    return FrozenDatetime
+
+
+def _next_weekday(day):
+    day += timedelta(days=1)
+    return day + timedelta(days=1) if day.weekday() == 6 else day
+
+
+def reset_database():
+    db.session.remove()
+    db.drop_all()
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+    migrations.run_migrations()
+    schedule.invalidate()
+    report_cache.clear()
+    user_cache.clear()
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def _check(client, response, method, path, expect):
+    """
+    Fail unless the response is the route's success: a 200, or for a
+    form POST the redirect with a success flash
+    """
+    with client.session_transaction() as session:
+        flashes = session.pop('_flashes', [])
+    if expect == 'redirect':
+        if response.status_code != 302 or not any(category == 'success' for category, _ in flashes):
+            raise RuntimeError(f'{method} {path} did not succeed: {response.status_code} {flashes}')
+    elif response.status_code != 200:
+        raise RuntimeError(f'{method} {path} returned {response.status_code} {response.location or ""}')
+
+
+def measure(client, counter, method, path, user_id, repeat, data=None, before=None, expect=200):
+    _login(client, user_id)
+    latencies = []
+    queries = []
+    for i in range(repeat + 1):
+        if before:
+            before(i)
+        report_cache.clear()
+        counter.count = 0
+        # Each request gets its own app context, so g (and the user
+        # Flask-Login cached there) never carries over to the next one
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data(i) if callable(data) else data)
+        elapsed = time.perf_counter() - started
+        _check(client, response, method, path, expect)
+        # The first request warms up templates and the schedule
+        if i:
+            latencies.append(elapsed * 1000)
+            queries.append(counter.count)
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'queries': max(queries)
+    }
+
+
+def run_size(name, repeat, rng_seed):
+    size = SIZES[name]
+    # The app context is only pushed for resetting and seeding
+    with app.app_context():
+        reset_database()
+        started = time.perf_counter()
+        counts = seed(size['teachers'], size['students'], size['years'], rng=random.Random(rng_seed))
+        print(f"\n[{name}] seeded {counts['teacher_attendance']} teacher and "
+              f"{counts['student_attendance']} student attendance rows in {time.perf_counter() - started:.1f}s")
+        teacher_id = Teacher.query.filter_by(user_id=TEACHER_ID).one().id
+        db.session.remove()
+        engine = db.engine
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    client = app.test_client()
+    today = datetime.now(vietnam_tz).date()
+    results = {}
+
+    try:
+        results['teacher_home'] = measure(client, counter, 'GET', '/teacher/home', TEACHER_ID, repeat)
+        results['admin_dashboard'] = measure(client, counter, 'GET', '/admin/dashboard', ADMIN_ID, repeat)
+        month = f'year={today.year}&month={today.month}'
+        results['admin_reports'] = measure(client, counter, 'GET', f'/admin/reports?{month}', ADMIN_ID, repeat)
+        results['teacher_report'] = measure(
+            client, counter, 'GET', f'/admin/reports/teacher/{teacher_id}?{month}', ADMIN_ID, repeat)
+        results['student_report'] = measure(
+            client, counter, 'GET', f'/admin/reports/students?{month}', ADMIN_ID, repeat)
+
+        # One successful clock-in per teacher, on a day after the seeded history
+        moment = vietnam_tz.localize(datetime.combine(_next_weekday(today), datetime.min.time()).replace(hour=6, minute=30))
+        clock_ins = min(repeat, size['teachers'] - 1)
+        original = attendance.datetime
+        attendance.datetime = _frozen_datetime(moment)
+        try:
+            results['clock_in'] = measure(
+                client, counter, 'POST', '/teacher/clock-in', TEACHER_ID, clock_ins,
+                data={'shift_type': 'morning'},
+                before=lambda i: _login(client, TEACHER_ID + i),
+                expect='redirect'
+            )
+        finally:
+            attendance.datetime = original
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+    return results
+
+
+def compare(name, results, baseline, tolerance):
+    regressions = []
+    for route, result in results.items():
+        base = baseline.get(name, {}).get(route)
+        flags = []
+        if base:
+            if result['queries'] > base['queries']:
+                flags.append(f"queries {base['queries']} -> {result['queries']}")
+            slower = result['p50_ms'] - base['p50_ms']
+            if result['p50_ms'] > base['p50_ms'] * (1 + tolerance) and slower > NOISE_FLOOR_MS:
+                flags.append(f"p50 +{slower:.1f}ms")
+        status = 'REGRESSION ' + ', '.join(flags) if flags else ('ok' if base else 'no baseline')
+        print(f"  {route:<28}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['queries']:>9}  {status}")
+        if flags:
+            regressions.append((name, route))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p50 slowdown')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    measured = {}
+    regressions = []
+    for name in args.sizes:
+        measured[name] = run_size(name, args.repeat, args.seed)
+        print(f"  {'route':<28}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}")
+        regressions += compare(name, measured[name], baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(measured, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark concurrent clock-in writes against a SQLite file.
+
+    python benchmarks/sqlite_concurrency_bench.py --writers 4 --readers 2 --seconds 10
+
+Runs the same workload twice, once with SQLite defaults and once with the
+engine profile from database.py (WAL, busy_timeout, synchronous=NORMAL,
+mmap/cache size). Writer processes insert attendance rows, one committed
+transaction each, like gunicorn workers handling clock-ins, while reader
+processes run the month aggregation used by the dashboards.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import database
+
+
+SCHEMA = (
+    'CREATE TABLE teacher_attendance ('
+    ' id INTEGER PRIMARY KEY,'
+    ' teacher_id INTEGER NOT NULL,'
+    ' date DATE NOT NULL,'
+    ' time TIME,'
+    ' shift_type VARCHAR(20) NOT NULL)'
+)
+INDEX = 'CREATE INDEX ix_teacher_attendance_date ON teacher_attendance (date)'
+INSERT = text(
+    "INSERT INTO teacher_attendance (teacher_id, date, time, shift_type) "
+    "VALUES (:teacher_id, '2025-03-10', '06:30:00', 'morning')"
+)
+AGGREGATE = text(
+    'SELECT teacher_id, shift_type, COUNT(*) FROM teacher_attendance '
+    'GROUP BY teacher_id, shift_type'
+)
+
+
+def _engine(uri, tuned):
+    # The PRAGMA listener reads SQLITE_PRAGMAS in each process
+    os.environ['SQLITE_PRAGMAS'] = '1' if tuned else '0'
+    options = database.engine_options(uri) if tuned else {}
+    return create_engine(uri, **options)
+
+
+def _writer(uri, tuned, worker_id, deadline, results):
+    engine = _engine(uri, tuned)
+    committed = errors = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(INSERT, {'teacher_id': worker_id})
+            committed += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            # "database is locked" is what the users see as a failed clock-in
+            errors += 1
+    engine.dispose()
+    results.put(('writer', committed, errors, latencies))
+
+
+def _reader(uri, tuned, deadline, results):
+    engine = _engine(uri, tuned)
+    queries = errors = 0
+    while time.perf_counter() < deadline:
+        try:
+            with engine.connect() as conn:
+                conn.execute(AGGREGATE).all()
+            queries += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('reader', queries, errors, []))
+
+
+def run(tuned, writers, readers, seconds):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+    setup = _engine(uri, tuned)
+    with setup.begin() as conn:
+        conn.execute(text(SCHEMA))
+        conn.execute(text(INDEX))
+    setup.dispose()
+
+    results = multiprocessing.Queue()
+    deadline = time.perf_counter() + seconds
+    processes = [
+        multiprocessing.Process(target=_writer, args=(uri, tuned, i, deadline, results))
+        for i in range(writers)
+    ] + [
+        multiprocessing.Process(target=_reader, args=(uri, tuned, deadline, results))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(l for kind, _, _, ls in collected if kind == 'writer' for l in ls)
+    writes = sum(count for kind, count, _, _ in collected if kind == 'writer')
+    return {
+        'writes_per_second': writes / seconds,
+        'write_errors': sum(errors for kind, _, errors, _ in collected if kind == 'writer'),
+        'reads_per_second': sum(count for kind, count, _, _ in collected if kind == 'reader') / seconds,
+        'read_errors': sum(errors for kind, _, errors, _ in collected if kind == 'reader'),
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run")
+    print(f"{'profile':<10}{'writes/s':>10}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}{'reads/s':>10}{'errors':>8}")
+    for label, tuned in (('default', False), ('tuned', True)):
+        result = run(tuned, args.writers, args.readers, args.seconds)
+        print(
+            f"{label:<10}{result['writes_per_second']:>10.1f}{result['write_errors']:>8}"
+            f"{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+            f"{result['reads_per_second']:>10.1f}{result['read_errors']:>8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Time importing the app, building it with create_app() and its first request.
+
+    python benchmarks/startup_bench.py --repeat 5 --top 15
+
+Every measurement runs in a fresh interpreter, as a new gunicorn worker
+or `flask` command would:
+
+  import      python -c "import app"            (module imports only)
+  create_app  import app; create_app()          (blueprints, migrations)
+  first GET   create_app() and one GET /login   (templates compiled)
+
+The median and best of --repeat runs are reported, followed by the
+modules with the largest cumulative import time from `python -X
+importtime`, which is where to look when startup regresses. With
+--require-lazy the run fails if any of the optional heavy integrations
+(gspread, google.auth, PIL, numpy, cv2) was imported during startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a feature is used; never at startup
+LAZY_MODULES = ('gspread', 'google.auth', 'PIL', 'numpy', 'cv2')
+
+STAGES = {
+    'import': 'import app',
+    'create_app': 'import app; app.create_app()',
+    'first GET': (
+        'import app; client = app.create_app().test_client(); '
+        'assert client.get("/login").status_code == 200'
+    )
+}
+
+TIMER = (
+    'import sys, time; started = time.perf_counter(); {code}; '
+    'print(time.perf_counter() - started); '
+    'print(",".join(sorted(m for m in {lazy!r} if m in sys.modules)))'
+)
+
+
+def _environment(directory):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+    env['SHEET_SYNC_WORKER'] = '0'
+    env['PYTHONPATH'] = ROOT
+    return env
+
+
+def run_stage(code, env):
+    output = subprocess.run(
+        [sys.executable, '-c', TIMER.format(code=code, lazy=LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[-2]) * 1000, [name for name in output[-1].split(',') if name]
+
+
+def import_profile(env, top):
+    """
+    The slowest modules by cumulative import time, from -X importtime
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STAGES['create_app']],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under their importer; keep top-level ones
+        name = name[1:]
+        if not name.startswith(' '):
+            rows.append((int(cumulative) / 1000, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--require-lazy', action='store_true',
+                        help='fail if an optional integration is imported at startup')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='startup-bench-')
+    env = _environment(directory)
+    # The first run creates the database and writes bytecode
+    run_stage(STAGES['create_app'], env)
+
+    eager = set()
+    print(f"{'stage':<14}{'median ms':>11}{'best ms':>10}")
+    for name, code in STAGES.items():
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, loaded = run_stage(code, env)
+            timings.append(elapsed)
+            eager.update(loaded)
+        print(f"{name:<14}{statistics.median(timings):>11.1f}{min(timings):>10.1f}")
+
+    print("\nSlowest imports (cumulative ms):")
+    for milliseconds, module in import_profile(env, args.top):
+        print(f"  {milliseconds:>8.1f}  {module}")
+
+    if eager:
+        print(f"\nImported at startup: {', '.join(sorted(eager))}")
+        if args.require_lazy:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
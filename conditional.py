@@ -0,0 +1,60 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import request, session, make_response
+from flask_login import current_user
+
+from report_cache import period_versions
+from schedule import get_schedule
+
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+
+def page_etag(now):
+    """
+    ETag for the current user's view of a page at `now`.
+
+    Built from the data versions of the current month and the global
+    version (bumped by attendance, teacher, student and shift writes, see
+    report_cache), the shift schedule the page is rendered with (times and
+    hours), and the shifts open right now, since the pages show different
+    buttons and teachers per shift.
+    """
+    versions = period_versions(now.year, now.month)
+    schedule = get_schedule()
+    open_shifts = tuple(shift.code for shift in schedule.open_shifts(now.time()))
+    parts = (request.endpoint, current_user.get_id(), now.date().isoformat(), open_shifts, versions,
+             tuple(schedule.shifts))
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_get(view):
+    """
+    Answer GET requests with 304 Not Modified when the client's ETag is
+    still current, before the view runs any of its own queries.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Flash messages are shown once, so such responses are never reused
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        etag = page_etag(datetime.now(vietnam_tz))
+
+        # Weak comparison, as If-None-Match requires: compressed responses
+        # carry the tag as W/"..."
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.get('_flashes'):
+                return response
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+
+    return wrapper
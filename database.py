@@ -0,0 +1,147 @@
+import os
+import sqlite3
+
+from sqlalchemy import event, extract, cast, Integer
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_DATABASE_URI = 'sqlite:///lophanhphuc.db'
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas():
+    """
+    PRAGMAs applied to every new SQLite connection.
+
+    WAL lets readers run alongside the single writer, and busy_timeout
+    makes a writer wait for the lock instead of failing at once with
+    "database is locked". synchronous=NORMAL is durable in WAL mode except
+    for the last transactions before a power loss.
+
+    Returns:
+        dict: PRAGMA name -> value, overridable through SQLITE_* variables
+    """
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT', 15000),  # ms
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 128 * 1024 * 1024),  # bytes
+        'cache_size': _env_int('SQLITE_CACHE_SIZE', -32000),  # negative = KiB
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY'
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    if os.environ.get('SQLITE_PRAGMAS', '1') != '1':
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def database_uri():
+    """
+    Database URI from DATABASE_URL, defaulting to the local SQLite file.
+
+    postgres:// URLs (as given by most hosting providers) are rewritten to
+    postgresql://, the only scheme SQLAlchemy accepts.
+    """
+    uri = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def date_part(field, column):
+    """
+    Integer year/month/day of a date column on every supported backend.
+
+    extract() compiles to strftime() on SQLite, which already yields an
+    integer, but PostgreSQL returns a numeric; casting keeps GROUP BY keys
+    and result types the same on both.
+    """
+    return cast(extract(field, column), Integer)
+
+
+def is_unique_violation(error, constraint):
+    """
+    Whether an IntegrityError was raised by the given unique index or
+    constraint, rather than by some other constraint (e.g. NOT NULL).
+
+    Args:
+        error (IntegrityError): The error raised by the flush
+        constraint: A unique Index, or the table's PrimaryKeyConstraint
+
+    Returns:
+        bool
+    """
+    table = constraint.table
+    name = constraint.name or f'{table.name}_pkey'
+    orig = getattr(error, 'orig', None)
+    # psycopg2 reports the constraint by name
+    diag = getattr(orig, 'diag', None)
+    if getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == name
+    # SQLite lists the columns: "UNIQUE constraint failed: table.a, table.b"
+    message = str(orig)
+    columns = ', '.join(f'{table.name}.{column.name}' for column in constraint.columns)
+    return name in message or message == f'UNIQUE constraint failed: {columns}'
+
+
+def _postgresql_options():
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        # Drop connections closed by the server or a proxy while idle
+        'pool_pre_ping': True,
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800)
+    }
+
+
+def engine_options(uri):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the given database URI.
+
+    Every gunicorn worker gets its own pool, so pools are kept small:
+    SQLite allows one writer at a time and extra connections only wait,
+    and PostgreSQL has a server-wide connection limit to share.
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        return _postgresql_options()
+    if backend != 'sqlite':
+        return {}
+
+    # In-memory databases use a single shared connection; nothing to tune
+    if url.database in (None, '', ':memory:'):
+        return {}
+
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'connect_args': {
+            # The driver's own wait, in seconds, before raising "database is locked"
+            'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 15000) / 1000,
+            # Connections are shared by the request threads and the sync worker
+            'check_same_thread': False
+        }
+    }
+
+
+def configure_database(app, uri=None):
+    """
+    Set the database URI and engine options on a Flask app before db.init_app()
+    """
+    uri = uri or database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
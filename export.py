@@ -0,0 +1,250 @@
+import csv
+import io
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import pytz
+from flask import Blueprint, Response, request, flash, redirect, url_for, stream_with_context
+from flask_login import login_required, current_user
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Teacher, Student, TeacherAttendance, StudentAttendance, User
+from utils import shift_name_vi
+
+export_bp = Blueprint('export', __name__)
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+# Rows fetched per round trip from the database cursor
+BATCH_SIZE = 1000
+
+# Werkzeug adds "; charset=utf-8" to text/* types itself
+CSV_MIMETYPE = 'text/csv'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _teacher_rows(start, end):
+    marker = aliased(User)
+    stmt = select(
+        TeacherAttendance.date,
+        TeacherAttendance.time,
+        Teacher.name,
+        TeacherAttendance.shift_type,
+        marker.name
+    ).join(
+        Teacher, Teacher.id == TeacherAttendance.teacher_id
+    ).outerjoin(
+        marker, marker.id == TeacherAttendance.marked_by_id
+    ).where(
+        TeacherAttendance.date >= start,
+        TeacherAttendance.date <= end
+    ).order_by(TeacherAttendance.date, TeacherAttendance.time).execution_options(yield_per=BATCH_SIZE)
+
+    for date, time, name, shift_type, marked_by in db.session.execute(stmt):
+        yield [date.strftime('%Y-%m-%d'), time.strftime('%H:%M') if time else '', name, shift_name_vi(shift_type), marked_by or '']
+
+
+def _student_rows(start, end):
+    stmt = select(
+        StudentAttendance.date,
+        StudentAttendance.time,
+        Student.name,
+        User.name
+    ).join(
+        Student, Student.id == StudentAttendance.student_id
+    ).outerjoin(
+        User, User.id == StudentAttendance.marked_by_id
+    ).where(
+        StudentAttendance.date >= start,
+        StudentAttendance.date <= end
+    ).order_by(StudentAttendance.date, StudentAttendance.time).execution_options(yield_per=BATCH_SIZE)
+
+    for date, time, name, marked_by in db.session.execute(stmt):
+        yield [date.strftime('%Y-%m-%d'), time.strftime('%H:%M') if time else '', name, marked_by or '']
+
+
+EXPORTS = {
+    'teachers': {
+        'header': ["Ngày", "Giờ", "Giáo viên", "Ca", "Người chấm công"],
+        'rows': _teacher_rows,
+        'filename': 'cham-cong-giao-vien'
+    },
+    'students': {
+        'header': ["Ngày", "Giờ", "Học sinh", "Người điểm danh"],
+        'rows': _student_rows,
+        'filename': 'diem-danh-hoc-sinh'
+    }
+}
+
+
+def stream_csv(header, rows):
+    """
+    Yield CSV text in chunks of BATCH_SIZE rows, header first
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM so that Excel opens the Vietnamese text as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(header)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable stream that hands written bytes back in chunks
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+}
+
+
+def _xlsx_row(row):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>' for value in row
+    )
+    return f'<row>{cells}</row>'
+
+
+def stream_xlsx(header, rows):
+    """
+    Yield a single-sheet XLSX workbook while it is being written.
+
+    The zip is written to a non-seekable buffer (zipfile then uses data
+    descriptors), and the sheet XML is flushed every BATCH_SIZE rows, so
+    memory stays flat regardless of the number of rows.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        yield buffer.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+
+            pending = []
+            for count, row in enumerate(rows, start=1):
+                pending.append(_xlsx_row(row))
+                if count % BATCH_SIZE == 0:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    yield buffer.drain()
+
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode('utf-8'))
+
+    yield buffer.drain()
+
+
+def _parse_period():
+    today = datetime.now(vietnam_tz).date()
+    start = request.args.get('start')
+    end = request.args.get('end')
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else today.replace(day=1)
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else today
+    return start, end
+
+
+@export_bp.route('/admin/export/<kind>')
+@login_required
+def export_attendance(kind):
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập vào trang này.', 'danger')
+        return redirect(url_for('attendance.teacher_home'))
+
+    export = EXPORTS.get(kind)
+    file_format = request.args.get('format', 'csv')
+    if export is None or file_format not in ('csv', 'xlsx'):
+        flash('Định dạng xuất không hợp lệ.', 'danger')
+        return redirect(url_for('reports.admin_reports'))
+
+    try:
+        start, end = _parse_period()
+    except ValueError:
+        flash('Ngày không hợp lệ.', 'danger')
+        return redirect(url_for('reports.admin_reports'))
+
+    rows = export['rows'](start, end)
+    if file_format == 'xlsx':
+        body, mimetype = stream_xlsx(export['header'], rows), XLSX_MIMETYPE
+    else:
+        body, mimetype = stream_csv(export['header'], rows), CSV_MIMETYPE
+
+    filename = f"{export['filename']}_{start.strftime('%Y-%m-%d')}_{end.strftime('%Y-%m-%d')}.{file_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,278 @@
+"""
+Face recognition for camera check-in (optional; see README.md).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from photos import large_photo_path, is_processed
+
+logger = logging.getLogger(__name__)
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FACE_INDEX_DIR = os.environ.get('FACE_INDEX_DIR', os.path.join(_BASE_DIR, 'media', 'faces'))
+DETECTOR_MODEL = os.environ.get(
+    'FACE_DETECTOR_MODEL', os.path.join(_BASE_DIR, 'media', 'models', 'face_detection_yunet_2023mar.onnx'))
+RECOGNIZER_MODEL = os.environ.get(
+    'FACE_RECOGNIZER_MODEL', os.path.join(_BASE_DIR, 'media', 'models', 'face_recognition_sface_2021dec.onnx'))
+
+EMBEDDING_SIZE = 128
+# Cosine similarity above which SFace considers two faces the same person
+MATCH_THRESHOLD = float(os.environ.get('FACE_MATCH_THRESHOLD', 0.363))
+DETECTION_THRESHOLD = 0.8
+# Group photos are scaled down to this longest side before detection
+MAX_DETECT_SIZE = 1280
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+
+# Each rebuild writes a new directory holding both files; CURRENT names it
+_EMBEDDINGS_FILE = 'embeddings.npy'
+_ENTRIES_FILE = 'entries.json'
+_CURRENT_FILE = 'CURRENT'
+
+_model_lock = threading.Lock()
+_models = None
+_index_lock = threading.Lock()
+_index = None  # (index directory, entries list, memory-mapped matrix)
+
+
+class FaceRecognitionError(Exception):
+    pass
+
+
+def _libraries():
+    try:
+        import numpy
+        import cv2
+    except ImportError:
+        raise FaceRecognitionError('Chưa cài đặt numpy/opencv, không thể nhận diện khuôn mặt.')
+    return numpy, cv2
+
+
+def available():
+    try:
+        _libraries()
+    except FaceRecognitionError:
+        return False
+    return os.path.exists(DETECTOR_MODEL) and os.path.exists(RECOGNIZER_MODEL)
+
+
+def _get_models():
+    global _models
+    if _models is None:
+        _, cv2 = _libraries()
+        if not (os.path.exists(DETECTOR_MODEL) and os.path.exists(RECOGNIZER_MODEL)):
+            raise FaceRecognitionError('Chưa có mô hình nhận diện khuôn mặt.')
+        detector = cv2.FaceDetectorYN.create(DETECTOR_MODEL, '', (320, 320), DETECTION_THRESHOLD)
+        recognizer = cv2.FaceRecognizerSF.create(RECOGNIZER_MODEL, '')
+        _models = (detector, recognizer)
+    return _models
+
+
+def _decode(data):
+    numpy, cv2 = _libraries()
+    # imdecode applies the EXIF orientation
+    image = cv2.imdecode(numpy.frombuffer(data, numpy.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise FaceRecognitionError('Không đọc được ảnh.')
+    height, width = image.shape[:2]
+    scale = MAX_DETECT_SIZE / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def embed_faces(image):
+    """
+    Detect every face in a BGR image and embed it.
+
+    Returns:
+        tuple: (k x EMBEDDING_SIZE float32 matrix of unit vectors, face areas)
+    """
+    numpy, _ = _libraries()
+    with _model_lock:
+        detector, recognizer = _get_models()
+        height, width = image.shape[:2]
+        detector.setInputSize((width, height))
+        _, detections = detector.detect(image)
+        if detections is None:
+            return numpy.zeros((0, EMBEDDING_SIZE), numpy.float32), []
+        features = [recognizer.feature(recognizer.alignCrop(image, face)) for face in detections]
+
+    matrix = numpy.vstack(features).astype(numpy.float32)
+    matrix /= numpy.linalg.norm(matrix, axis=1, keepdims=True)
+    areas = [float(face[2] * face[3]) for face in detections]
+    return matrix, areas
+
+
+def _embed_photo(photo):
+    path = large_photo_path(photo)
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        matrix, areas = embed_faces(_decode(f.read()))
+    if not areas:
+        return None
+    # Enrollment photos should show one child; take the largest face
+    return matrix[max(range(len(areas)), key=areas.__getitem__)]
+
+
+def _current_dir():
+    """
+    The directory of the published index, or FACE_INDEX_DIR itself for an
+    index built before versioned directories
+    """
+    try:
+        with open(os.path.join(FACE_INDEX_DIR, _CURRENT_FILE)) as f:
+            return os.path.join(FACE_INDEX_DIR, f.read().strip())
+    except FileNotFoundError:
+        return FACE_INDEX_DIR
+
+
+def _read_index(directory):
+    numpy, _ = _libraries()
+    empty = (directory, [], numpy.zeros((0, EMBEDDING_SIZE), numpy.float32))
+    entries_path = os.path.join(directory, _ENTRIES_FILE)
+    if not os.path.exists(entries_path):
+        return empty
+    with open(entries_path) as f:
+        entries = [tuple(entry) for entry in json.load(f)]
+    if not entries:
+        return empty
+    matrix = numpy.load(os.path.join(directory, _EMBEDDINGS_FILE), mmap_mode='r')
+    if matrix.shape[0] != len(entries):
+        logger.error(f"Face index in {directory} is inconsistent, ignoring it")
+        return empty
+    return directory, entries, matrix
+
+
+def load_index():
+    """
+    The current index, reopened when another process has published a new one.
+
+    Returns:
+        tuple: (list of (student_id, photo key), memory-mapped matrix)
+    """
+    global _index
+    directory = _current_dir()
+    with _index_lock:
+        if _index is None or _index[0] != directory:
+            try:
+                _index = _read_index(directory)
+            except FileNotFoundError:
+                # Removed by a rebuild after two newer ones; keep the one loaded
+                if _index is None:
+                    raise
+        return _index[1], _index[2]
+
+
+def _publish(matrix, entries):
+    """
+    Write the matrix and entry list to a new directory, then switch CURRENT
+    to it with one atomic rename, so readers see both old or both new.
+    Directories older than the previous index are removed.
+    """
+    numpy, _ = _libraries()
+    os.makedirs(FACE_INDEX_DIR, exist_ok=True)
+    previous = os.path.basename(_current_dir())
+    directory = tempfile.mkdtemp(prefix='index-', dir=FACE_INDEX_DIR)
+    with open(os.path.join(directory, _EMBEDDINGS_FILE), 'wb') as f:
+        numpy.save(f, matrix)
+    with open(os.path.join(directory, _ENTRIES_FILE), 'w') as f:
+        json.dump([list(entry) for entry in entries], f)
+    os.chmod(directory, 0o755)
+
+    with tempfile.NamedTemporaryFile('w', dir=FACE_INDEX_DIR, delete=False) as f:
+        f.write(os.path.basename(directory))
+    os.replace(f.name, os.path.join(FACE_INDEX_DIR, _CURRENT_FILE))
+
+    # Readers that looked up the previous index may still be opening it
+    for name in os.listdir(FACE_INDEX_DIR):
+        if name.startswith('index-') and name not in (os.path.basename(directory), previous):
+            shutil.rmtree(os.path.join(FACE_INDEX_DIR, name), ignore_errors=True)
+
+
+def refresh_index(students):
+    """
+    Bring the on-disk index in line with the students' current photos,
+    embedding only photos that are new or changed.
+
+    Args:
+        students (iterable): Active Student rows
+
+    Returns:
+        tuple: (embedded, reused, without a usable face) counts
+    """
+    numpy, _ = _libraries()
+    entries, matrix = load_index()
+    existing = {entry: row for row, entry in enumerate(entries)}
+
+    new_entries = []
+    rows = []
+    embedded = reused = skipped = 0
+    for student in students:
+        if not is_processed(student.photo):
+            continue
+        entry = (student.id, student.photo)
+        if entry in existing:
+            rows.append(numpy.array(matrix[existing[entry]]))
+            reused += 1
+        else:
+            vector = _embed_photo(student.photo)
+            if vector is None:
+                skipped += 1
+                continue
+            rows.append(vector)
+            embedded += 1
+        new_entries.append(entry)
+
+    if not embedded and new_entries == entries:
+        return embedded, reused, skipped
+
+    new_matrix = numpy.vstack(rows).astype(numpy.float32) if rows else numpy.zeros((0, EMBEDDING_SIZE), numpy.float32)
+    _publish(new_matrix, new_entries)
+
+    logger.info(f"Face index: {embedded} embedded, {reused} reused, {skipped} without a face")
+    return embedded, reused, skipped
+
+
+def match_photo(data):
+    """
+    Find the students in a (group) photo.
+
+    Every detected face is compared with every indexed student in one
+    matrix product; pairs are then taken best-first so that each face and
+    each student is used at most once.
+
+    Args:
+        data (bytes): The uploaded photo
+
+    Returns:
+        tuple: (list of (student_id, similarity) matched, number of faces found)
+    """
+    numpy, _ = _libraries()
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise FaceRecognitionError('Ảnh quá lớn (tối đa 15 MB).')
+
+    entries, matrix = load_index()
+    faces, _ = embed_faces(_decode(data))
+    if not len(faces) or not entries:
+        return [], len(faces)
+
+    similarity = faces @ matrix.T  # faces x students, cosine similarity
+    face_idx, student_idx = numpy.nonzero(similarity >= MATCH_THRESHOLD)
+    order = numpy.argsort(-similarity[face_idx, student_idx])
+
+    matched = []
+    used_faces = set()
+    used_students = set()
+    for i in order:
+        face, student = int(face_idx[i]), int(student_idx[i])
+        if face in used_faces or student in used_students:
+            continue
+        used_faces.add(face)
+        used_students.add(student)
+        matched.append((entries[student][0], float(similarity[face, student])))
+    return matched, len(faces)
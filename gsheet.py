@@ -1,62 +1,123 @@
 import os
 import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import re
+import threading
+import time
 import logging
+from bisect import bisect_left
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from utils import shift_name_vi
+
+# gspread and google-auth are imported on first use: they are slow to
+# import and not needed at all when no credentials are configured.
+# Logging is configured by the application, not here.
 logger = logging.getLogger(__name__)
 
 # Google Sheets constants
 SHEET_URL = 'https://docs.google.com/spreadsheets/d/1rvI7Tftvp5fFnL79IJn6FxOstDulBOyrRQJm7DePP_s/edit'
 WORKSHEET_NAME = 'Attendance'
 
+# Each row carries a unique record key (e.g. "GV-12", "HS-34") in this column
+HEADER = ["Ngày", "Giờ", "Tên", "Trạng thái", "Ca", "Người điểm danh", "Mã"]
+KEY_COLUMN = 7
+
+# Cached client and worksheet handle, shared by all threads of the process.
+# google-auth refreshes the access token itself; the client is still rebuilt
+# periodically so that a broken session does not live forever
+CLIENT_MAX_AGE = 45 * 60  # seconds
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+AUTH_ERROR_CODES = (401, 403, 404)
+
+_cache_lock = threading.RLock()
+_cache = {
+    'creds_json': None,
+    'client': None,
+    'authorized_at': 0.0,
+    'worksheet': None,
+    'index_loaded': False
+}
+
+# Record key -> row number, maintained across appends and deletions
+_row_index = {}
+
+def invalidate_cache():
+    """
+    Drop the cached client and worksheet so the next call re-authorizes
+    """
+    with _cache_lock:
+        _cache['client'] = None
+        _cache['authorized_at'] = 0.0
+        _cache['worksheet'] = None
+        _cache['index_loaded'] = False
+        _row_index.clear()
+
 def get_gspread_client():
     """
     Get authenticated gspread client using service account credentials from environment variable
+    
+    The client is created once per process and replaced by a fresh one after
+    CLIENT_MAX_AGE, or when the credentials in the environment change. If
+    that fails the cache is cleared, so the next call starts from scratch.
     """
-    try:
-        # Get credentials from environment variable or use a default value for testing
-        creds_json = os.environ.get('GOOGLE_SHEETS_CREDS')
+    # Get credentials from environment variable or use a default value for testing
+    creds_json = os.environ.get('GOOGLE_SHEETS_CREDS')
+    
+    if not creds_json:
+        logger.warning("Google Sheets credentials not found in environment variable, using mock data")
+        # Return None to handle the case gracefully
+        return None
+    
+    with _cache_lock:
+        if creds_json != _cache['creds_json']:
+            invalidate_cache()
         
-        if not creds_json:
-            logger.warning("Google Sheets credentials not found in environment variable, using mock data")
-            # Return None to handle the case gracefully
-            return None
+        if _cache['client'] is not None and time.monotonic() - _cache['authorized_at'] <= CLIENT_MAX_AGE:
+            return _cache['client']
         
-        # Parse the JSON credentials
-        creds_dict = json.loads(creds_json)
+        # The worksheet handle and row index belong to the previous client
+        invalidate_cache()
+        try:
+            # Parse the JSON credentials
+            creds_dict = json.loads(creds_json)
+            
+            # Authenticate with service account
+            import gspread
+            client = gspread.service_account_from_dict(creds_dict, scopes=SCOPES)
         
-        # Set up credentials scope
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+        except json.JSONDecodeError:
+            logger.error("Failed to parse Google Sheets credentials JSON")
+            raise ValueError("Invalid JSON format in GOOGLE_SHEETS_CREDS")
         
-        # Authenticate with service account
-        credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+        except Exception as e:
+            logger.error(f"Error setting up Google Sheets client: {str(e)}")
+            raise
         
-        # Create gspread client
-        client = gspread.authorize(credentials)
+        _cache['creds_json'] = creds_json
+        _cache['client'] = client
+        _cache['authorized_at'] = time.monotonic()
         
         return client
-    
-    except json.JSONDecodeError:
-        logger.error("Failed to parse Google Sheets credentials JSON")
-        raise ValueError("Invalid JSON format in GOOGLE_SHEETS_CREDS")
-    
-    except Exception as e:
-        logger.error(f"Error setting up Google Sheets client: {str(e)}")
-        raise
 
-def get_worksheet():
+def open_worksheet():
     """
-    Get the attendance worksheet from the specified Google Sheet
+    Open the attendance worksheet, creating it if needed.
+
+    Unlike get_worksheet(), errors are raised to the caller so that the
+    sync worker can retry them. The handle is cached with the client.
+
+    Returns:
+        Worksheet, or None when no credentials are configured
     """
-    try:
+    with _cache_lock:
         client = get_gspread_client()
         if client is None:
-            logger.warning("No Google Sheets client available, skipping worksheet access")
             return None
         
+        if _cache['worksheet'] is not None:
+            return _cache['worksheet']
+        
+        import gspread
+
         # Open the spreadsheet
         sheet = client.open_by_url(SHEET_URL)
         
@@ -65,20 +126,168 @@ def get_worksheet():
             worksheet = sheet.worksheet(WORKSHEET_NAME)
         except gspread.exceptions.WorksheetNotFound:
             # Create a new worksheet if it doesn't exist
-            worksheet = sheet.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=6)
+            worksheet = sheet.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=len(HEADER))
             
             # Add header row
-            worksheet.append_row([
-                "Ngày", "Giờ", "Tên", "Trạng thái", "Ca", "Người điểm danh"
-            ])
+            worksheet.append_row(HEADER)
         
+        _cache['worksheet'] = worksheet
+        return worksheet
+
+def _is_auth_error(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) in AUTH_ERROR_CODES
+
+def with_worksheet(operation):
+    """
+    Run operation(worksheet) against the cached worksheet.
+    
+    On an authorization error (expired or revoked token, worksheet gone) the
+    cache is invalidated and the operation is retried once with a fresh client.
+    
+    Returns:
+        The operation's result, or None when no credentials are configured
+    """
+    for attempt in range(2):
+        worksheet = open_worksheet()
+        if worksheet is None:
+            return None
+        import gspread
+        try:
+            return operation(worksheet)
+        except gspread.exceptions.APIError as e:
+            if attempt == 0 and _is_auth_error(e):
+                logger.warning(f"Google Sheets auth error, re-authorizing: {str(e)}")
+                invalidate_cache()
+                continue
+            raise
+
+def get_worksheet():
+    """
+    Get the attendance worksheet from the specified Google Sheet
+    """
+    try:
+        worksheet = open_worksheet()
+        if worksheet is None:
+            logger.warning("No Google Sheets client available, skipping worksheet access")
         return worksheet
     
     except Exception as e:
         logger.error(f"Error getting worksheet: {str(e)}")
         return None
 
-def add_attendance_to_sheet(date, time, name, status, shift, marked_by, is_student=False):
+def record_key(record_type, record_id):
+    """
+    Unique sheet key for an attendance record
+    
+    Args:
+        record_type (str): 'teacher' or 'student'
+        record_id (int): Primary key of the attendance record
+    """
+    prefix = 'HS' if record_type == 'student' else 'GV'
+    return f"{prefix}-{record_id}"
+
+def _build_row(date, time, name, status, shift, marked_by, is_student=False, key=None):
+    """
+    Build the sheet row for an attendance record
+    """
+    return [date, time, name, status, shift_name_vi(shift), marked_by, key or ""]
+
+def _load_row_index(worksheet):
+    """
+    Rebuild the key -> row index from the key column (one API call)
+    """
+    keys = worksheet.col_values(KEY_COLUMN)
+    
+    # Sheets created before the key column existed get its header now
+    if not keys or keys[0] != HEADER[KEY_COLUMN - 1]:
+        if worksheet.col_count < KEY_COLUMN:
+            worksheet.add_cols(KEY_COLUMN - worksheet.col_count)
+        worksheet.update_cell(1, KEY_COLUMN, HEADER[KEY_COLUMN - 1])
+    
+    _row_index.clear()
+    for row, key in enumerate(keys[1:], start=2):
+        if key:
+            _row_index[key] = row
+    _cache['index_loaded'] = True
+
+def _remember_rows(keys, first_row):
+    with _cache_lock:
+        for offset, key in enumerate(keys):
+            if key:
+                _row_index[key] = first_row + offset
+
+def _forget_rows(rows):
+    """
+    Update the index after rows were deleted, in one pass over it: each
+    remaining row moves up by the number of deleted rows above it
+    """
+    deleted = sorted(set(rows))
+    with _cache_lock:
+        for key, indexed_row in list(_row_index.items()):
+            above = bisect_left(deleted, indexed_row)
+            if above < len(deleted) and deleted[above] == indexed_row:
+                del _row_index[key]
+            elif above:
+                _row_index[key] = indexed_row - above
+
+def _locate_rows(worksheet, keys, fallback_rows):
+    """
+    Find the current row of each key.
+    
+    Indexed rows are verified with one batched read of their key cells; if
+    any turned out stale (e.g. another process deleted rows) the index is
+    rebuilt from the sheet. Rows written before the key column existed are
+    located through fallback_rows, provided their key cell is still empty.
+    
+    Returns:
+        dict: key -> row number, for the keys found in the sheet
+    """
+    with _cache_lock:
+        if not _cache['index_loaded']:
+            _load_row_index(worksheet)
+        
+        candidates = {}
+        for key in keys:
+            row = _row_index.get(key) or fallback_rows.get(key)
+            if row:
+                candidates[key] = row
+        if not candidates:
+            return {}
+        
+        import gspread
+        values = worksheet.batch_get([
+            gspread.utils.rowcol_to_a1(row, KEY_COLUMN) for row in candidates.values()
+        ])
+        
+        located = {}
+        stale = False
+        for (key, row), value in zip(candidates.items(), values):
+            cell = value[0][0] if value and value[0] else ""
+            if cell == key or (not cell and key not in _row_index):
+                located[key] = row
+            else:
+                stale = True
+        
+        if stale:
+            _load_row_index(worksheet)
+            for key in keys:
+                if key not in located and key in _row_index:
+                    located[key] = _row_index[key]
+        
+        return located
+
+def _parse_row_range(response):
+    """
+    Extract the (first, last) row numbers from an append response
+    """
+    updated_range = response.get('updates', {}).get('updatedRange', '')
+    rows = [int(n) for n in re.findall(r'[A-Z]+(\d+)', updated_range.split('!')[-1])]
+    if not rows:
+        return None
+    return min(rows), max(rows)
+
+def add_attendance_to_sheet(date, time, name, status, shift, marked_by, is_student=False, key=None):
     """
     Add an attendance record to Google Sheets
     
@@ -90,40 +299,31 @@ def add_attendance_to_sheet(date, time, name, status, shift, marked_by, is_stude
         shift (str): Shift type (e.g., "morning", "afternoon", "1on1_1h")
         marked_by (str): Name of user who marked attendance
         is_student (bool): Whether this is a student attendance record
+        key (str): Unique record key from record_key()
         
     Returns:
         int: Row number in the sheet where the record was added
     """
+    def append(worksheet):
+        # Add the new row
+        row_data = _build_row(date, time, name, status, shift, marked_by, is_student, key)
+        response = worksheet.append_row(row_data)
+        
+        # The append response tells us which row was written
+        row_range = _parse_row_range(response)
+        if row_range is None:
+            logger.warning(f"Could not find added row for {name}")
+            return None
+        
+        _remember_rows([key], row_range[0])
+        return row_range[0]
+    
     try:
-        worksheet = get_worksheet()
-        if worksheet is None:
+        if open_worksheet() is None:
             logger.warning("No worksheet available, skipping add operation to Google Sheets")
             return None
         
-        # Format shift name in Vietnamese
-        shift_vi = {
-            "morning": "Sáng",
-            "afternoon": "Chiều",
-            "1on1_1h": "1-1 (1 giờ)",
-            "1on1_1.5h": "1-1 (1.5 giờ)",
-            "1on1_2h": "1-1 (2 giờ)",
-            "Học sinh": "Học sinh"
-        }.get(shift, shift)
-        
-        # Add the new row
-        row_data = [date, time, name, status, shift_vi, marked_by]
-        worksheet.append_row(row_data)
-        
-        # Get the row number where the data was added
-        # We find all matching cells and get the latest one
-        cell_list = worksheet.findall(name)
-        if cell_list:
-            # Get the latest added row
-            row_num = max(cell.row for cell in cell_list)
-            return row_num
-        else:
-            logger.warning(f"Could not find added row for {name}")
-            return None
+        return with_worksheet(append)
     
     except Exception as e:
         logger.error(f"Error adding attendance to sheet: {str(e)}")
@@ -144,16 +344,94 @@ def delete_attendance_from_sheet(row_id):
             logger.warning("No row_id provided for deletion")
             return False
         
-        worksheet = get_worksheet()
-        if worksheet is None:
+        if open_worksheet() is None:
             logger.warning("No worksheet available, skipping delete operation from Google Sheets")
             return False
         
         # Delete the row
-        worksheet.delete_row(row_id)
+        def delete(worksheet):
+            worksheet.delete_rows(row_id)
+            _forget_rows([row_id])
+            return True
         
-        return True
+        return with_worksheet(delete) is not None
     
     except Exception as e:
         logger.error(f"Error deleting attendance from sheet: {str(e)}")
         return False
+
+def append_attendance_rows(records):
+    """
+    Append several attendance records to Google Sheets in one API call
+    
+    Args:
+        records (list): Dicts with the keyword arguments of add_attendance_to_sheet
+        
+    Returns:
+        list: Row number for each record, in order, or None when Sheets is not configured
+        
+    Raises:
+        Exception: Any API error, so the caller can retry the batch
+    """
+    if not records:
+        return [] if open_worksheet() is not None else None
+    
+    rows = [_build_row(**record) for record in records]
+    response = with_worksheet(lambda worksheet: worksheet.append_rows(rows))
+    if response is None:
+        return None
+    
+    row_range = _parse_row_range(response)
+    if row_range is None:
+        logger.warning("Could not determine rows written by append_rows")
+        return [None] * len(records)
+    
+    first_row = row_range[0]
+    _remember_rows([record.get('key') for record in records], first_row)
+    return [first_row + i for i in range(len(records))]
+
+def delete_attendance_rows(keys, fallback_rows=None):
+    """
+    Delete several attendance records from Google Sheets by record key
+    
+    All rows are removed with a single batch_update, ordered from the bottom
+    row up so that each request's row index is still valid when it is applied.
+    
+    Args:
+        keys (list): Record keys from record_key()
+        fallback_rows (dict): Optional key -> stored row number, for rows
+            appended before the key column existed
+        
+    Returns:
+        bool: False when Sheets is not configured
+        
+    Raises:
+        Exception: Any API error, so the caller can retry
+    """
+    def delete(worksheet):
+        rows = _locate_rows(worksheet, keys, fallback_rows or {})
+        for key in keys:
+            if key not in rows:
+                logger.warning(f"Row for {key} not found in Google Sheets, nothing to delete")
+        
+        bottom_up = sorted(set(rows.values()), reverse=True)
+        if not bottom_up:
+            return True
+        
+        worksheet.spreadsheet.batch_update({
+            'requests': [{
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': worksheet.id,
+                        'dimension': 'ROWS',
+                        'startIndex': row - 1,
+                        'endIndex': row
+                    }
+                }
+            } for row in bottom_up]
+        })
+        
+        _forget_rows(bottom_up)
+        return True
+    
+    return with_worksheet(delete) is not None
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings, read automatically from the working directory:
+
+    gunicorn main:app
+
+The app is imported once in the master and the workers are forked from
+it, so they share its memory copy-on-write and start in milliseconds.
+Nothing that must not cross a fork is created before it: pooled database
+connections are dropped in each worker, and the Google Sheets sync thread
+is started there rather than in the master.
+"""
+import gc
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads keep a worker responsive while dashboard SSE streams are open
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Each SSE stream holds one of those threads; keep half for page requests
+os.environ.setdefault('LIVE_MAX_STREAMS', str(max(1, threads // 2)))
+preload_app = True
+
+# Read before create_app() runs in the master, which must not start it
+_sheet_sync = os.environ.get('SHEET_SYNC_WORKER', '1') == '1'
+os.environ['SHEET_SYNC_WORKER'] = '0'
+
+
+def when_ready(server):
+    # Move everything allocated while loading the app out of the collector's
+    # reach, so that collections in the workers do not write to (and copy)
+    # the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from extensions import db
+    import sheet_sync
+
+    app = server.app.wsgi()
+    with app.app_context():
+        # Connections opened in the master (migrations) belong to it;
+        # close=False leaves them to the master instead of closing its sockets
+        db.engine.dispose(close=False)
+    if _sheet_sync:
+        sheet_sync.start_worker(app)
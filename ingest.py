@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from database import is_unique_violation
+from models import IngestEvent
+from attendance import clock_in, mark_students, TEACHER_ONCE_PER_SHIFT, STUDENT_ONCE_PER_DAY
+from schedule import get_schedule
+import sheet_sync
+
+ingest_bp = Blueprint('ingest', __name__)
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+MAX_EVENTS = 200
+MAX_KEY_LENGTH = 64
+# Events older than this are rejected, so keys only need to be kept a bit longer
+MAX_EVENT_AGE = timedelta(days=2)
+KEY_RETENTION = timedelta(days=7)
+# Tolerated clock skew for timestamps in the future
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Malformed events are not stored against their key, so the client can
+# correct them and resend with the same key
+TRANSIENT_RESULTS = {'invalid'}
+
+
+def _parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp; naive values are taken as Vietnam time.
+
+    Returns:
+        datetime: Aware datetime in Vietnam timezone, or None if invalid
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        return vietnam_tz.localize(timestamp)
+    return timestamp.astimezone(vietnam_tz)
+
+
+def _apply_clock_in(event, when):
+    teacher = current_user.teacher
+    if current_user.is_admin or teacher is None:
+        return 'forbidden'
+    shift = get_schedule().get(event.get('shift_type'))
+    if shift is None:
+        return 'invalid'
+    if not (shift.start <= when.time() <= shift.end):
+        return 'out_of_window'
+    clock_in(teacher, shift, when, current_user)
+    return 'ok'
+
+
+def _apply_mark_student(event, when):
+    try:
+        student_id = int(event.get('student_id'))
+    except (TypeError, ValueError):
+        return 'invalid'
+    result = mark_students({student_id}, when, current_user)[student_id]
+    return {'marked': 'ok', 'already_marked': 'already_recorded'}.get(result, result)
+
+
+HANDLERS = {
+    'clock_in': _apply_clock_in,
+    'mark_student': _apply_mark_student
+}
+
+
+def _validate(event, now):
+    """
+    Check the parts of an event that do not touch the database.
+
+    Returns:
+        tuple: (result or None if the event can be applied, event time)
+    """
+    if event.get('type') not in HANDLERS:
+        return 'invalid', None
+    when = _parse_timestamp(event.get('timestamp'))
+    if when is None:
+        return 'invalid', None
+    if when > now + MAX_CLOCK_SKEW:
+        return 'invalid', None
+    if when < now - MAX_EVENT_AGE:
+        return 'expired', None
+    if when.weekday() == 6:
+        return 'sunday', None
+    return None, when
+
+
+def _store(event, result, now):
+    """
+    Record the result for an event key in a savepoint.
+
+    Returns:
+        str: The stored result; a concurrent request may have stored its own first
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.add(IngestEvent(
+                user_id=current_user.id,
+                key=event['key'],
+                event_type=event['type'],
+                result=result,
+                created_at=now.replace(tzinfo=None)
+            ))
+        return result
+    except IntegrityError:
+        return db.session.get(IngestEvent, (current_user.id, event['key'])).result
+
+
+def _apply(event, when, now):
+    """
+    Apply one event and record its key, inside a savepoint so that a
+    failing event does not undo the rest of the batch.
+
+    Returns:
+        str: The result for this event
+    """
+    try:
+        with db.session.begin_nested():
+            result = HANDLERS[event['type']](event, when)
+            if result in TRANSIENT_RESULTS:
+                return result
+            db.session.add(IngestEvent(
+                user_id=current_user.id,
+                key=event['key'],
+                event_type=event['type'],
+                result=result,
+                created_at=now.replace(tzinfo=None)
+            ))
+        return result
+    except IntegrityError as e:
+        duplicates = (TEACHER_ONCE_PER_SHIFT, STUDENT_ONCE_PER_DAY, IngestEvent.__table__.primary_key)
+        if not any(is_unique_violation(e, constraint) for constraint in duplicates):
+            raise
+
+    # Either the attendance already exists or a concurrent request stored
+    # this key first; _store() tells the two apart
+    return _store(event, 'already_recorded', now)
+
+
+@ingest_bp.route('/api/attendance/events', methods=['POST'])
+@login_required
+def ingest_events():
+    """
+    Apply a batch of attendance events queued by a client while offline.
+
+    Body: {"events": [{"key", "type", "timestamp", "shift_type" | "student_id"}]}
+    Response: {"results": [...]}, one result per event, in order.
+
+    Replaying an event with a key that was already applied returns the
+    stored result and changes nothing.
+    """
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+    if not isinstance(events, list) or len(events) > MAX_EVENTS:
+        return jsonify({'error': 'invalid batch'}), 400
+
+    now = datetime.now(vietnam_tz)
+
+    keys = {
+        event['key'] for event in events
+        if isinstance(event, dict) and isinstance(event.get('key'), str)
+    }
+    # One query for all keys already seen
+    stored = {}
+    if keys:
+        stored = dict(db.session.query(IngestEvent.key, IngestEvent.result).filter(
+            IngestEvent.user_id == current_user.id,
+            IngestEvent.key.in_(keys)
+        ).all())
+
+    results = []
+    for event in events:
+        if not isinstance(event, dict):
+            results.append('invalid')
+            continue
+        key = event.get('key')
+        if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+            results.append('invalid')
+            continue
+        if key in stored:
+            results.append(stored[key])
+            continue
+
+        result, when = _validate(event, now)
+        if result is None:
+            result = _apply(event, when, now)
+        elif result not in TRANSIENT_RESULTS:
+            result = _store(event, result, now)
+        if result not in TRANSIENT_RESULTS:
+            stored[key] = result
+        results.append(result)
+
+    # Keys are only needed while a retry could still be accepted
+    IngestEvent.query.filter(
+        IngestEvent.created_at < (now - KEY_RETENTION).replace(tzinfo=None)
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    sheet_sync.notify()
+
+    return jsonify({'results': results})
@@ -0,0 +1,275 @@
+"""
+Live attendance updates for the admin dashboard over Server-Sent Events.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, request, flash, redirect, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import event, delete, func, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import TeacherAttendance, StudentAttendance, LiveEvent
+from utils import get_vietnam_time
+
+logger = logging.getLogger(__name__)
+
+live_bp = Blueprint('live', __name__)
+
+BUFFER_SIZE = 1000
+# Seconds between polls of live_events; a local commit wakes the poller early
+POLL_INTERVAL = 1
+# Rows below the newest id seen are polled again, since concurrent
+# transactions can commit out of id order
+LOOKBACK = 100
+RETENTION = timedelta(days=1)
+PRUNE_EVERY = 600  # polls
+# Comment lines keep proxies from closing an idle stream
+HEARTBEAT_INTERVAL = 15
+# How long the browser waits before reconnecting, in ms
+RETRY_MS = 3000
+# Each open stream holds a worker thread; leave the rest for other requests
+MAX_STREAMS = int(os.environ.get('LIVE_MAX_STREAMS', 4))
+
+
+class Broker:
+    """
+    Fan-out of polled events to the dashboard streams of this process.
+
+    Positions are "<epoch>-<n>"; the epoch is per process, so a stream that
+    reconnects to another worker is recognised and sent a snapshot.
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._frames = deque(maxlen=size)  # (n, encoded SSE frame)
+        self._last = 0
+        self._streams = 0
+        self._wakeup = threading.Event()
+        self._poller = None
+
+    @property
+    def position(self):
+        with self._condition:
+            return f'{self.epoch}-{self._last}'
+
+    def publish(self, rows):
+        with self._condition:
+            for event_type, payload in rows:
+                self._last += 1
+                self._frames.append((self._last, f'id: {self.epoch}-{self._last}\nevent: {event_type}\ndata: {payload}\n\n'))
+            self._condition.notify_all()
+
+    def open_stream(self):
+        with self._condition:
+            if self._streams >= MAX_STREAMS:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self._streams -= 1
+
+    def parse(self, position):
+        """
+        The sequence number of a position from this process, or None
+        """
+        epoch, _, n = (position or '').partition('-')
+        if epoch != self.epoch or not n.isdigit() or int(n) > self._last:
+            return None
+        return int(n)
+
+    def wait(self, after, timeout):
+        """
+        Frames published after sequence number `after`, waiting up to
+        `timeout` seconds for the first one.
+
+        Returns:
+            tuple: (list of frames, or None if some already left the buffer;
+            new sequence number)
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._last != after, timeout)
+            if self._last == after:
+                return [], after
+            oldest = self._frames[0][0]
+            if after + 1 < oldest:
+                return None, self._last
+            frames = [frame for n, frame in self._frames if n > after]
+            return frames, self._last
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self, app):
+        """
+        Start polling live_events (once per process, after any fork).
+
+        Called inside an app context before reading `position`: events
+        committed from here on are published after that position.
+        """
+        with self._condition:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            newest = db.session.scalar(select(func.max(LiveEvent.id))) or 0
+            seen = set(db.session.scalars(select(LiveEvent.id).where(LiveEvent.id > newest - LOOKBACK)))
+            self._poller = threading.Thread(target=self._poll, args=(app, newest, seen), name='live-events', daemon=True)
+            self._poller.start()
+
+    def _poll(self, app, newest, seen):
+        polls = 0
+        while True:
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+            polls += 1
+            try:
+                with app.app_context():
+                    rows = db.session.execute(
+                        select(LiveEvent.id, LiveEvent.event_type, LiveEvent.payload).
+                        where(LiveEvent.id > newest - LOOKBACK).order_by(LiveEvent.id)
+                    ).all()
+                    if polls % PRUNE_EVERY == 0:
+                        db.session.execute(delete(LiveEvent).where(LiveEvent.created_at < datetime.utcnow() - RETENTION))
+                        db.session.commit()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Polling live_events failed")
+                continue
+
+            fresh = [row for row in rows if row.id not in seen]
+            if fresh:
+                self.publish([(row.event_type, row.payload) for row in fresh])
+                seen.update(row.id for row in fresh)
+                newest = max(newest, fresh[-1].id)
+                seen = {event_id for event_id in seen if event_id > newest - LOOKBACK}
+
+
+broker = Broker()
+
+
+def snapshot(today):
+    """
+    Today's teacher and student attendance, as the dashboard shows it
+    """
+    teacher = db.session.execute(
+        select(TeacherAttendance.id, TeacherAttendance.teacher_id, TeacherAttendance.shift_type).
+        where(TeacherAttendance.date == today)
+    ).all()
+    student = db.session.execute(
+        select(StudentAttendance.id, StudentAttendance.student_id, StudentAttendance.time).
+        where(StudentAttendance.date == today)
+    ).all()
+    return {
+        'date': today.isoformat(),
+        'teacher': [{'id': id, 'teacher_id': teacher_id, 'shift_type': shift_type} for id, teacher_id, shift_type in teacher],
+        'student': [{'id': id, 'student_id': student_id, 'time': time.strftime('%H:%M:%S')} for id, student_id, time in student]
+    }
+
+
+def _snapshot_frame(app):
+    with app.app_context():
+        data = snapshot(get_vietnam_time().date())
+        db.session.remove()
+    return f'event: snapshot\ndata: {json.dumps(data)}\n\n'
+
+
+def _stream(app, after, first):
+    yield f'retry: {RETRY_MS}\n\n'
+    if first:
+        yield first
+    while True:
+        frames, latest = broker.wait(after, HEARTBEAT_INTERVAL)
+        if frames is None:
+            # Fell behind the buffer: resend the whole state instead
+            after = latest
+            yield _snapshot_frame(app)
+            continue
+        after = latest
+        yield ''.join(frames) if frames else ': keepalive\n\n'
+
+
+@live_bp.route('/admin/dashboard/stream')
+@login_required
+def dashboard_stream():
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập trang này!', 'danger')
+        return redirect('/')
+
+    if not broker.open_stream():
+        return Response('Quá nhiều kết nối.', status=503, headers={'Retry-After': '30'})
+
+    app = current_app._get_current_object()
+    try:
+        broker.start(app)
+
+        # EventSource sends Last-Event-ID when it reconnects by itself
+        position = request.headers.get('Last-Event-ID') or request.args.get('after')
+        after = broker.parse(position)
+        first = None
+        if after is None:
+            # Rendered by, or last connected to, another worker: start from a
+            # snapshot taken after this worker's current position
+            after = broker.parse(broker.position)
+            first = f'event: snapshot\ndata: {json.dumps(snapshot(get_vietnam_time().date()))}\n\n'
+    except Exception:
+        # No response will close the stream, so give its slot back now
+        broker.close_stream()
+        raise
+    db.session.remove()
+
+    # The generator runs without the request context and only borrows a
+    # connection to build a snapshot
+    response = Response(_stream(app, after, first), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Called when the server closes the response, including when the
+    # client went away before the first event
+    response.call_on_close(broker.close_stream)
+    return response
+
+
+def _describe(record):
+    if isinstance(record, TeacherAttendance):
+        return {'kind': 'teacher', 'id': record.id, 'teacher_id': record.teacher_id, 'shift_type': record.shift_type,
+                'date': record.date.isoformat(), 'time': record.time.strftime('%H:%M:%S')}
+    return {'kind': 'student', 'id': record.id, 'student_id': record.student_id,
+            'date': record.date.isoformat(), 'time': record.time.strftime('%H:%M:%S')}
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_events(session, flush_context):
+    """
+    Write an event row for every attendance insert and delete, in the same
+    transaction, so it is committed or rolled back with the change itself.
+    """
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, (TeacherAttendance, StudentAttendance)):
+            rows.append(('clock_in' if isinstance(obj, TeacherAttendance) else 'student_marked', _describe(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, (TeacherAttendance, StudentAttendance)):
+            rows.append(('attendance_deleted', _describe(obj)))
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    session.connection().execute(LiveEvent.__table__.insert(), [
+        {'event_type': event_type, 'payload': json.dumps(data, ensure_ascii=False), 'created_at': now}
+        for event_type, data in rows
+    ])
+    session.info['live_events'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_poller(session):
+    if session.info.pop('live_events', False):
+        broker.wake()
@@ -0,0 +1,220 @@
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, g, request, jsonify, flash, redirect, url_for, has_request_context
+from flask_login import login_required, current_user
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+from extensions import db
+from models import SheetOutbox
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+ENABLED = os.environ.get('REQUEST_METRICS', '1') == '1'
+# Requests slower than this many ms are logged with their SQL; unset = off
+SLOW_REQUEST_MS = float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+# The same statement this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+SLOWEST_PER_REQUEST = 5
+SLOWEST_OVERALL = 20
+
+# Upper bounds of the latency histogram buckets, in ms; the last is +Inf
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_routes = {}
+_slowest = []  # min-heap of (duration_ms, endpoint, statement)
+
+# Expanded IN lists differ in length from call to call; collapse them
+_IN_LIST = re.compile(r'\(\s*(?:(?:\?|%\(\w+\)s|:\w+)\s*,\s*)+(?:\?|%\(\w+\)s|:\w+)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """
+    Statement text with whitespace and IN lists normalised, so repeats of
+    the same query with different parameters compare equal
+    """
+    return _IN_LIST.sub('(?)', _SPACES.sub(' ', statement).strip())
+
+
+class _RequestStats:
+    __slots__ = ('started', 'queries', 'sql_ms', 'slowest', 'shapes')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest = []  # min-heap of (duration_ms, statement)
+        self.shapes = {}
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    starts = conn.info.get('_query_started')
+    if stats is None or not starts:
+        return
+    duration = (time.perf_counter() - starts.pop()) * 1000
+
+    stats.queries += 1
+    stats.sql_ms += duration
+    shape = statement_shape(statement)
+    stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+    entry = (duration, shape)
+    if len(stats.slowest) < SLOWEST_PER_REQUEST:
+        heapq.heappush(stats.slowest, entry)
+    elif entry > stats.slowest[0]:
+        heapq.heapreplace(stats.slowest, entry)
+
+
+class _RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.latency_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_ms = 0.0
+        self.n_plus_one = 0
+        self.last_n_plus_one = None
+
+    def as_dict(self):
+        cumulative = []
+        total = 0
+        for count in self.buckets:
+            total += count
+            cumulative.append(total)
+        return {
+            'requests': self.requests,
+            'latency_ms_sum': round(self.latency_ms, 3),
+            'latency_ms_buckets': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], cumulative)),
+            'queries_total': self.queries,
+            'queries_max': self.max_queries,
+            'sql_ms_sum': round(self.sql_ms, 3),
+            'n_plus_one_requests': self.n_plus_one,
+            'last_n_plus_one': self.last_n_plus_one
+        }
+
+
+def _record(endpoint, latency_ms, stats, repeated):
+    with _lock:
+        route = _routes.get(endpoint)
+        if route is None:
+            route = _routes[endpoint] = _RouteStats()
+        route.requests += 1
+        route.latency_ms += latency_ms
+        route.buckets[bisect_left(LATENCY_BUCKETS, latency_ms)] += 1
+        route.queries += stats.queries
+        route.max_queries = max(route.max_queries, stats.queries)
+        route.sql_ms += stats.sql_ms
+        if repeated:
+            route.n_plus_one += 1
+            route.last_n_plus_one = [{'statement': shape, 'count': count} for shape, count in repeated]
+
+        for duration, shape in stats.slowest:
+            entry = (duration, endpoint, shape)
+            if len(_slowest) < SLOWEST_OVERALL:
+                heapq.heappush(_slowest, entry)
+            elif entry > _slowest[0]:
+                heapq.heapreplace(_slowest, entry)
+
+
+@metrics_bp.before_app_request
+def _start_request():
+    if ENABLED:
+        g._request_stats = _RequestStats()
+
+
+@metrics_bp.after_app_request
+def _finish_request(response):
+    stats = g.pop('_request_stats', None)
+    if stats is None:
+        return response
+
+    latency_ms = (time.perf_counter() - stats.started) * 1000
+    endpoint = request.endpoint or 'unmatched'
+    repeated = sorted(
+        ((shape, count) for shape, count in stats.shapes.items() if count >= N_PLUS_ONE_THRESHOLD),
+        key=lambda item: -item[1]
+    )
+    _record(endpoint, latency_ms, stats, repeated)
+
+    if repeated:
+        shape, count = repeated[0]
+        logger.warning(f"Possible N+1 in {endpoint}: {count} x {shape[:200]}")
+
+    if SLOW_REQUEST_MS is not None and latency_ms >= SLOW_REQUEST_MS:
+        slowest = '; '.join(f"{duration:.1f}ms {shape[:120]}" for duration, shape in sorted(stats.slowest, reverse=True))
+        logger.warning(
+            f"Slow request {request.method} {request.path} ({endpoint}): {latency_ms:.1f}ms, "
+            f"{stats.queries} queries, {stats.sql_ms:.1f}ms SQL. Slowest: {slowest}"
+        )
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={stats.sql_ms:.1f};desc="{stats.queries} queries", app;dur={latency_ms:.1f}'
+    )
+    return response
+
+
+def snapshot():
+    """
+    Copy of the metrics collected by this process since it started
+    """
+    with _lock:
+        return {
+            'routes': {endpoint: route.as_dict() for endpoint, route in sorted(_routes.items())},
+            'slowest_statements': [
+                {'duration_ms': round(duration, 3), 'endpoint': endpoint, 'statement': shape}
+                for duration, endpoint, shape in sorted(_slowest, reverse=True)
+            ]
+        }
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+        _slowest.clear()
+
+
+def sheet_queue_depth():
+    """
+    Outbox entries by status, e.g. {'pending': 3, 'failed': 0}
+    """
+    depth = {'pending': 0, 'failed': 0}
+    for status, count in db.session.query(SheetOutbox.status, func.count(SheetOutbox.id)).group_by(SheetOutbox.status):
+        depth[status] = count
+    return depth
+
+
+@metrics_bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập vào trang này.', 'danger')
+        return redirect(url_for('attendance.teacher_home'))
+
+    data = snapshot()
+    data['sheet_queue'] = sheet_queue_depth()
+    data['process'] = os.getpid()
+    return jsonify(data)
@@ -0,0 +1,237 @@
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Ordered list of (version, description, function); see @migration below
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+    Register a schema migration. Migrations run once, in version order, each
+    in its own transaction, and must be safe to re-run on a schema that
+    db.create_all() has already brought up to date.
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _add_column_if_missing(conn, table, column, ddl):
+    columns = {c['name'] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+@migration(1, 'Add columns used by the attendance views')
+def add_attendance_columns(conn):
+    _add_column_if_missing(conn, 'students', 'active', 'BOOLEAN DEFAULT TRUE')
+    _add_column_if_missing(conn, 'teachers', 'active', 'BOOLEAN DEFAULT TRUE')
+    _add_column_if_missing(conn, 'teacher_attendance', 'shift_type', 'VARCHAR(20)')
+    _add_column_if_missing(conn, 'teacher_attendance', 'time', 'TIME')
+    _add_column_if_missing(conn, 'teacher_attendance', 'marked_by_id', 'INTEGER REFERENCES users (id)')
+    _add_column_if_missing(conn, 'teacher_attendance', 'gsheet_row_id', 'INTEGER')
+    _add_column_if_missing(conn, 'student_attendance', 'gsheet_row_id', 'INTEGER')
+
+
+def _queue_sheet_deletes(conn, record_type, rows):
+    """
+    Queue the Sheets removal of attendance rows deleted by a migration;
+    unclaimed appends are cancelled and claimed ones superseded, as in
+    sheet_sync.enqueue_deletes()
+    """
+    import gsheet
+
+    ids = [row.id for row in rows]
+    if not ids:
+        return
+    conn.execute(text(
+        "DELETE FROM sheet_outbox WHERE op = 'append' AND claimed_by IS NULL"
+        " AND record_type = :record_type AND record_id IN :ids"
+    ).bindparams(bindparam('ids', expanding=True)), {'record_type': record_type, 'ids': ids})
+    conn.execute(text(
+        "UPDATE sheet_outbox SET status = 'superseded' WHERE op = 'append'"
+        " AND record_type = :record_type AND record_id IN :ids"
+    ).bindparams(bindparam('ids', expanding=True)), {'record_type': record_type, 'ids': ids})
+
+    now = datetime.utcnow()
+    conn.execute(text(
+        'INSERT INTO sheet_outbox (op, record_type, record_id, payload, status, attempts, created_at, next_attempt_at) '
+        "VALUES ('delete', :record_type, :record_id, :payload, 'pending', 0, :now, :now)"
+    ), [{
+        'record_type': record_type,
+        'record_id': row.id,
+        'payload': json.dumps({'key': gsheet.record_key(record_type, row.id), 'row_id': row.gsheet_row_id}),
+        'now': now
+    } for row in rows])
+
+
+@migration(2, 'Remove duplicate attendance so the unique indexes can be built')
+def dedupe_attendance(conn):
+    duplicates = {
+        'teacher': conn.execute(text(
+            'SELECT id, gsheet_row_id FROM teacher_attendance WHERE shift_type IS NOT NULL AND id NOT IN ('
+            ' SELECT MIN(id) FROM teacher_attendance WHERE shift_type IS NOT NULL'
+            ' GROUP BY teacher_id, date, shift_type)'
+        )).all(),
+        'student': conn.execute(text(
+            'SELECT id, gsheet_row_id FROM student_attendance WHERE id NOT IN ('
+            ' SELECT MIN(id) FROM student_attendance GROUP BY student_id, date)'
+        )).all()
+    }
+
+    for record_type, table in (('teacher', 'teacher_attendance'), ('student', 'student_attendance')):
+        rows = duplicates[record_type]
+        if not rows:
+            continue
+        ids = [row.id for row in rows]
+        conn.execute(
+            text(f'DELETE FROM {table} WHERE id IN :ids').bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids}
+        )
+        # The rows may already be in the sheet
+        _queue_sheet_deletes(conn, record_type, rows)
+        logger.warning(f"Removed {len(ids)} duplicate {record_type} attendance records: {ids}")
+
+
+@migration(3, 'Composite indexes and once-per-day unique constraints')
+def attendance_indexes(conn):
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_teacher_attendance_teacher_date_shift '
+        'ON teacher_attendance (teacher_id, date, shift_type)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_teacher_attendance_date ON teacher_attendance (date)'
+    ))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_student_attendance_student_date '
+        'ON student_attendance (student_id, date)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_student_attendance_date ON student_attendance (date)'
+    ))
+
+
+@migration(4, 'Build teacher/month and student/day statistics tables')
+def build_stats(conn):
+    from stats import rebuild_stats
+    rebuild_stats(conn)
+
+
+@migration(5, 'Shift codes and the default shift schedule')
+def shift_codes(conn):
+    from schedule import DEFAULT_SHIFTS
+    _add_column_if_missing(conn, 'shifts', 'code', 'VARCHAR(20)')
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_shifts_code ON shifts (code)'))
+
+    existing = {row[0] for row in conn.execute(text('SELECT code FROM shifts WHERE code IS NOT NULL'))}
+    missing = [shift for shift in DEFAULT_SHIFTS if shift['code'] not in existing]
+    if missing:
+        conn.execute(text(
+            'INSERT INTO shifts (code, name, start_time, end_time, duration, one_on_one) '
+            'VALUES (:code, :name, :start_time, :end_time, :duration, :one_on_one)'
+        ), missing)
+
+
+# teacher_attendance as the models declare it; check_in and shift_id are
+# left from the original schema and no longer filled in
+_TEACHER_ATTENDANCE_DDL = (
+    'CREATE TABLE teacher_attendance ('
+    ' id INTEGER NOT NULL PRIMARY KEY,'
+    ' teacher_id INTEGER NOT NULL REFERENCES teachers (id),'
+    ' shift_id INTEGER REFERENCES shifts (id),'
+    ' shift_type VARCHAR(20),'
+    ' date DATE NOT NULL,'
+    ' time TIME,'
+    ' check_in TIME,'
+    ' marked_by_id INTEGER REFERENCES users (id),'
+    ' notes VARCHAR(255),'
+    ' gsheet_row_id INTEGER)'
+)
+
+
+@migration(6, 'Make the legacy teacher_attendance check_in and shift_id columns nullable')
+def nullable_legacy_columns(conn):
+    columns = {c['name']: c for c in inspect(conn).get_columns('teacher_attendance')}
+    legacy = [name for name in ('check_in', 'shift_id') if name in columns and not columns[name]['nullable']]
+    if not legacy:
+        return
+
+    if conn.dialect.name != 'sqlite':
+        for name in legacy:
+            conn.execute(text(f'ALTER TABLE teacher_attendance ALTER COLUMN {name} DROP NOT NULL'))
+    else:
+        # SQLite cannot alter a column: copy into a new table and swap it in
+        conn.execute(text('DROP INDEX IF EXISTS uq_teacher_attendance_teacher_date_shift'))
+        conn.execute(text('DROP INDEX IF EXISTS ix_teacher_attendance_date'))
+        conn.execute(text('ALTER TABLE teacher_attendance RENAME TO teacher_attendance_old'))
+        conn.execute(text(_TEACHER_ATTENDANCE_DDL))
+        new_columns = {c['name'] for c in inspect(conn).get_columns('teacher_attendance')}
+        shared = ', '.join(name for name in columns if name in new_columns)
+        conn.execute(text(f'INSERT INTO teacher_attendance ({shared}) SELECT {shared} FROM teacher_attendance_old'))
+        conn.execute(text('DROP TABLE teacher_attendance_old'))
+        attendance_indexes(conn)
+
+    # Rows from before the time column existed only have check_in
+    conn.execute(text('UPDATE teacher_attendance SET time = check_in WHERE time IS NULL AND check_in IS NOT NULL'))
+    logger.info(f"teacher_attendance columns now nullable: {legacy}")
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        ' version INTEGER PRIMARY KEY,'
+        ' description VARCHAR(255) NOT NULL,'
+        ' applied_at TIMESTAMP NOT NULL)'
+    ))
+
+
+def applied_versions(engine=None):
+    """
+    Versions already recorded in the schema_migrations table
+    """
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def run_migrations(engine=None):
+    """
+    Create missing tables, then apply pending migrations in order.
+
+    Returns:
+        list: Versions applied by this call
+    """
+    engine = engine or db.engine
+    db.create_all()
+
+    done = applied_versions(engine)
+    applied = []
+
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            # Another worker may have applied it since we looked
+            if conn.execute(
+                text('SELECT 1 FROM schema_migrations WHERE version = :v'), {'v': version}
+            ).first():
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            func(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
+        applied.append(version)
+
+    return applied
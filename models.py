@@ -23,9 +23,19 @@ class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     photo = db.Column(db.String(255), nullable=True)
+    active = db.Column(db.Boolean, default=True)
 
     attendance_records = db.relationship('StudentAttendance', backref='student', lazy=True)
 
+    @property
+    def photo_url(self):
+        from photos import photo_url
+        return photo_url(self.photo)
+
+    def photo_srcset(self, ext='jpg'):
+        from photos import photo_srcset
+        return photo_srcset(self.photo, ext)
+
 
 class Teacher(db.Model):
     __tablename__ = 'teachers'
@@ -35,6 +45,7 @@ class Teacher(db.Model):
     email = db.Column(db.String(100), unique=True)
     phone = db.Column(db.String(20))
     hourly_rate = db.Column(db.Float)
+    active = db.Column(db.Boolean, default=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     attendance_records = db.relationship('TeacherAttendance', backref='teacher', lazy=True)
@@ -42,6 +53,11 @@ class Teacher(db.Model):
 
 class StudentAttendance(db.Model):
     __tablename__ = 'student_attendance'
+    __table_args__ = (
+        # A student is marked at most once per day
+        db.Index('uq_student_attendance_student_date', 'student_id', 'date', unique=True),
+        db.Index('ix_student_attendance_date', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
@@ -49,23 +65,39 @@ class StudentAttendance(db.Model):
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
     notes = db.Column(db.String(255))
+    gsheet_row_id = db.Column(db.Integer)
+
+    marked_by = db.relationship('User', foreign_keys=[marked_by_id])
 
 
 class TeacherAttendance(db.Model):
     __tablename__ = 'teacher_attendance'
+    __table_args__ = (
+        # A teacher clocks in at most once per shift per day
+        db.Index('uq_teacher_attendance_teacher_date_shift', 'teacher_id', 'date', 'shift_type', unique=True),
+        db.Index('ix_teacher_attendance_date', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
-    shift_id = db.Column(db.Integer, db.ForeignKey('shifts.id'), nullable=False)
+    shift_id = db.Column(db.Integer, db.ForeignKey('shifts.id'), nullable=True)
+    shift_type = db.Column(db.String(20), nullable=False)
     date = db.Column(db.Date, nullable=False)
-    check_in = db.Column(db.Time, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    check_in = db.Column(db.Time, nullable=True)
+    marked_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     notes = db.Column(db.String(255))
+    gsheet_row_id = db.Column(db.Integer)
 
 
 class Shift(db.Model):
     __tablename__ = 'shifts'
+    __table_args__ = (
+        db.Index('uq_shifts_code', 'code', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20))  # shift_type stored on TeacherAttendance
     name = db.Column(db.String(50), nullable=False)
     start_time = db.Column(db.String(10), nullable=False)
     end_time = db.Column(db.String(10), nullable=False)
@@ -73,3 +105,94 @@ class Shift(db.Model):
     one_on_one = db.Column(db.Boolean, default=False)
 
     attendance_records = db.relationship('TeacherAttendance', backref='shift', lazy=True)
+
+
+class SheetOutbox(db.Model):
+    __tablename__ = 'sheet_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    op = db.Column(db.String(20), nullable=False)  # 'append' or 'delete'
+    record_type = db.Column(db.String(20), nullable=False)  # 'teacher' or 'student'
+    record_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255))
+    claimed_by = db.Column(db.String(40))
+    created_at = db.Column(db.DateTime, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class TeacherMonthStats(db.Model):
+    __tablename__ = 'teacher_month_stats'
+
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    shift_type = db.Column(db.String(20), primary_key=True)
+    shift_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StudentDayCount(db.Model):
+    __tablename__ = 'student_day_counts'
+
+    date = db.Column(db.Date, primary_key=True)
+    student_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReportCacheVersion(db.Model):
+    __tablename__ = 'report_cache_versions'
+
+    # (0, 0) is bumped when teachers or students change
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PayrollRun(db.Model):
+    __tablename__ = 'payroll_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.Date, nullable=False)
+    period_end = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    total_hours = db.Column(db.Float, nullable=False, default=0)
+    total_pay = db.Column(db.Float, nullable=False, default=0)
+
+    lines = db.relationship('PayrollLine', backref='run', lazy=True, order_by='PayrollLine.teacher_name')
+
+
+class PayrollLine(db.Model):
+    __tablename__ = 'payroll_lines'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('payroll_runs.id'), nullable=False, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
+    teacher_name = db.Column(db.String(100), nullable=False)
+    hourly_rate = db.Column(db.Float, nullable=False, default=0)
+    shift_counts = db.Column(db.Text, nullable=False)  # JSON: shift code -> count
+    total_shifts = db.Column(db.Integer, nullable=False, default=0)
+    total_hours = db.Column(db.Float, nullable=False, default=0)
+    total_pay = db.Column(db.Float, nullable=False, default=0)
+
+
+class IngestEvent(db.Model):
+    __tablename__ = 'ingest_events'
+
+    # Idempotency keys are generated by the client, so they are scoped per user
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    event_type = db.Column(db.String(20), nullable=False)
+    result = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class LiveEvent(db.Model):
+    __tablename__ = 'live_events'
+
+    # Attendance changes for the dashboard streams of every worker process
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(30), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,265 @@
+import json
+import calendar
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask_login import login_required, current_user
+from sqlalchemy import event, func, select, literal, union_all
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Teacher, TeacherAttendance, TeacherMonthStats, Shift, PayrollRun, PayrollLine
+
+payroll_bp = Blueprint('payroll', __name__)
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+
+@event.listens_for(Session, 'before_flush')
+def _payroll_runs_are_immutable(session, flush_context, instances):
+    for obj in session.deleted:
+        if isinstance(obj, (PayrollRun, PayrollLine)):
+            raise ValueError('Bảng lương đã chốt không thể sửa hoặc xóa.')
+    for obj in session.dirty:
+        if isinstance(obj, (PayrollRun, PayrollLine)) and session.is_modified(obj):
+            raise ValueError('Bảng lương đã chốt không thể sửa hoặc xóa.')
+
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def split_period(start, end):
+    """
+    Split [start, end] into whole months, which can be read from
+    teacher_month_stats, and the partial months at either end, which
+    have to be counted from the raw attendance rows.
+
+    Returns:
+        tuple: (list of (first_day, last_day) raw ranges,
+                (first_month_index, last_month_index) or None)
+    """
+    if start.day == 1:
+        first_full = start
+    else:
+        first_full = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    if end.day == calendar.monthrange(end.year, end.month)[1]:
+        last_full = end
+    else:
+        last_full = end.replace(day=1) - timedelta(days=1)
+
+    if first_full > last_full:
+        return [(start, end)], None
+
+    raw_ranges = []
+    if start < first_full:
+        raw_ranges.append((start, first_full - timedelta(days=1)))
+    if end > last_full:
+        raw_ranges.append((last_full + timedelta(days=1), end))
+
+    return raw_ranges, (_month_index(first_full), _month_index(last_full))
+
+
+def _shift_count_rows(start, end):
+    """
+    One grouped query for (teacher_id, shift_type, count) over the period
+    """
+    raw_ranges, full_months = split_period(start, end)
+    parts = []
+
+    if full_months is not None:
+        month_index = TeacherMonthStats.year * 12 + TeacherMonthStats.month - 1
+        parts.append(select(
+            TeacherMonthStats.teacher_id.label('teacher_id'),
+            TeacherMonthStats.shift_type.label('shift_type'),
+            TeacherMonthStats.shift_count.label('shift_count')
+        ).where(month_index.between(*full_months)))
+
+    for range_start, range_end in raw_ranges:
+        parts.append(select(
+            TeacherAttendance.teacher_id.label('teacher_id'),
+            TeacherAttendance.shift_type.label('shift_type'),
+            func.count(TeacherAttendance.id).label('shift_count')
+        ).where(
+            TeacherAttendance.date >= range_start,
+            TeacherAttendance.date <= range_end
+        ).group_by(TeacherAttendance.teacher_id, TeacherAttendance.shift_type))
+
+    counts = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+
+    # Hours are summed per row in SQL from the shift durations
+    return db.session.execute(select(
+        counts.c.teacher_id,
+        Teacher.name,
+        func.coalesce(Teacher.hourly_rate, literal(0.0)),
+        counts.c.shift_type,
+        func.sum(counts.c.shift_count),
+        func.coalesce(Shift.duration, literal(0.0))
+    ).join(
+        Teacher, Teacher.id == counts.c.teacher_id
+    ).outerjoin(
+        Shift, Shift.code == counts.c.shift_type
+    ).group_by(
+        counts.c.teacher_id, Teacher.name, Teacher.hourly_rate, counts.c.shift_type, Shift.duration
+    )).all()
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _totals(positions, counts, durations, rates):
+    """
+    Shifts, hours and pay per teacher, from one row per (teacher, shift type).
+
+    With numpy (`pip install .[payroll]`) the sums are one bincount per column
+    and the pay one array multiplication; otherwise the same sums are taken
+    in a loop. Both add the rows in the same order, so the results match.
+
+    Args:
+        positions (list): Index into `rates` of each row's teacher
+        counts (list): Shifts worked in each row
+        durations (list): Hours per shift of each row
+        rates (list): Hourly rate of each teacher
+
+    Returns:
+        list: (total_shifts, total_hours, total_pay) per teacher
+    """
+    numpy = _numpy()
+    if numpy is None:
+        shifts = [0] * len(rates)
+        hours = [0.0] * len(rates)
+        for position, count, duration in zip(positions, counts, durations):
+            shifts[position] += count
+            hours[position] += count * duration
+        return [(shift, hour, round(hour * rate)) for shift, hour, rate in zip(shifts, hours, rates)]
+
+    positions = numpy.asarray(positions, dtype=numpy.intp)
+    counts = numpy.asarray(counts, dtype=numpy.float64)
+    shifts = numpy.bincount(positions, weights=counts, minlength=len(rates))
+    hours = numpy.bincount(positions, weights=counts * numpy.asarray(durations, dtype=numpy.float64), minlength=len(rates))
+    pay = numpy.rint(hours * numpy.asarray(rates, dtype=numpy.float64))
+    return [(int(shift), float(hour), int(amount)) for shift, hour, amount in zip(shifts, hours, pay)]
+
+
+def compute_payroll(start, end):
+    """
+    Hours and pay for every teacher with attendance in [start, end].
+
+    Returns:
+        list: One dict per teacher, sorted by name
+    """
+    lines = {}
+    # Position of each teacher's line in `lines`, for the batched totals
+    position = {}
+    positions, counts, durations = [], [], []
+    for teacher_id, name, rate, shift_type, count, duration in _shift_count_rows(start, end):
+        if not count:
+            continue
+        line = lines.get(teacher_id)
+        if line is None:
+            position[teacher_id] = len(lines)
+            line = lines[teacher_id] = {
+                'teacher_id': teacher_id,
+                'teacher_name': name,
+                'hourly_rate': float(rate),
+                'shift_counts': {}
+            }
+        line['shift_counts'][shift_type] = int(count)
+        positions.append(position[teacher_id])
+        counts.append(int(count))
+        durations.append(float(duration))
+
+    teacher_lines = list(lines.values())
+    totals = _totals(positions, counts, durations, [line['hourly_rate'] for line in teacher_lines])
+    for line, (total_shifts, total_hours, total_pay) in zip(teacher_lines, totals):
+        line.update(total_shifts=total_shifts, total_hours=total_hours, total_pay=total_pay)
+    return sorted(teacher_lines, key=lambda line: line['teacher_name'])
+
+
+def create_payroll_run(start, end, created_by=None):
+    """
+    Compute the payroll for [start, end] and store it as an immutable run.
+    The caller commits.
+
+    Returns:
+        PayrollRun
+    """
+    lines = compute_payroll(start, end)
+
+    run = PayrollRun(
+        period_start=start,
+        period_end=end,
+        created_at=datetime.now(vietnam_tz).replace(tzinfo=None),
+        created_by_id=created_by.id if created_by is not None else None,
+        total_hours=sum(line['total_hours'] for line in lines),
+        total_pay=sum(line['total_pay'] for line in lines)
+    )
+    db.session.add(run)
+    db.session.flush()
+
+    if lines:
+        db.session.execute(PayrollLine.__table__.insert(), [
+            dict(line, run_id=run.id, shift_counts=json.dumps(line['shift_counts']))
+            for line in lines
+        ])
+
+    return run
+
+
+@payroll_bp.route('/admin/payroll', methods=['GET', 'POST'])
+@login_required
+def payroll_runs():
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập vào trang này.', 'danger')
+        return redirect(url_for('attendance.teacher_home'))
+
+    if request.method == 'POST':
+        try:
+            start = datetime.strptime(request.form.get('start', ''), '%Y-%m-%d').date()
+            end = datetime.strptime(request.form.get('end', ''), '%Y-%m-%d').date()
+        except ValueError:
+            flash('Ngày không hợp lệ.', 'danger')
+            return redirect(url_for('payroll.payroll_runs'))
+
+        if start > end:
+            flash('Ngày bắt đầu phải trước ngày kết thúc.', 'danger')
+            return redirect(url_for('payroll.payroll_runs'))
+
+        run = create_payroll_run(start, end, created_by=current_user)
+        db.session.commit()
+
+        flash('Đã tính lương thành công.', 'success')
+        return redirect(url_for('payroll.payroll_run_detail', run_id=run.id))
+
+    runs = PayrollRun.query.order_by(PayrollRun.created_at.desc()).limit(50).all()
+
+    # Default period: the current month up to today
+    today = datetime.now(vietnam_tz).date()
+
+    return render_template(
+        'admin/payroll.html',
+        runs=runs,
+        default_start=today.replace(day=1),
+        default_end=today
+    )
+
+
+@payroll_bp.route('/admin/payroll/<int:run_id>')
+@login_required
+def payroll_run_detail(run_id):
+    if not current_user.is_admin:
+        flash('Bạn không có quyền truy cập vào trang này.', 'danger')
+        return redirect(url_for('attendance.teacher_home'))
+
+    run = PayrollRun.query.get_or_404(run_id)
+    lines = PayrollLine.query.filter_by(run_id=run.id).order_by(PayrollLine.teacher_name).all()
+    for line in lines:
+        line.counts = json.loads(line.shift_counts)
+
+    return render_template('admin/payroll_run.html', run=run, lines=lines)
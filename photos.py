@@ -0,0 +1,198 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+
+from flask import Blueprint, send_from_directory, url_for, abort
+
+logger = logging.getLogger(__name__)
+
+photos_bp = Blueprint('photos', __name__)
+
+PHOTO_DIR = os.environ.get('PHOTO_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media', 'photos'))
+
+# Square thumbnails: 100px for the student cards and 200px for 2x screens
+THUMBNAIL_SIZES = (100, 200)
+# Longest side of the uncropped copy kept for face recognition
+LARGE_SIZE = 640
+FORMATS = {'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+           'webp': ('WEBP', {'quality': 80, 'method': 6})}
+
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+
+# Processed photos are stored on Student.photo as the content hash
+KEY_PATTERN = re.compile(r'^[0-9a-f]{16}$')
+FILENAME_PATTERN = re.compile(r'^[0-9a-f]{16}-\d+\.(jpg|webp)$')
+
+# Filenames change with the content, so they can be cached forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class PhotoError(Exception):
+    pass
+
+
+def is_processed(photo):
+    return bool(photo) and KEY_PATTERN.match(photo) is not None
+
+
+def _filename(key, size, ext):
+    return f'{key}-{size}.{ext}'
+
+
+def _load_image(data):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise PhotoError('Pillow chưa được cài đặt, không thể xử lý ảnh.')
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder downscale while decoding; far cheaper than
+        # decoding a 12 MP phone photo at full size
+        image.draft('RGB', (LARGE_SIZE * 2, LARGE_SIZE * 2))
+        image = ImageOps.exif_transpose(image)
+        return image.convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise PhotoError(f'Không đọc được ảnh: {e}')
+
+
+def _save(image, path, image_format, options):
+    # Write to a unique temporary file in the same directory first, so that
+    # readers never see a partial file and concurrent writers never share one
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as temporary:
+        try:
+            image.save(temporary, image_format, **options)
+        except Exception:
+            temporary.close()
+            os.unlink(temporary.name)
+            raise
+    # NamedTemporaryFile creates the file owner-only; photos are public files
+    os.chmod(temporary.name, 0o644)
+    os.replace(temporary.name, path)
+
+
+def process_photo(data):
+    """
+    Decode an uploaded photo, fix its EXIF orientation and write the
+    thumbnail and large variants under content-hashed filenames.
+
+    Args:
+        data (bytes): The uploaded file
+
+    Returns:
+        str: The photo key to store on Student.photo
+
+    Raises:
+        PhotoError: The file is too large or not a readable image
+    """
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise PhotoError('Ảnh quá lớn (tối đa 15 MB).')
+
+    key = hashlib.sha256(data).hexdigest()[:16]
+    wanted = [_filename(key, size, ext) for size in THUMBNAIL_SIZES for ext in FORMATS]
+    wanted.append(_filename(key, LARGE_SIZE, 'jpg'))
+    if all(os.path.exists(os.path.join(PHOTO_DIR, name)) for name in wanted):
+        return key
+
+    image = _load_image(data)
+    from PIL import Image, ImageOps
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+
+    for size in THUMBNAIL_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for ext, (image_format, options) in FORMATS.items():
+            _save(thumbnail, os.path.join(PHOTO_DIR, _filename(key, size, ext)), image_format, options)
+
+    large = image.copy()
+    large.thumbnail((LARGE_SIZE, LARGE_SIZE), Image.LANCZOS)
+    image_format, options = FORMATS['jpg']
+    _save(large, os.path.join(PHOTO_DIR, _filename(key, LARGE_SIZE, 'jpg')), image_format, options)
+
+    return key
+
+
+def large_photo_path(photo):
+    """
+    Path of the uncropped LARGE_SIZE copy of a processed photo, or None
+    """
+    if not is_processed(photo):
+        return None
+    path = os.path.join(PHOTO_DIR, _filename(photo, LARGE_SIZE, 'jpg'))
+    return path if os.path.exists(path) else None
+
+
+def photo_url(photo, size=THUMBNAIL_SIZES[0], ext='jpg'):
+    """
+    URL of a student photo. Photos not yet processed by the backfill are
+    returned as they were stored (a URL, or a path under static/).
+    """
+    if not photo:
+        return None
+    if is_processed(photo):
+        return url_for('photos.student_photo', filename=_filename(photo, size, ext))
+    if photo.startswith(('http://', 'https://', '/')):
+        return photo
+    return url_for('static', filename=photo)
+
+
+def photo_srcset(photo, ext='jpg'):
+    if not is_processed(photo):
+        return None
+    small, large = THUMBNAIL_SIZES
+    return f'{photo_url(photo, small, ext)} 1x, {photo_url(photo, large, ext)} 2x'
+
+
+def _legacy_path(photo, static_folder):
+    candidates = [photo] if os.path.isabs(photo) else [
+        os.path.join(static_folder, photo.lstrip('/')),
+        os.path.join(static_folder, photo.replace('/static/', '', 1).lstrip('/')),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), photo.lstrip('/'))
+    ]
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def backfill(students, static_folder):
+    """
+    Process photos stored before the pipeline existed.
+
+    Args:
+        students (iterable): Student rows to check
+        static_folder (str): Where relative legacy paths are looked up
+
+    Returns:
+        tuple: (processed, missing, failed) counts; the caller commits
+    """
+    processed = missing = failed = 0
+    for student in students:
+        if not student.photo or is_processed(student.photo):
+            continue
+        path = _legacy_path(student.photo, static_folder)
+        if path is None:
+            logger.warning(f"Photo for student {student.id} not found: {student.photo}")
+            missing += 1
+            continue
+        try:
+            with open(path, 'rb') as f:
+                student.photo = process_photo(f.read())
+            processed += 1
+        except PhotoError as e:
+            logger.warning(f"Could not process photo for student {student.id}: {e}")
+            failed += 1
+    return processed, missing, failed
+
+
+@photos_bp.route('/media/photos/<filename>')
+def student_photo(filename):
+    if not FILENAME_PATTERN.match(filename):
+        abort(404)
+    response = send_from_directory(PHOTO_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
@@ -0,0 +1,175 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import request, session, make_response
+from flask_login import current_user
+from sqlalchemy import event, inspect, or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Teacher, Student, Shift, TeacherAttendance, StudentAttendance, ReportCacheVersion
+from stats import insert_for
+import schedule
+
+logger = logging.getLogger(__name__)
+
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+# Number of rendered report pages kept per worker process
+MAX_ENTRIES = 256
+
+# Period used for changes that affect every month (teacher/student edits)
+GLOBAL_PERIOD = (0, 0)
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+# Global version this process last loaded the shift schedule for
+_seen = {'global': None}
+
+
+SYNC_ONLY_ATTRIBUTES = {'gsheet_row_id'}
+
+
+def _changed_attributes(obj):
+    return {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+
+
+def _bump(connection, periods):
+    insert = insert_for(connection)
+    for year, month in periods:
+        stmt = insert(ReportCacheVersion).values(year=year, month=month, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['year', 'month'],
+            set_={'version': ReportCacheVersion.version + 1}
+        )
+        connection.execute(stmt)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_periods(session, flush_context):
+    """
+    Remember every period touched by this flush; see _invalidate_after_commit.
+    """
+    # Sheet row bookkeeping by the sync worker does not change any report
+    dirty = [obj for obj in session.dirty if _changed_attributes(obj) - SYNC_ONLY_ATTRIBUTES]
+
+    periods = session.info.setdefault('report_periods', set())
+    for obj in list(session.new) + dirty + list(session.deleted):
+        if isinstance(obj, (TeacherAttendance, StudentAttendance)) and obj.date is not None:
+            periods.add((obj.date.year, obj.date.month))
+        elif isinstance(obj, (Teacher, Student, Shift)):
+            # Names, hourly rates and shift hours appear in every month
+            periods.add(GLOBAL_PERIOD)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    """
+    Bump the version of the touched periods in a short transaction of its own.
+
+    Versions live in the database, so every gunicorn worker sees the
+    invalidation on its next lookup. Bumping inside the writer's transaction
+    would hold the month's version row lock until the writer commits and
+    serialize all concurrent attendance writes on PostgreSQL.
+    """
+    periods = session.info.pop('report_periods', None)
+    if not periods:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            _bump(connection, sorted(periods))
+    except SQLAlchemyError:
+        # The write itself is committed; the pages stay cached until evicted
+        logger.exception("Could not invalidate cached reports for %s", sorted(periods))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_periods(session, previous_transaction):
+    # A rolled back savepoint leaves the outer transaction's periods pending
+    if previous_transaction.parent is None:
+        session.info.pop('report_periods', None)
+
+
+def period_versions(year, month):
+    rows = db.session.query(
+        ReportCacheVersion.year,
+        ReportCacheVersion.month,
+        ReportCacheVersion.version
+    ).filter(or_(
+        and_(ReportCacheVersion.year == year, ReportCacheVersion.month == month),
+        and_(ReportCacheVersion.year == GLOBAL_PERIOD[0], ReportCacheVersion.month == GLOBAL_PERIOD[1])
+    )).all()
+    found = {(row_year, row_month): version for row_year, row_month, version in rows}
+    versions = found.get((year, month), 0), found.get(GLOBAL_PERIOD, 0)
+
+    # A shift edited in another worker bumps the global version; reload the
+    # schedule before a page is rendered (and cached) with the old hours
+    with _lock:
+        if versions[1] != _seen['global']:
+            schedule.invalidate()
+            _seen['global'] = versions[1]
+    return versions
+
+
+def get(key, versions):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[0] != versions:
+            return None
+        _entries.move_to_end(key)
+        return entry[1]
+
+
+def put(key, versions, body):
+    with _lock:
+        _entries[key] = (versions, body)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def cached_report(view):
+    """
+    Cache an admin report page by (endpoint, year, month, teacher).
+
+    An entry stays valid until an attendance write touches its month or a
+    teacher/student is edited; there is no time-based expiry, so closed
+    months stay cached until evicted by the LRU bound.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Non-admins get redirected by the view; pages with pending flash
+        # messages are personal and must not be served from or into the cache
+        if not current_user.is_admin or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        now = datetime.now(vietnam_tz)
+        try:
+            year = int(request.args.get('year', now.year))
+            month = int(request.args.get('month', now.month))
+        except ValueError:
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, year, month, kwargs.get('teacher_id'))
+        versions = period_versions(year, month)
+
+        body = get(key, versions)
+        if body is not None:
+            return body
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not session.get('_flashes'):
+            put(key, versions, response.get_data(as_text=True))
+        return response
+
+    return wrapper
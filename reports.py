@@ -3,16 +3,51 @@ from flask_login import login_required, current_user
 import calendar
 from datetime import datetime
 import pytz
-from sqlalchemy import func, extract
 
-from app import db
-from models import Teacher, TeacherAttendance, StudentAttendance, Student
+from extensions import db
+from report_cache import cached_report
+from schedule import get_schedule
+from utils import shift_name_vi
+from models import Teacher, TeacherAttendance, StudentAttendance, Student, User, TeacherMonthStats, StudentDayCount
 
 reports_bp = Blueprint('reports', __name__)
 vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
+def month_range(year, month):
+    """
+    First and last day of a month, for date range filters
+    """
+    first_day = datetime(year, month, 1).date()
+    last_day = datetime(year, month, calendar.monthrange(year, month)[1]).date()
+    return first_day, last_day
+
+def shift_totals(shift_counts):
+    """
+    Summary statistics from a dict of shift_type -> number of shifts
+    """
+    total_morning = shift_counts.get('morning', 0)
+    total_afternoon = shift_counts.get('afternoon', 0)
+    total_1on1_1h = shift_counts.get('1on1_1h', 0)
+    total_1on1_15h = shift_counts.get('1on1_1.5h', 0)
+    total_1on1_2h = shift_counts.get('1on1_2h', 0)
+    
+    # Hours and 1-1 grouping come from the Shift table
+    schedule = get_schedule()
+    
+    return {
+        'total_shifts': sum(shift_counts.values()),
+        'total_hours': schedule.hours(shift_counts),
+        'morning': total_morning,
+        'afternoon': total_afternoon,
+        'one_on_one': schedule.one_on_one_count(shift_counts),
+        'one_on_one_1h': total_1on1_1h,
+        'one_on_one_15h': total_1on1_15h,
+        'one_on_one_2h': total_1on1_2h
+    }
+
 @reports_bp.route('/admin/reports')
 @login_required
+@cached_report
 def admin_reports():
     if not current_user.is_admin:
         flash('Bạn không có quyền truy cập vào trang này.', 'danger')
@@ -36,57 +71,46 @@ def admin_reports():
     ]
     month_name = month_names_vi[month]
     
+    first_day, last_day = month_range(year, month)
+    
+    # Shift counts for all teachers from the maintained statistics table
+    rows = db.session.query(
+        TeacherMonthStats.teacher_id,
+        TeacherMonthStats.shift_type,
+        TeacherMonthStats.shift_count
+    ).filter(
+        TeacherMonthStats.year == year,
+        TeacherMonthStats.month == month
+    ).all()
+    
+    counts_by_teacher = {}
+    for teacher_id, shift_type, count in rows:
+        counts_by_teacher.setdefault(teacher_id, {})[shift_type] = count
+    
     # Get total shifts and hours for each teacher
     teacher_stats = []
     
     for teacher in teachers:
-        # Query for attendance records for this teacher in the selected month
-        query = db.session.query(TeacherAttendance.shift_type, func.count(TeacherAttendance.id)).\
-            filter(
-                TeacherAttendance.teacher_id == teacher.id,
-                extract('year', TeacherAttendance.date) == year,
-                extract('month', TeacherAttendance.date) == month
-            ).\
-            group_by(TeacherAttendance.shift_type)
-        
-        shift_counts = dict(query.all())
-        
-        # Calculate totals
-        total_morning = shift_counts.get('morning', 0)
-        total_afternoon = shift_counts.get('afternoon', 0)
-        total_1on1_1h = shift_counts.get('1on1_1h', 0)
-        total_1on1_15h = shift_counts.get('1on1_1.5h', 0)
-        total_1on1_2h = shift_counts.get('1on1_2h', 0)
-        
-        total_shifts = total_morning + total_afternoon + total_1on1_1h + total_1on1_15h + total_1on1_2h
-        
-        # Calculate total hours
-        total_hours = (
-            total_morning * 6 +  # 6 hours for morning shift
-            total_afternoon * 4.75 +  # 4.75 hours for afternoon shift
-            total_1on1_1h * 1 +  # 1 hour for 1on1_1h shift
-            total_1on1_15h * 1.5 +  # 1.5 hours for 1on1_1.5h shift
-            total_1on1_2h * 2  # 2 hours for 1on1_2h shift
-        )
-        
-        teacher_stats.append({
-            'id': teacher.id,
-            'name': teacher.name,
-            'total_shifts': total_shifts,
-            'total_hours': total_hours,
-            'morning': total_morning,
-            'afternoon': total_afternoon,
-            'one_on_one': total_1on1_1h + total_1on1_15h + total_1on1_2h,
-            'one_on_one_1h': total_1on1_1h,
-            'one_on_one_15h': total_1on1_15h, 
-            'one_on_one_2h': total_1on1_2h
-        })
+        stats = shift_totals(counts_by_teacher.get(teacher.id, {}))
+        stats['id'] = teacher.id
+        stats['name'] = teacher.name
+        teacher_stats.append(stats)
     
     # Sort by total hours in descending order
     teacher_stats.sort(key=lambda x: x['total_hours'], reverse=True)
     
     # Get student attendance statistics
     total_students = Student.query.filter_by(active=True).count()
+    
+    # Student counts for every day of the month from the statistics table
+    counts_by_date = dict(db.session.query(
+        StudentDayCount.date,
+        StudentDayCount.student_count
+    ).filter(
+        StudentDayCount.date >= first_day,
+        StudentDayCount.date <= last_day
+    ).all())
+    
     student_attendance_by_day = {}
     
     for week in cal:
@@ -94,9 +118,7 @@ def admin_reports():
             if day != 0:  # Skip days that belong to prev/next month
                 date = datetime(year, month, day).date()
                 if date.weekday() != 6:  # Skip Sundays
-                    count = StudentAttendance.query.filter(
-                        StudentAttendance.date == date
-                    ).count()
+                    count = counts_by_date.get(date, 0)
                     student_attendance_by_day[date.strftime('%Y-%m-%d')] = {
                         'count': count,
                         'percentage': round(count / total_students * 100) if total_students > 0 else 0
@@ -116,6 +138,7 @@ def admin_reports():
 
 @reports_bp.route('/admin/reports/teacher/<int:teacher_id>')
 @login_required
+@cached_report
 def teacher_detail_report(teacher_id):
     if not current_user.is_admin:
         flash('Bạn không có quyền truy cập vào trang này.', 'danger')
@@ -130,10 +153,11 @@ def teacher_detail_report(teacher_id):
     teacher = Teacher.query.get_or_404(teacher_id)
     
     # Get all attendance records for this teacher in the selected month
+    first_day, last_day = month_range(year, month)
     attendance_records = TeacherAttendance.query.filter(
         TeacherAttendance.teacher_id == teacher.id,
-        extract('year', TeacherAttendance.date) == year,
-        extract('month', TeacherAttendance.date) == month
+        TeacherAttendance.date >= first_day,
+        TeacherAttendance.date <= last_day
     ).order_by(TeacherAttendance.date, TeacherAttendance.time).all()
     
     # Format the month name in Vietnamese
@@ -151,13 +175,7 @@ def teacher_detail_report(teacher_id):
             attendance_by_date[date_str] = []
         
         # Format shift name in Vietnamese
-        shift_vi = {
-            "morning": "Sáng",
-            "afternoon": "Chiều",
-            "1on1_1h": "1-1 (1 giờ)",
-            "1on1_1.5h": "1-1 (1.5 giờ)",
-            "1on1_2h": "1-1 (2 giờ)",
-        }.get(record.shift_type, record.shift_type)
+        shift_vi = shift_name_vi(record.shift_type)
         
         attendance_by_date[date_str].append({
             'id': record.id,
@@ -166,23 +184,11 @@ def teacher_detail_report(teacher_id):
             'shift_type': record.shift_type
         })
     
-    # Calculate summary statistics
-    total_morning = sum(1 for record in attendance_records if record.shift_type == 'morning')
-    total_afternoon = sum(1 for record in attendance_records if record.shift_type == 'afternoon')
-    total_1on1_1h = sum(1 for record in attendance_records if record.shift_type == '1on1_1h')
-    total_1on1_15h = sum(1 for record in attendance_records if record.shift_type == '1on1_1.5h')
-    total_1on1_2h = sum(1 for record in attendance_records if record.shift_type == '1on1_2h')
-    
-    total_shifts = total_morning + total_afternoon + total_1on1_1h + total_1on1_15h + total_1on1_2h
-    
-    # Calculate total hours
-    total_hours = (
-        total_morning * 6 +  # 6 hours for morning shift
-        total_afternoon * 4.75 +  # 4.75 hours for afternoon shift
-        total_1on1_1h * 1 +  # 1 hour for 1on1_1h shift
-        total_1on1_15h * 1.5 +  # 1.5 hours for 1on1_1.5h shift
-        total_1on1_2h * 2  # 2 hours for 1on1_2h shift
-    )
+    # Calculate summary statistics from the records already loaded
+    shift_counts = {}
+    for record in attendance_records:
+        shift_counts[record.shift_type] = shift_counts.get(record.shift_type, 0) + 1
+    stats = shift_totals(shift_counts)
     
     return render_template(
         'admin/teacher_report.html',
@@ -191,18 +197,19 @@ def teacher_detail_report(teacher_id):
         month=month,
         month_name=month_name,
         attendance_by_date=attendance_by_date,
-        total_shifts=total_shifts,
-        total_hours=total_hours,
-        total_morning=total_morning,
-        total_afternoon=total_afternoon,
-        total_1on1=total_1on1_1h + total_1on1_15h + total_1on1_2h,
-        total_1on1_1h=total_1on1_1h,
-        total_1on1_15h=total_1on1_15h,
-        total_1on1_2h=total_1on1_2h
+        total_shifts=stats['total_shifts'],
+        total_hours=stats['total_hours'],
+        total_morning=stats['morning'],
+        total_afternoon=stats['afternoon'],
+        total_1on1=stats['one_on_one'],
+        total_1on1_1h=stats['one_on_one_1h'],
+        total_1on1_15h=stats['one_on_one_15h'],
+        total_1on1_2h=stats['one_on_one_2h']
     )
 
 @reports_bp.route('/admin/reports/students')
 @login_required
+@cached_report
 def student_attendance_report():
     if not current_user.is_admin:
         flash('Bạn không có quyền truy cập vào trang này.', 'danger')
@@ -226,33 +233,39 @@ def student_attendance_report():
     # Get the calendar for this month
     cal = calendar.monthcalendar(year, month)
     
+    # Calculate total valid days (excluding Sundays)
+    total_days = sum(1 for week in cal for day in week if day != 0 and datetime(year, month, day).weekday() != 6)
+    
+    # All attendance records of the month with the marker's name, in one query
+    first_day, last_day = month_range(year, month)
+    rows = db.session.query(
+        StudentAttendance.id,
+        StudentAttendance.student_id,
+        StudentAttendance.date,
+        StudentAttendance.time,
+        User.name
+    ).outerjoin(User, User.id == StudentAttendance.marked_by_id).filter(
+        StudentAttendance.date >= first_day,
+        StudentAttendance.date <= last_day
+    ).all()
+    
+    records_by_student = {}
+    for record_id, student_id, date, time, marked_by in rows:
+        records_by_student.setdefault(student_id, {})[date.strftime('%Y-%m-%d')] = {
+            'id': record_id,
+            'time': time.strftime('%H:%M'),
+            'marked_by': marked_by
+        }
+    
     # Prepare data structure for student attendance
     # For each student, we need a dict of date -> attendance status
     student_attendance = {}
     
     for student in students:
-        # Get all attendance records for this student in the selected month
-        attendance_records = StudentAttendance.query.filter(
-            StudentAttendance.student_id == student.id,
-            extract('year', StudentAttendance.date) == year,
-            extract('month', StudentAttendance.date) == month
-        ).all()
-        
-        # Create a dict of date -> attendance status
-        attendance_by_date = {}
-        for record in attendance_records:
-            date_str = record.date.strftime('%Y-%m-%d')
-            attendance_by_date[date_str] = {
-                'id': record.id,
-                'time': record.time.strftime('%H:%M'),
-                'marked_by': record.marked_by.name
-            }
+        attendance_by_date = records_by_student.get(student.id, {})
         
         # Calculate total days present
-        total_present = len(attendance_records)
-        
-        # Calculate total valid days (excluding Sundays)
-        total_days = sum(1 for week in cal for day in week if day != 0 and datetime(year, month, day).weekday() != 6)
+        total_present = len(attendance_by_date)
         
         student_attendance[student.id] = {
             'name': student.name,
@@ -0,0 +1,127 @@
+import threading
+import time as time_module
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Shift
+
+# Shifts seeded by migration 5 when the table has no row for a code
+DEFAULT_SHIFTS = [
+    {'code': 'morning', 'name': 'Ca sáng', 'start_time': '06:00', 'end_time': '12:00', 'duration': 6, 'one_on_one': False},
+    {'code': 'afternoon', 'name': 'Ca chiều', 'start_time': '12:00', 'end_time': '16:45', 'duration': 4.75, 'one_on_one': False},
+    {'code': '1on1_1h', 'name': 'Ca 1-1 (1 giờ)', 'start_time': '16:45', 'end_time': '21:00', 'duration': 1, 'one_on_one': True},
+    {'code': '1on1_1.5h', 'name': 'Ca 1-1 (1.5 giờ)', 'start_time': '16:45', 'end_time': '21:00', 'duration': 1.5, 'one_on_one': True},
+    {'code': '1on1_2h', 'name': 'Ca 1-1 (2 giờ)', 'start_time': '16:45', 'end_time': '21:00', 'duration': 2, 'one_on_one': True},
+]
+
+# Other workers pick up shift edits within this many seconds
+RELOAD_INTERVAL = 60
+
+CompiledShift = namedtuple('CompiledShift', [
+    'id', 'code', 'name', 'start_time', 'end_time', 'start', 'end', 'duration', 'one_on_one'
+])
+
+
+def _parse_time(value):
+    return datetime.strptime(value.strip(), '%H:%M').time()
+
+
+class ShiftSchedule:
+    """
+    Immutable, pre-parsed view of the Shift table.
+
+    Shifts are kept sorted by start time so that "which shifts are open at
+    t" only looks at shifts that have already started.
+    """
+
+    def __init__(self, shifts):
+        compiled = []
+        for shift in shifts:
+            if not shift.code:
+                continue
+            compiled.append(CompiledShift(
+                id=shift.id,
+                code=shift.code,
+                name=shift.name,
+                start_time=shift.start_time,
+                end_time=shift.end_time,
+                start=_parse_time(shift.start_time),
+                end=_parse_time(shift.end_time),
+                duration=float(shift.duration),
+                one_on_one=bool(shift.one_on_one)
+            ))
+        compiled.sort(key=lambda s: (s.start, s.end, s.code))
+
+        self.shifts = compiled
+        self._starts = [s.start for s in compiled]
+        self.by_code = {s.code: s for s in compiled}
+        self.durations = {s.code: s.duration for s in compiled}
+        self.codes = [s.code for s in compiled]
+
+    def get(self, code):
+        return self.by_code.get(code)
+
+    def open_shifts(self, at):
+        """
+        Shifts whose window contains `at` (both ends inclusive)
+        """
+        started = self.shifts[:bisect_right(self._starts, at)]
+        return [s for s in started if at <= s.end]
+
+    def is_open(self, code, at):
+        shift = self.by_code.get(code)
+        return shift is not None and shift.start <= at <= shift.end
+
+    def hours(self, shift_counts):
+        """
+        Total hours for a dict of shift code -> number of shifts
+        """
+        return sum(self.durations.get(code, 0) * count for code, count in shift_counts.items())
+
+    def one_on_one_count(self, shift_counts):
+        return sum(count for code, count in shift_counts.items()
+                   if code in self.by_code and self.by_code[code].one_on_one)
+
+
+_lock = threading.Lock()
+_state = {'schedule': None, 'loaded_at': 0.0}
+
+
+def invalidate():
+    with _lock:
+        _state['schedule'] = None
+
+
+def get_schedule():
+    """
+    The compiled schedule, loaded from the Shift table on first use and
+    reloaded after local shift edits or every RELOAD_INTERVAL seconds.
+    Needs an application context.
+    """
+    with _lock:
+        schedule = _state['schedule']
+        if schedule is not None and time_module.monotonic() - _state['loaded_at'] < RELOAD_INTERVAL:
+            return schedule
+
+        schedule = ShiftSchedule(Shift.query.all())
+        _state['schedule'] = schedule
+        _state['loaded_at'] = time_module.monotonic()
+        return schedule
+
+
+@event.listens_for(Session, 'after_commit')
+def _reload_on_shift_edit(session):
+    if session.info.pop('shifts_changed', False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_shift_edit(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Shift):
+            session.info['shifts_changed'] = True
+            return
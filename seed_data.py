@@ -0,0 +1,166 @@
+"""
+Fill a database with a synthetic class for development and benchmarks.
+
+    python seed_data.py --database sqlite:///demo.db --teachers 20 --students 60 --years 3
+
+Creates an admin (admin@example.com / admin), N teachers with their user
+accounts, M students and `years` of teacher and student attendance up to
+today, skipping Sundays. Rows are written with bulk INSERTs, then the
+statistics tables are rebuilt. The database must not contain any users.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, date, timedelta
+
+import pytz
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from database import configure_database
+from models import User, Teacher, Student, TeacherAttendance, StudentAttendance
+import migrations
+import schedule
+from schedule import get_schedule
+from stats import rebuild_stats
+from db_transfer import reset_sequences
+
+vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+
+CHUNK_SIZE = 5000
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'admin'
+
+# Chance that a teacher works a shift on a given weekday
+SHIFT_CHANCES = (('morning', 0.7), ('afternoon', 0.6), ('1on1', 0.3))
+STUDENT_PRESENCE = 0.9
+HOURLY_RATES = (50000, 60000, 80000)
+
+
+def _insert(table, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[i:i + CHUNK_SIZE])
+
+
+def _clock_time(shift, rng):
+    # A random minute in the first hour of the shift window
+    return (datetime.combine(date.min, shift.start) + timedelta(minutes=rng.randrange(60))).time()
+
+
+def seed(teachers, students, years, end=None, rng=None):
+    """
+    Insert a synthetic class into the database of the current app context.
+
+    Args:
+        teachers (int): Number of teachers, each with a user account
+        students (int): Number of active students
+        years (int): Years of attendance history ending at `end`
+        end (date): Last day with attendance, today by default
+        rng (random.Random): Source of randomness, for repeatable data
+
+    Returns:
+        dict: Rows inserted per table
+    """
+    rng = rng or random.Random(0)
+    end = end or datetime.now(vietnam_tz).date()
+
+    if db.session.query(User.id).first() is not None:
+        raise ValueError('The database already has users; seed an empty database')
+
+    # Freshly read, in case migrations just seeded the shifts
+    schedule.invalidate()
+    shifts = get_schedule().by_code
+    one_on_one = [code for code, shift in shifts.items() if shift.one_on_one]
+
+    # One hash for every account; hashing is deliberately slow
+    password_hash = generate_password_hash(ADMIN_PASSWORD)
+    user_rows = [{'id': 1, 'name': 'Quản trị viên', 'email': ADMIN_EMAIL, 'password_hash': password_hash, 'is_admin': True}]
+    teacher_rows = []
+    for i in range(1, teachers + 1):
+        user_rows.append({'id': i + 1, 'name': f'Giáo viên {i}', 'email': f'gv{i}@example.com',
+                          'password_hash': password_hash, 'is_admin': False})
+        teacher_rows.append({'id': i, 'name': f'Giáo viên {i}', 'email': f'gv{i}@example.com',
+                             'phone': f'09{i:08d}', 'hourly_rate': rng.choice(HOURLY_RATES),
+                             'active': True, 'user_id': i + 1})
+    student_rows = [{'id': i, 'name': f'Học sinh {i}', 'active': True} for i in range(1, students + 1)]
+
+    _insert(User.__table__, user_rows)
+    _insert(Teacher.__table__, teacher_rows)
+    _insert(Student.__table__, student_rows)
+
+    teacher_attendance = []
+    student_attendance = []
+    day = end - timedelta(days=years * 365 - 1)
+    while day <= end:
+        if day.weekday() != 6:
+            for teacher in teacher_rows:
+                for code, chance in SHIFT_CHANCES:
+                    if rng.random() >= chance:
+                        continue
+                    shift = shifts[rng.choice(one_on_one) if code == '1on1' else code]
+                    teacher_attendance.append({
+                        'teacher_id': teacher['id'],
+                        'date': day,
+                        'time': _clock_time(shift, rng),
+                        'shift_type': shift.code,
+                        'shift_id': shift.id,
+                        'marked_by_id': teacher['user_id']
+                    })
+            morning = shifts['morning']
+            for student in student_rows:
+                if rng.random() < STUDENT_PRESENCE:
+                    student_attendance.append({
+                        'student_id': student['id'],
+                        'date': day,
+                        'time': _clock_time(morning, rng),
+                        'marked_by_id': rng.choice(teacher_rows)['user_id'] if teacher_rows else 1
+                    })
+        day += timedelta(days=1)
+
+    _insert(TeacherAttendance.__table__, teacher_attendance)
+    _insert(StudentAttendance.__table__, student_attendance)
+    db.session.commit()
+
+    with db.engine.begin() as conn:
+        rebuild_stats(conn)
+        # Rows were inserted with explicit IDs
+        if conn.dialect.name == 'postgresql':
+            reset_sequences(conn, db.metadata.sorted_tables)
+
+    return {
+        'users': len(user_rows),
+        'teachers': len(teacher_rows),
+        'students': len(student_rows),
+        'teacher_attendance': len(teacher_attendance),
+        'student_attendance': len(student_attendance)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--teachers', type=int, default=20)
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    configure_database(app, args.database)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        migrations.run_migrations()
+        started = time.perf_counter()
+        try:
+            counts = seed(args.teachers, args.students, args.years, rng=random.Random(args.seed))
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+        print(f"Seeded {summary} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
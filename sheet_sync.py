@@ -0,0 +1,331 @@
+import json
+import logging
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from extensions import db
+from models import SheetOutbox, TeacherAttendance, StudentAttendance
+import gsheet
+
+logger = logging.getLogger(__name__)
+
+# Outbox tuning
+BATCH_SIZE = 50
+POLL_INTERVAL = 5  # seconds between idle polls
+CLAIM_LEASE = 120  # seconds before a claimed batch can be picked up again
+BASE_BACKOFF = 5  # seconds, doubled on every failed attempt
+MAX_BACKOFF = 15 * 60
+MAX_ATTEMPTS = 12
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.utcnow()
+
+
+def _record_type(record):
+    return 'student' if isinstance(record, StudentAttendance) else 'teacher'
+
+
+def _model_for(record_type):
+    return StudentAttendance if record_type == 'student' else TeacherAttendance
+
+
+def enqueue_append(record, date, time, name, status, shift, marked_by, is_student=False):
+    """
+    Queue an attendance record to be appended to Google Sheets.
+
+    The outbox row is added to the current session, so it is committed in
+    the same transaction as the attendance record itself.
+
+    Args:
+        record: The TeacherAttendance or StudentAttendance (already flushed)
+        Remaining arguments are the same as gsheet.add_attendance_to_sheet
+    """
+    now = _utcnow()
+    payload = {
+        'date': date,
+        'time': time,
+        'name': name,
+        'status': status,
+        'shift': shift,
+        'marked_by': marked_by,
+        'is_student': is_student,
+        'key': gsheet.record_key(_record_type(record), record.id)
+    }
+    db.session.add(SheetOutbox(
+        op='append',
+        record_type=_record_type(record),
+        record_id=record.id,
+        payload=json.dumps(payload, ensure_ascii=False),
+        created_at=now,
+        next_attempt_at=now
+    ))
+
+
+def enqueue_delete(record):
+    """
+    Queue the removal of an attendance record from Google Sheets.
+
+    Rows are deleted by record key, so this works even if the append is
+    still in flight. If the record's append was never picked up by a worker,
+    it is cancelled instead and nothing is sent to Sheets.
+
+    Args:
+        record: The TeacherAttendance or StudentAttendance being deleted
+    """
+    enqueue_deletes([record])
+
+
+def enqueue_deletes(records):
+    """
+    Queue the removal of many attendance records with one query for their
+    appends. Unclaimed appends are cancelled instead; claimed ones are
+    marked 'superseded', so that a worker whose attempt fails drops them
+    rather than retrying after the delete has run.
+
+    Args:
+        records (list): TeacherAttendance and/or StudentAttendance being deleted
+    """
+    if not records:
+        return
+
+    ids_by_type = {}
+    for record in records:
+        ids_by_type.setdefault(_record_type(record), []).append(record.id)
+
+    appends = db.session.query(SheetOutbox).filter(
+        SheetOutbox.op == 'append',
+        or_(*[
+            and_(SheetOutbox.record_type == record_type, SheetOutbox.record_id.in_(ids))
+            for record_type, ids in ids_by_type.items()
+        ])
+    ).all()
+    cancelled = set()
+    for entry in appends:
+        if entry.claimed_by is None:
+            cancelled.add((entry.record_type, entry.record_id))
+            db.session.delete(entry)
+        else:
+            entry.status = 'superseded'
+
+    now = _utcnow()
+    for record in records:
+        record_type = _record_type(record)
+        if (record_type, record.id) in cancelled:
+            continue
+        db.session.add(SheetOutbox(
+            op='delete',
+            record_type=record_type,
+            record_id=record.id,
+            payload=json.dumps({
+                'key': gsheet.record_key(record_type, record.id),
+                'row_id': getattr(record, 'gsheet_row_id', None)
+            }),
+            created_at=now,
+            next_attempt_at=now
+        ))
+
+
+def notify():
+    """
+    Wake the worker up after a commit that queued new entries
+    """
+    _wakeup.set()
+
+
+def _claim_batch(batch_size):
+    """
+    Claim up to batch_size due entries for this worker.
+
+    The claim is a single UPDATE guarded by next_attempt_at, so two workers
+    (e.g. two gunicorn processes) never process the same entry at once.
+    """
+    now = _utcnow()
+    token = uuid.uuid4().hex
+
+    due_ids = db.session.query(SheetOutbox.id).filter(
+        SheetOutbox.status == 'pending',
+        SheetOutbox.next_attempt_at <= now
+    ).order_by(SheetOutbox.id).limit(batch_size).scalar_subquery()
+
+    SheetOutbox.query.filter(
+        SheetOutbox.id.in_(due_ids),
+        SheetOutbox.next_attempt_at <= now
+    ).update({
+        'claimed_by': token,
+        'next_attempt_at': now + timedelta(seconds=CLAIM_LEASE)
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return SheetOutbox.query.filter_by(claimed_by=token).order_by(SheetOutbox.id).all()
+
+
+def _backoff(attempts):
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _existing_records(entries):
+    """
+    (record_type, record_id) of the entries' records that still exist,
+    read from the database rather than the session's identity map
+    """
+    existing = set()
+    for record_type in {entry.record_type for entry in entries}:
+        model = _model_for(record_type)
+        ids = [entry.record_id for entry in entries if entry.record_type == record_type]
+        existing.update((record_type, record_id) for record_id, in db.session.query(model.id).filter(model.id.in_(ids)))
+    return existing
+
+
+def _drop_superseded(entries):
+    """
+    Delete the append entries whose record was deleted after they were
+    queued, and return the others
+
+    The statuses are reloaded, since enqueue_deletes() may have marked
+    entries after this worker claimed them.
+    """
+    appends = [entry for entry in entries if entry.op == 'append']
+    if not appends:
+        return entries
+    SheetOutbox.query.filter(SheetOutbox.id.in_([entry.id for entry in appends])).populate_existing().all()
+
+    existing = _existing_records(appends)
+    kept = []
+    for entry in entries:
+        if entry.op == 'append' and (entry.status == 'superseded' or (entry.record_type, entry.record_id) not in existing):
+            db.session.delete(entry)
+        else:
+            kept.append(entry)
+    return kept
+
+
+def _mark_failed(entries, error):
+    now = _utcnow()
+    for entry in _drop_superseded(entries):
+        entry.attempts += 1
+        entry.claimed_by = None
+        entry.last_error = str(error)[:255]
+        entry.next_attempt_at = now + timedelta(seconds=_backoff(entry.attempts))
+        if entry.attempts >= MAX_ATTEMPTS:
+            entry.status = 'failed'
+            logger.error(f"Giving up on sheet sync entry {entry.id} after {entry.attempts} attempts: {error}")
+
+
+def _process_deletes(entries):
+    payloads = [json.loads(entry.payload) for entry in entries]
+    gsheet.delete_attendance_rows(
+        [payload['key'] for payload in payloads],
+        fallback_rows={payload['key']: payload.get('row_id') for payload in payloads}
+    )
+    for entry in entries:
+        db.session.delete(entry)
+
+
+def _process_appends(entries):
+    row_ids = gsheet.append_attendance_rows([json.loads(entry.payload) for entry in entries])
+
+    if row_ids is not None:
+        # Save the Google Sheet row IDs on the records that still exist; a
+        # record deleted while its append was in flight may have had its
+        # delete processed already, so the new row is deleted once more
+        orphans = []
+        existing = _existing_records(entries)
+        for entry, row_id in zip(entries, row_ids):
+            if (entry.record_type, entry.record_id) not in existing:
+                orphans.append((entry, row_id))
+            elif row_id:
+                record = db.session.get(_model_for(entry.record_type), entry.record_id)
+                if record is not None:
+                    record.gsheet_row_id = row_id
+        now = _utcnow()
+        for entry, row_id in orphans:
+            db.session.add(SheetOutbox(
+                op='delete',
+                record_type=entry.record_type,
+                record_id=entry.record_id,
+                payload=json.dumps({'key': json.loads(entry.payload)['key'], 'row_id': row_id}),
+                created_at=now,
+                next_attempt_at=now
+            ))
+    else:
+        logger.warning("No worksheet available, dropping queued sheet appends")
+
+    for entry in entries:
+        db.session.delete(entry)
+
+
+def drain_once(batch_size=BATCH_SIZE):
+    """
+    Send one batch of queued operations to Google Sheets.
+
+    Deletes are applied before appends so that row numbers returned for the
+    appended rows are still valid once the batch is done. An append is never
+    retried once its record has been deleted, so a late retry cannot leave
+    a row behind for a record that no longer exists.
+
+    Returns:
+        int: Number of outbox entries processed (successfully or not)
+    """
+    entries = _claim_batch(batch_size)
+    if not entries:
+        return 0
+
+    # Appends of records deleted since they were queued are never sent
+    entries = _drop_superseded(entries)
+    db.session.commit()
+
+    deletes = [entry for entry in entries if entry.op == 'delete']
+    appends = [entry for entry in entries if entry.op == 'append']
+
+    for group, process in ((deletes, _process_deletes), (appends, _process_appends)):
+        if not group:
+            continue
+        try:
+            process(group)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error syncing {len(group)} entries to Google Sheets: {str(e)}")
+            _mark_failed(group, e)
+            db.session.commit()
+
+    return len(entries)
+
+
+def _run(app):
+    while True:
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                # Keep draining while full batches come back
+                while drain_once() >= BATCH_SIZE:
+                    pass
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Sheet sync worker error: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def start_worker(app):
+    """
+    Start the background thread that drains the outbox (once per process)
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return _worker
+        _worker = threading.Thread(target=_run, args=(app,), name='sheet-sync', daemon=True)
+        _worker.start()
+        return _worker
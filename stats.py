@@ -0,0 +1,171 @@
+import logging
+
+from sqlalchemy import event, func, delete, select, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import date_part
+from models import TeacherAttendance, StudentAttendance, TeacherMonthStats, StudentDayCount
+
+logger = logging.getLogger(__name__)
+
+# Counted under this shift_type: rows from before shift_type existed have none.
+# The reports count them as shifts without hours, as they always did.
+LEGACY_SHIFT = ''
+
+
+def insert_for(connection):
+    """
+    Dialect-specific INSERT supporting ON CONFLICT DO UPDATE
+    """
+    return postgresql.insert if connection.dialect.name == 'postgresql' else sqlite.insert
+
+
+def _upsert_teacher(connection, teacher_id, date, shift_type, delta):
+    insert = insert_for(connection)
+    stmt = insert(TeacherMonthStats).values(
+        teacher_id=teacher_id,
+        year=date.year,
+        month=date.month,
+        shift_type=shift_type,
+        shift_count=delta
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['teacher_id', 'year', 'month', 'shift_type'],
+        set_={'shift_count': TeacherMonthStats.shift_count + delta}
+    )
+    connection.execute(stmt)
+
+
+def _upsert_student(connection, date, delta):
+    insert = insert_for(connection)
+    stmt = insert(StudentDayCount).values(date=date, student_count=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['date'],
+        set_={'student_count': StudentDayCount.student_count + delta}
+    )
+    connection.execute(stmt)
+
+
+def _old_value(obj, name):
+    """
+    The value an attribute had before this flush
+    """
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, name)
+
+
+# Attributes each attendance row's counter is keyed on
+_KEY_FIELDS = {
+    TeacherAttendance: ('teacher_id', 'date', 'shift_type'),
+    StudentAttendance: ('date',)
+}
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history loads the old value of an expired attribute before it is
+# replaced, so the flush still knows which counter the row was under
+for _model, _fields in _KEY_FIELDS.items():
+    for _name in _fields:
+        event.listen(getattr(_model, _name), 'set', _keep_old_value, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_stats(session, flush_context):
+    """
+    Keep the statistics tables in step with attendance inserts, deletes and
+    edits.
+
+    Runs inside the flush, so the counters are committed (or rolled back)
+    together with the attendance rows themselves. An edit that moves a row
+    to another teacher, day or shift counts as a delete under the old values
+    and an insert under the new ones.
+    """
+    changes = [(obj, 1, getattr) for obj in session.new] + \
+        [(obj, -1, _old_value) for obj in session.deleted]
+    for obj in session.dirty:
+        fields = _KEY_FIELDS.get(type(obj))
+        if fields and any(inspect(obj).attrs[name].history.has_changes() for name in fields):
+            changes += [(obj, -1, _old_value), (obj, 1, getattr)]
+    if not changes:
+        return
+
+    teacher_deltas = {}
+    student_deltas = {}
+    for obj, delta, value in changes:
+        if isinstance(obj, TeacherAttendance):
+            shift_type = value(obj, 'shift_type')
+            key = (value(obj, 'teacher_id'), value(obj, 'date'), LEGACY_SHIFT if shift_type is None else shift_type)
+            teacher_deltas[key] = teacher_deltas.get(key, 0) + delta
+        elif isinstance(obj, StudentAttendance):
+            date = value(obj, 'date')
+            student_deltas[date] = student_deltas.get(date, 0) + delta
+
+    if not teacher_deltas and not student_deltas:
+        return
+
+    connection = session.connection()
+    for (teacher_id, date, shift_type), delta in teacher_deltas.items():
+        if delta:
+            _upsert_teacher(connection, teacher_id, date, shift_type, delta)
+    for date, delta in student_deltas.items():
+        if delta:
+            _upsert_student(connection, date, delta)
+
+
+def rebuild_stats(connection):
+    """
+    Recompute both statistics tables from the raw attendance rows.
+
+    Rows without a shift_type are counted under LEGACY_SHIFT.
+
+    Args:
+        connection: SQLAlchemy connection, inside a transaction
+
+    Returns:
+        tuple: (teacher/month rows, student/day rows) written
+    """
+    connection.execute(delete(TeacherMonthStats))
+    connection.execute(delete(StudentDayCount))
+
+    year = date_part('year', TeacherAttendance.date)
+    month = date_part('month', TeacherAttendance.date)
+    shift_type = func.coalesce(TeacherAttendance.shift_type, LEGACY_SHIFT)
+    teacher_rows = connection.execute(
+        select(
+            TeacherAttendance.teacher_id,
+            year,
+            month,
+            shift_type,
+            func.count(TeacherAttendance.id)
+        ).group_by(TeacherAttendance.teacher_id, year, month, shift_type)
+    ).all()
+
+    student_rows = connection.execute(
+        select(StudentAttendance.date, func.count(StudentAttendance.id)).
+        group_by(StudentAttendance.date)
+    ).all()
+
+    if teacher_rows:
+        connection.execute(TeacherMonthStats.__table__.insert(), [
+            {
+                'teacher_id': teacher_id,
+                'year': int(row_year),
+                'month': int(row_month),
+                'shift_type': shift_type,
+                'shift_count': count
+            }
+            for teacher_id, row_year, row_month, shift_type, count in teacher_rows
+        ])
+    if student_rows:
+        connection.execute(StudentDayCount.__table__.insert(), [
+            {'date': date, 'student_count': count} for date, count in student_rows
+        ])
+
+    logger.info(f"Rebuilt statistics: {len(teacher_rows)} teacher/month rows, {len(student_rows)} student/day rows")
+    return len(teacher_rows), len(student_rows)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['SHEET_SYNC_WORKER'] = '0'
+
+from app import create_app
+from extensions import db
+import report_cache
+import schedule
+import user_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'TESTING': True
+    })
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    # Process-wide caches must not leak between databases
+    schedule.invalidate()
+    report_cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
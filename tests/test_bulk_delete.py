@@ -0,0 +1,61 @@
+import json
+from datetime import date, time
+
+from werkzeug.security import generate_password_hash
+
+from conftest import login
+from extensions import db
+from models import User, Teacher, TeacherAttendance, Student, StudentAttendance, SheetOutbox
+
+DAY = date(2026, 1, 30)
+
+
+def _seed():
+    """
+    An admin, two teacher clock-ins and three student marks, all already on the sheet
+    """
+    user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+    teacher = Teacher(name='Cô An', active=True)
+    students = [Student(name=f'Bé {n}', active=True) for n in range(3)]
+    db.session.add_all([user, teacher] + students)
+    db.session.flush()
+
+    teacher_rows = [
+        TeacherAttendance(teacher_id=teacher.id, date=DAY, time=time(7), shift_type=shift_type,
+                          marked_by_id=user.id, gsheet_row_id=10 + n)
+        for n, shift_type in enumerate(('morning', 'afternoon'))
+    ]
+    student_rows = [
+        StudentAttendance(student_id=student.id, date=DAY, time=time(7, 30), marked_by_id=user.id, gsheet_row_id=20 + n)
+        for n, student in enumerate(students)
+    ]
+    db.session.add_all(teacher_rows + student_rows)
+    db.session.commit()
+    return user.id, [row.id for row in teacher_rows], [row.id for row in student_rows]
+
+
+def test_bulk_delete_queues_one_sheet_delete_per_row(app, client):
+    with app.app_context():
+        user_id, teacher_ids, student_ids = _seed()
+    login(client, user_id)
+
+    response = client.post('/admin/delete-attendance/bulk', json={
+        'teacher_ids': teacher_ids,
+        'student_ids': student_ids[:2] + [999]
+    })
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'deleted': {'teacher': teacher_ids, 'student': student_ids[:2]},
+        'not_found': {'teacher': [], 'student': [999]}
+    }
+
+    with app.app_context():
+        assert db.session.query(TeacherAttendance).count() == 0
+        assert [row.id for row in db.session.query(StudentAttendance)] == student_ids[2:]
+
+        deletes = db.session.query(SheetOutbox).filter_by(op='delete').order_by(SheetOutbox.id).all()
+        assert sorted((entry.record_type, entry.record_id) for entry in deletes) == sorted(
+            [('teacher', record_id) for record_id in teacher_ids] + [('student', record_id) for record_id in student_ids[:2]]
+        )
+        assert sorted(json.loads(entry.payload)['row_id'] for entry in deletes) == [10, 11, 20, 21]
+        assert all(entry.status == 'pending' for entry in deletes)
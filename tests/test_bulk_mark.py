@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+
+import attendance
+from conftest import login
+from extensions import db
+from models import User, Student, StudentAttendance, SheetOutbox
+
+FRIDAY = datetime(2026, 1, 30, 8, 0)
+SUNDAY = datetime(2026, 2, 1, 8, 0)
+
+
+def _freeze(monkeypatch, moment):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return tz.localize(moment)
+
+    monkeypatch.setattr(attendance, 'datetime', FrozenDatetime)
+
+
+@pytest.fixture
+def students(app, client):
+    """
+    An admin signed in and three students, the last one inactive
+    """
+    with app.app_context():
+        user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+        pupils = [Student(name='Bé Na', active=True), Student(name='Bé Bo', active=True), Student(name='Bé Ti', active=False)]
+        db.session.add_all([user] + pupils)
+        db.session.commit()
+        login(client, user.id)
+        return user.id, [student.id for student in pupils]
+
+
+def _post(client, student_ids):
+    response = client.post('/student/mark-attendance/bulk', json={'student_ids': student_ids})
+    return response.status_code, response.get_json()
+
+
+def _marked(app):
+    with app.app_context():
+        attendance_rows = db.session.scalars(select(StudentAttendance.student_id).where(StudentAttendance.date == FRIDAY.date())).all()
+        appends = db.session.scalars(select(SheetOutbox.record_id).where(SheetOutbox.op == 'append')).all()
+        return sorted(attendance_rows), len(appends)
+
+
+def test_duplicate_ids_are_marked_once(app, client, students, monkeypatch):
+    _freeze(monkeypatch, FRIDAY)
+    _, (first, second, _) = students
+
+    status, data = _post(client, [first, first, str(first), second])
+    assert status == 200
+    assert data['results'] == {str(first): 'marked', str(second): 'marked'}
+    assert _marked(app) == ([first, second], 2)
+
+
+def test_inactive_and_unknown_students_are_not_marked(app, client, students, monkeypatch):
+    _freeze(monkeypatch, FRIDAY)
+    _, (first, _, inactive) = students
+
+    status, data = _post(client, [first, inactive, 999])
+    assert status == 200
+    assert data['results'] == {str(first): 'marked', str(inactive): 'not_found', '999': 'not_found'}
+    assert _marked(app) == ([first], 1)
+
+
+def test_already_marked_students_are_reported(app, client, students, monkeypatch):
+    _freeze(monkeypatch, FRIDAY)
+    _, (first, second, _) = students
+    _post(client, [first])
+
+    status, data = _post(client, [first, second])
+    assert data['results'] == {str(first): 'already_marked', str(second): 'marked'}
+    assert _marked(app) == ([first, second], 2)
+
+
+def test_concurrent_mark_is_retried_as_already_marked(app, client, students, monkeypatch):
+    _freeze(monkeypatch, FRIDAY)
+    user_id, (first, second, _) = students
+
+    # Another request marks the first student between the lookup and the insert
+    pending = [first]
+
+    def concurrent_mark(session, flush_context, instances):
+        if not pending:
+            return
+        pending.pop()
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                'INSERT INTO student_attendance (student_id, marked_by_id, date, time) '
+                "VALUES (:student_id, :user_id, :date, '07:55:00')"
+            ), {'student_id': first, 'user_id': user_id, 'date': FRIDAY.date()})
+
+    event.listen(Session, 'before_flush', concurrent_mark)
+    try:
+        status, data = _post(client, [first, second])
+    finally:
+        event.remove(Session, 'before_flush', concurrent_mark)
+    assert status == 200
+    assert data['results'] == {str(first): 'already_marked', str(second): 'marked'}
+    # Only the student this request marked is sent to the sheet
+    assert _marked(app) == ([first, second], 1)
+
+
+def test_sunday_is_rejected(app, client, students, monkeypatch):
+    _freeze(monkeypatch, SUNDAY)
+    _, (first, _, _) = students
+
+    assert _post(client, [first]) == (400, {'error': 'sunday'})
+    with app.app_context():
+        assert db.session.query(StudentAttendance).count() == 0
@@ -0,0 +1,17 @@
+from werkzeug.security import generate_password_hash
+
+from conftest import login
+from extensions import db
+from models import User
+
+
+def test_csv_export_has_one_charset(app, client):
+    with app.app_context():
+        user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+        db.session.add(user)
+        db.session.commit()
+        login(client, user.id)
+
+    response = client.get('/admin/export/teachers', query_string={'format': 'csv'})
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/csv; charset=utf-8'
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import faces
+
+numpy = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+
+def _matrix(*values):
+    return numpy.array([[value] * faces.EMBEDDING_SIZE for value in values], numpy.float32)
+
+
+def test_rebuild_swaps_entries_and_matrix_together(tmp_path, monkeypatch):
+    monkeypatch.setattr(faces, 'FACE_INDEX_DIR', str(tmp_path))
+    monkeypatch.setattr(faces, '_index', None)
+
+    faces._publish(_matrix(1), [(1, 'a' * 16)])
+    first = faces._current_dir()
+    entries, matrix = faces.load_index()
+    assert entries == [(1, 'a' * 16)] and matrix[0][0] == 1
+
+    # Student 1 removed and student 2 added: same length, different rows
+    faces._publish(_matrix(2), [(2, 'b' * 16)])
+    entries, matrix = faces.load_index()
+    assert entries == [(2, 'b' * 16)] and matrix[0][0] == 2
+    # A reader that looked up the previous index can still open it whole
+    assert faces._read_index(first)[1] == [(1, 'a' * 16)]
+
+    faces._publish(_matrix(3), [(3, 'c' * 16)])
+    assert not os.path.exists(first)
+    assert len([name for name in os.listdir(tmp_path) if name.startswith('index-')]) == 2
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import gsheet
+
+
+def test_forget_rows_shifts_index_once_per_batch():
+    gsheet._row_index.clear()
+    gsheet._remember_rows(['GV-1', 'HS-2', 'GV-3', 'HS-4', 'GV-5', 'HS-6'], 2)
+
+    gsheet._forget_rows([6, 3, 4])
+
+    assert gsheet._row_index == {'GV-1': 2, 'HS-4': 3, 'HS-6': 4}
+    gsheet._row_index.clear()
+
+
+def test_expired_client_is_replaced_and_failures_retry(monkeypatch):
+    gspread = pytest.importorskip('gspread')
+    created = []
+
+    def service_account_from_dict(info, scopes):
+        if info.get('fail'):
+            raise RuntimeError('token endpoint unreachable')
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(gspread, 'service_account_from_dict', service_account_from_dict)
+    monkeypatch.setenv('GOOGLE_SHEETS_CREDS', json.dumps({'type': 'service_account'}))
+    gsheet.invalidate_cache()
+
+    first = gsheet.get_gspread_client()
+    assert gsheet.get_gspread_client() is first
+
+    gsheet._cache['authorized_at'] -= gsheet.CLIENT_MAX_AGE + 1
+    second = gsheet.get_gspread_client()
+    assert second is not first and len(created) == 2
+
+    # A failed refresh leaves nothing stale behind
+    monkeypatch.setenv('GOOGLE_SHEETS_CREDS', json.dumps({'type': 'service_account', 'fail': True}))
+    with pytest.raises(RuntimeError):
+        gsheet.get_gspread_client()
+    assert gsheet._cache['client'] is None
+    monkeypatch.setenv('GOOGLE_SHEETS_CREDS', json.dumps({'type': 'service_account'}))
+    assert gsheet.get_gspread_client() is created[-1] and len(created) == 3
+    gsheet.invalidate_cache()
+    gsheet._cache['creds_json'] = None
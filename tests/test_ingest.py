@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import ingest
+from conftest import login
+from extensions import db
+from models import User, Teacher, TeacherAttendance, Student, StudentAttendance, IngestEvent, SheetOutbox
+
+NOW = datetime(2026, 1, 30, 9, 0)
+
+
+@pytest.fixture(autouse=True)
+def frozen_now(monkeypatch):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return tz.localize(NOW)
+
+    monkeypatch.setattr(ingest, 'datetime', FrozenDatetime)
+
+
+def _seed():
+    """
+    A teacher's account and a student
+    """
+    user = User(name='Cô Lan', email='lan@example.com', password_hash=generate_password_hash('x'), is_admin=False)
+    db.session.add(user)
+    db.session.flush()
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True, user_id=user.id)
+    student = Student(name='Bé Na', active=True)
+    db.session.add_all([teacher, student])
+    db.session.commit()
+    return user.id, student.id
+
+
+def _post(client, events):
+    response = client.post('/api/attendance/events', json={'events': events})
+    return response.status_code, response.get_json()
+
+
+def test_replayed_batch_is_applied_once(app, client):
+    with app.app_context():
+        user_id, student_id = _seed()
+    login(client, user_id)
+    events = [
+        {'key': 'c1', 'type': 'clock_in', 'timestamp': '2026-01-30T07:00:00', 'shift_type': 'morning'},
+        {'key': 's1', 'type': 'mark_student', 'timestamp': '2026-01-30T07:05:00', 'student_id': student_id}
+    ]
+
+    assert _post(client, events) == (200, {'results': ['ok', 'ok']})
+    # A client that never saw the first response sends the same batch again
+    assert _post(client, events) == (200, {'results': ['ok', 'ok']})
+
+    with app.app_context():
+        assert db.session.query(TeacherAttendance).count() == 1
+        assert db.session.query(StudentAttendance).count() == 1
+        assert db.session.query(IngestEvent).count() == 2
+        assert db.session.query(SheetOutbox).filter_by(op='append').count() == 2
+
+
+def test_same_attendance_under_a_new_key_is_a_duplicate(app, client):
+    with app.app_context():
+        user_id, student_id = _seed()
+    login(client, user_id)
+    event = {'type': 'mark_student', 'timestamp': '2026-01-30T07:05:00', 'student_id': student_id}
+
+    assert _post(client, [dict(event, key='s1')]) == (200, {'results': ['ok']})
+    assert _post(client, [dict(event, key='s2')]) == (200, {'results': ['already_recorded']})
+
+    with app.app_context():
+        assert db.session.query(StudentAttendance).count() == 1
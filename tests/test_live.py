@@ -0,0 +1,88 @@
+import json
+
+from werkzeug.security import generate_password_hash
+
+import live
+from conftest import login
+from extensions import db
+from models import User, Student, StudentAttendance
+from utils import get_vietnam_time
+
+
+def _seed_student():
+    user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+    student = Student(name='Bé Na', active=True)
+    db.session.add_all([user, student])
+    db.session.commit()
+    return user.id, student.id
+
+
+def _mark(student_id, user_id):
+    now = get_vietnam_time()
+    record = StudentAttendance(student_id=student_id, date=now.date(), time=now.time(), marked_by_id=user_id)
+    db.session.add(record)
+    db.session.commit()
+    return record.id
+
+
+def test_events_reach_every_worker(app):
+    # Two brokers stand in for two gunicorn workers sharing the database
+    workers = [live.Broker(), live.Broker()]
+    with app.app_context():
+        user_id, student_id = _seed_student()
+        positions = []
+        for broker in workers:
+            broker.start(app)
+            positions.append(broker.parse(broker.position))
+        record_id = _mark(student_id, user_id)
+
+    for broker, after in zip(workers, positions):
+        frames, _ = broker.wait(after, timeout=5)
+        assert len(frames) == 1
+        assert 'event: student_marked' in frames[0]
+        assert json.loads(frames[0].split('data: ')[1])['id'] == record_id
+
+
+def test_rolled_back_changes_are_not_published(app):
+    with app.app_context():
+        user_id, student_id = _seed_student()
+        now = get_vietnam_time()
+        db.session.add(StudentAttendance(student_id=student_id, date=now.date(), time=now.time(), marked_by_id=user_id))
+        db.session.flush()
+        db.session.rollback()
+        assert db.session.query(live.LiveEvent).count() == 0
+
+
+def test_foreign_position_gets_snapshot(app, client, monkeypatch):
+    # A fresh broker, so no poller from another test's app is reused
+    monkeypatch.setattr(live, 'broker', live.Broker())
+    with app.app_context():
+        user_id, student_id = _seed_student()
+        record_id = _mark(student_id, user_id)
+    login(client, user_id)
+
+    response = client.get('/admin/dashboard/stream', query_string={'after': 'other-3'})
+    chunks = response.iter_encoded()
+    assert next(chunks).startswith(b'retry:')
+    snapshot = next(chunks).decode()
+    response.close()
+
+    assert snapshot.startswith('event: snapshot\n')
+    data = json.loads(snapshot.split('data: ')[1])
+    assert [record['id'] for record in data['student']] == [record_id]
+
+
+def test_failed_stream_setup_releases_its_slot(app, client, monkeypatch):
+    monkeypatch.setattr(live, 'broker', live.Broker())
+    with app.app_context():
+        user_id, _ = _seed_student()
+    login(client, user_id)
+
+    def broken_snapshot(today):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(live, 'snapshot', broken_snapshot)
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    for _ in range(live.MAX_STREAMS + 1):
+        assert client.get('/admin/dashboard/stream').status_code == 500
+    assert live.broker._streams == 0
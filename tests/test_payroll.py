@@ -0,0 +1,56 @@
+from datetime import date, time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import payroll
+from extensions import db
+from models import User, Teacher, TeacherAttendance, PayrollRun, PayrollLine
+
+
+@pytest.mark.skipif(payroll._numpy() is None, reason='numpy is not installed')
+def test_numpy_totals_match_loop(monkeypatch):
+    positions = [0, 0, 1, 2, 1, 0]
+    counts = [3, 7, 1, 12, 5, 2]
+    durations = [1.5, 3.0, 0.75, 4.0, 1.0, 2.25]
+    rates = [125000.0, 97500.5, 80000.0]
+
+    batched = payroll._totals(positions, counts, durations, rates)
+    monkeypatch.setattr(payroll, '_numpy', lambda: None)
+    looped = payroll._totals(positions, counts, durations, rates)
+
+    assert batched == looped
+    assert looped[0] == (12, 30.0, 3750000)
+
+
+def _committed_run():
+    user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True, hourly_rate=100000)
+    db.session.add_all([user, teacher])
+    db.session.flush()
+    db.session.add(TeacherAttendance(teacher_id=teacher.id, date=date(2026, 1, 5), time=time(7, 0),
+                                     shift_type='morning', marked_by_id=user.id))
+    run = payroll.create_payroll_run(date(2026, 1, 1), date(2026, 1, 31), created_by=user)
+    db.session.commit()
+    return run.id
+
+
+@pytest.mark.parametrize('model', [PayrollRun, PayrollLine])
+def test_committed_runs_cannot_be_deleted(app, model):
+    with app.app_context():
+        run_id = _committed_run()
+        obj = model.query.filter(getattr(model, 'id' if model is PayrollRun else 'run_id') == run_id).first()
+        db.session.delete(obj)
+        with pytest.raises(ValueError):
+            db.session.flush()
+        db.session.rollback()
+        assert PayrollRun.query.count() == 1 and PayrollLine.query.count() == 1
+
+
+def test_committed_runs_cannot_be_edited(app):
+    with app.app_context():
+        run = db.session.get(PayrollRun, _committed_run())
+        run.total_pay = 0
+        with pytest.raises(ValueError):
+            db.session.flush()
+        db.session.rollback()
@@ -0,0 +1,28 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import photos
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_concurrent_uploads_of_one_photo(tmp_path, monkeypatch):
+    monkeypatch.setattr(photos, 'PHOTO_DIR', str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), (200, 120, 40)).save(buffer, 'JPEG')
+    data = buffer.getvalue()
+
+    with ThreadPoolExecutor(4) as pool:
+        keys = set(pool.map(photos.process_photo, [data] * 8))
+
+    assert len(keys) == 1
+    names = sorted(os.listdir(tmp_path))
+    # No temporary files left behind, and every copy is a complete image
+    assert not [name for name in names if name.endswith('.tmp')]
+    assert len(names) == 5
+    for name in names:
+        with Image.open(tmp_path / name) as image:
+            image.verify()
@@ -0,0 +1,27 @@
+from werkzeug.security import generate_password_hash
+
+import report_cache
+from extensions import db
+from models import User, Student, StudentAttendance
+from utils import get_vietnam_time
+
+
+def test_version_bumped_after_commit_only(app):
+    with app.app_context():
+        user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+        student = Student(name='Bé Na', active=True)
+        db.session.add_all([user, student])
+        db.session.commit()
+        now = get_vietnam_time()
+        before = report_cache.period_versions(now.year, now.month)
+
+        db.session.add(StudentAttendance(student_id=student.id, date=now.date(), time=now.time(), marked_by_id=user.id))
+        db.session.flush()
+        # The writer's transaction does not touch the version row
+        assert report_cache.period_versions(now.year, now.month) == before
+        db.session.rollback()
+        assert report_cache.period_versions(now.year, now.month) == before
+
+        db.session.add(StudentAttendance(student_id=student.id, date=now.date(), time=now.time(), marked_by_id=user.id))
+        db.session.commit()
+        assert report_cache.period_versions(now.year, now.month) == (before[0] + 1, before[1])
@@ -0,0 +1,136 @@
+import time as time_module
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+import report_cache
+import schedule
+from conftest import login
+from extensions import db
+from models import User, Teacher, TeacherAttendance, Student, StudentAttendance, Shift
+
+SHIFTS = ('morning', 'afternoon', '1on1_1h')
+MONTH = {'year': 2026, 'month': 1}
+
+
+def _seed(records):
+    """
+    An admin, one teacher and `records` students, with `records` teacher
+    clock-ins and a mark for every student on every weekday of January 2026
+    """
+    admin = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True)
+    students = [Student(name=f'Học sinh {i}', active=True) for i in range(records)]
+    db.session.add_all([admin, teacher] + students)
+    db.session.flush()
+
+    days = [date(2026, 1, day) for day in range(1, 32) if date(2026, 1, day).weekday() != 6]
+    for i in range(records):
+        db.session.add(TeacherAttendance(
+            teacher_id=teacher.id, date=days[i // len(SHIFTS)], time=time(7, 0),
+            shift_type=SHIFTS[i % len(SHIFTS)], marked_by_id=admin.id
+        ))
+    for student in students:
+        for day in days:
+            db.session.add(StudentAttendance(student_id=student.id, date=day, time=time(7, 30), marked_by_id=admin.id))
+    db.session.commit()
+    return admin.id, teacher.id
+
+
+def _render(app, client, path):
+    """
+    GET path uncached; returns (response, number of queries)
+    """
+    count = 0
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+
+    report_cache.clear()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        response = client.get(path, query_string=MONTH)
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+    assert response.status_code == 200
+    return response, count
+
+
+@pytest.mark.parametrize('records', [3, 30])
+def test_teacher_report(app, client, records):
+    with app.app_context():
+        admin_id, teacher_id = _seed(records)
+    login(client, admin_id)
+    path = f'/admin/reports/teacher/{teacher_id}'
+    # The first request loads the shift schedule and the cached user
+    client.get(path, query_string=MONTH)
+
+    response, queries = _render(app, client, path)
+    page = response.get_data(as_text=True)
+    assert 'Cô Lan' in page
+    assert page.count('data-record-id=') == records
+    # Cache versions, the teacher and the month's attendance
+    assert queries == 3
+
+
+@pytest.mark.parametrize('records', [3, 30])
+def test_student_report(app, client, records):
+    with app.app_context():
+        admin_id, _ = _seed(records)
+    login(client, admin_id)
+    client.get('/admin/reports/students', query_string=MONTH)
+
+    response, queries = _render(app, client, '/admin/reports/students')
+    page = response.get_data(as_text=True)
+    assert page.count('data-student-id=') == records
+    assert page.count('27/27') == records
+    # Cache versions, the students and the month's marks with their markers
+    assert queries == 3
+
+
+@pytest.mark.parametrize('path', ['/admin/reports', '/admin/reports/teacher/{teacher_id}'])
+def test_shift_edit_invalidates_cached_reports(app, client, path):
+    with app.app_context():
+        admin_id, teacher_id = _seed(3)
+    login(client, admin_id)
+    path = path.format(teacher_id=teacher_id)
+
+    # morning 6h + afternoon 4.75h + 1-1 1h
+    assert '11.75' in client.get(path, query_string=MONTH).get_data(as_text=True)
+    with app.app_context():
+        shift = Shift.query.filter_by(code='morning').one()
+        shift.duration = 5
+        db.session.commit()
+    # Another worker's schedule is only reloaded after RELOAD_INTERVAL;
+    # the version bump must be enough
+    schedule._state['loaded_at'] = time_module.monotonic()
+
+    assert '10.75' in client.get(path, query_string=MONTH).get_data(as_text=True)
+
+
+def test_student_report_is_cached(app, client):
+    with app.app_context():
+        admin_id, _ = _seed(3)
+    login(client, admin_id)
+    client.get('/admin/reports/students', query_string=MONTH)
+
+    # Served from the cache: only the version lookup
+    count = 0
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        response = client.get('/admin/reports/students', query_string=MONTH)
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+    assert response.status_code == 200 and count == 1
@@ -0,0 +1,108 @@
+import json
+from datetime import date, time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import gsheet
+import sheet_sync
+from extensions import db
+from models import User, Teacher, TeacherAttendance, SheetOutbox
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    """
+    A fake worksheet: record key -> row values
+    """
+    rows = {}
+
+    def append(records):
+        for record in records:
+            rows[record['key']] = record
+        return [None] * len(records)
+
+    def delete(keys, fallback_rows=None):
+        for key in keys:
+            rows.pop(key, None)
+        return True
+
+    monkeypatch.setattr(gsheet, 'append_attendance_rows', append)
+    monkeypatch.setattr(gsheet, 'delete_attendance_rows', delete)
+    return rows
+
+
+def _clock_in():
+    user = User(name='Cô Lan', email='lan@example.com', password_hash=generate_password_hash('x'), is_admin=False)
+    db.session.add(user)
+    db.session.flush()
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True, user_id=user.id)
+    db.session.add(teacher)
+    db.session.flush()
+    record = TeacherAttendance(teacher_id=teacher.id, date=date(2026, 3, 2), time=time(7, 0),
+                               shift_type='morning', marked_by_id=user.id)
+    db.session.add(record)
+    db.session.flush()
+    sheet_sync.enqueue_append(record, '02/03/2026', '07:00', 'Cô Lan', 'Có mặt', 'morning', 'Cô Lan')
+    db.session.commit()
+    return record
+
+
+def _delete(record):
+    sheet_sync.enqueue_delete(record)
+    db.session.delete(record)
+    db.session.commit()
+
+
+def _drain():
+    SheetOutbox.query.update({'next_attempt_at': sheet_sync._utcnow()})
+    db.session.commit()
+    while sheet_sync.drain_once():
+        pass
+
+
+def test_failed_append_is_not_retried_after_delete(app, sheet):
+    with app.app_context():
+        record = _clock_in()
+        claimed = sheet_sync._claim_batch(10)
+        _delete(record)
+
+        # The worker's attempt fails after the delete was queued
+        sheet_sync._mark_failed(claimed, RuntimeError('503'))
+        db.session.commit()
+        _drain()
+
+        assert sheet == {}
+        assert SheetOutbox.query.count() == 0
+
+
+def test_append_landing_after_its_delete_is_removed(app, sheet, monkeypatch):
+    with app.app_context():
+        record = _clock_in()
+        key = gsheet.record_key('teacher', record.id)
+        append = gsheet.append_attendance_rows
+
+        def slow_append(records):
+            # The record is deleted, and its delete processed, mid-request
+            with app.app_context():
+                _delete(db.session.get(TeacherAttendance, record.id))
+                sheet_sync._process_deletes(SheetOutbox.query.filter_by(op='delete').all())
+                db.session.commit()
+            return append(records)
+
+        monkeypatch.setattr(gsheet, 'append_attendance_rows', slow_append)
+        sheet_sync.drain_once()
+        assert key in sheet
+
+        monkeypatch.setattr(gsheet, 'append_attendance_rows', append)
+        _drain()
+        assert sheet == {}
+        assert SheetOutbox.query.count() == 0
+
+
+def test_unclaimed_append_is_cancelled(app, sheet):
+    with app.app_context():
+        _delete(_clock_in())
+        assert SheetOutbox.query.count() == 0
+        _drain()
+        assert sheet == {}
@@ -0,0 +1,89 @@
+from datetime import date, time
+
+from sqlalchemy import select, text
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from migrations import _TEACHER_ATTENDANCE_DDL
+from models import User, Teacher, TeacherAttendance, Student, StudentAttendance, TeacherMonthStats, StudentDayCount
+from stats import LEGACY_SHIFT, rebuild_stats
+
+
+def _teacher_counts():
+    rows = db.session.execute(select(
+        TeacherMonthStats.teacher_id, TeacherMonthStats.month, TeacherMonthStats.shift_type, TeacherMonthStats.shift_count
+    )).all()
+    return {(teacher_id, month, shift_type): count for teacher_id, month, shift_type, count in rows if count}
+
+
+def _student_counts():
+    rows = db.session.execute(select(StudentDayCount.date, StudentDayCount.student_count)).all()
+    return {day: count for day, count in rows if count}
+
+
+def test_edited_teacher_row_moves_between_counters(app):
+    with app.app_context():
+        first, second = Teacher(name='Cô An', active=True), Teacher(name='Cô Bình', active=True)
+        db.session.add_all([first, second])
+        db.session.flush()
+        record = TeacherAttendance(teacher_id=first.id, date=date(2026, 1, 30), time=time(8), shift_type='morning')
+        db.session.add(record)
+        db.session.commit()
+        assert _teacher_counts() == {(first.id, 1, 'morning'): 1}
+
+        record.shift_type = 'afternoon'
+        db.session.commit()
+        assert _teacher_counts() == {(first.id, 1, 'afternoon'): 1}
+
+        record.teacher_id = second.id
+        record.date = date(2026, 2, 2)
+        db.session.commit()
+        assert _teacher_counts() == {(second.id, 2, 'afternoon'): 1}
+
+        # Other columns leave the counters alone
+        record.time = time(14)
+        db.session.commit()
+        assert _teacher_counts() == {(second.id, 2, 'afternoon'): 1}
+
+        db.session.delete(record)
+        db.session.commit()
+        assert _teacher_counts() == {}
+
+
+def test_edited_student_row_moves_between_days(app):
+    with app.app_context():
+        user = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+        student = Student(name='Bé Na', active=True)
+        db.session.add_all([user, student])
+        db.session.flush()
+        record = StudentAttendance(student_id=student.id, date=date(2026, 1, 30), time=time(8), marked_by_id=user.id)
+        db.session.add(record)
+        db.session.commit()
+
+        record.date = date(2026, 2, 2)
+        db.session.commit()
+        assert _student_counts() == {date(2026, 2, 2): 1}
+
+
+def test_rows_without_shift_type_are_counted(app):
+    with app.app_context():
+        # Databases from before shift_type keep the column nullable
+        db.session.execute(text('DROP TABLE teacher_attendance'))
+        db.session.execute(text(_TEACHER_ATTENDANCE_DDL))
+        teacher = Teacher(name='Cô An', active=True)
+        db.session.add(teacher)
+        db.session.commit()
+        db.session.execute(text(
+            "INSERT INTO teacher_attendance (teacher_id, date, time) VALUES (:teacher_id, '2026-01-30', '08:00:00')"
+        ), {'teacher_id': teacher.id})
+        db.session.add(TeacherAttendance(teacher_id=teacher.id, date=date(2026, 1, 30), time=time(14), shift_type='afternoon'))
+        db.session.commit()
+
+        rebuild_stats(db.session.connection())
+        db.session.commit()
+        assert _teacher_counts() == {(teacher.id, 1, 'afternoon'): 1, (teacher.id, 1, LEGACY_SHIFT): 1}
+
+        legacy = db.session.scalars(select(TeacherAttendance).where(TeacherAttendance.shift_type.is_(None))).one()
+        db.session.delete(legacy)
+        db.session.commit()
+        assert _teacher_counts() == {(teacher.id, 1, 'afternoon'): 1}
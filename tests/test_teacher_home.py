@@ -0,0 +1,84 @@
+from datetime import datetime, time
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from attendance import vietnam_tz
+from conftest import login
+from extensions import db
+from models import User, Teacher, TeacherAttendance, Shift
+from reports import month_range
+
+SHIFTS = ('morning', 'afternoon', '1on1_1h')
+
+
+def _seed_teacher(records):
+    """
+    One teacher with `records` clock-ins spread over the current month
+    """
+    user = User(name='Cô Lan', email='lan@example.com', password_hash=generate_password_hash('x'), is_admin=False)
+    db.session.add(user)
+    db.session.flush()
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True, user_id=user.id)
+    db.session.add(teacher)
+    db.session.flush()
+
+    first_day, last_day = month_range(*datetime.now(vietnam_tz).timetuple()[:2])
+    days = [day for day in (first_day.replace(day=n) for n in range(1, last_day.day + 1)) if day.weekday() != 6]
+    for i in range(records):
+        db.session.add(TeacherAttendance(
+            teacher_id=teacher.id, date=days[i // len(SHIFTS)], time=time(7, 0),
+            shift_type=SHIFTS[i % len(SHIFTS)], marked_by_id=user.id
+        ))
+    db.session.commit()
+    return user.id
+
+
+def _count_queries(app, client):
+    count = 0
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        response = client.get('/teacher/home')
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+    assert response.status_code == 200
+    return count
+
+
+@pytest.mark.parametrize('records', [3, 40])
+def test_teacher_home_query_count(app, client, records):
+    with app.app_context():
+        user_id = _seed_teacher(records)
+    login(client, user_id)
+
+    # The first request loads the shift schedule and the cached user
+    client.get('/teacher/home')
+
+    # ETag versions, this month's attendance and the students with today's
+    # marks; the count must not grow with the number of records
+    assert _count_queries(app, client) == 3
+
+
+def test_shift_edit_changes_etag(app, client):
+    with app.app_context():
+        user_id = _seed_teacher(3)
+    login(client, user_id)
+
+    etag = client.get('/teacher/home').headers['ETag']
+    assert client.get('/teacher/home', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        shift = Shift.query.filter_by(code='afternoon').one()
+        shift.duration = 4
+        db.session.commit()
+
+    response = client.get('/teacher/home', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
@@ -0,0 +1,66 @@
+from werkzeug.security import generate_password_hash
+
+from conftest import login
+from extensions import db
+from models import User, Teacher
+
+
+def _seed():
+    """
+    An admin and a teacher's account
+    """
+    admin = User(name='Admin', email='admin@example.com', password_hash=generate_password_hash('x'), is_admin=True)
+    user = User(name='Cô Lan', email='lan@example.com', password_hash=generate_password_hash('x'), is_admin=False)
+    db.session.add_all([admin, user])
+    db.session.flush()
+    teacher = Teacher(name='Cô Lan', email='lan@example.com', active=True, user_id=user.id)
+    db.session.add(teacher)
+    db.session.commit()
+    return admin.id, user.id, teacher.id
+
+
+def test_teacher_edit_reaches_the_next_request(app, client):
+    with app.app_context():
+        admin_id, user_id, teacher_id = _seed()
+    login(client, user_id)
+    # Caches the user and their teacher
+    assert 'Xin chào, Cô Lan' in client.get('/teacher/home').get_data(as_text=True)
+
+    admin = app.test_client()
+    login(admin, admin_id)
+    admin.post('/admin/teachers', data={
+        'action': 'edit', 'teacher_id': teacher_id, 'name': 'Cô Lan Anh', 'email': 'lan@example.com'
+    })
+
+    assert 'Xin chào, Cô Lan Anh' in client.get('/teacher/home').get_data(as_text=True)
+
+
+def test_revoked_admin_is_refused_on_the_next_request(app, client):
+    with app.app_context():
+        admin_id, _, _ = _seed()
+    login(client, admin_id)
+    assert client.get('/admin/reports').status_code == 200
+
+    with app.app_context():
+        db.session.get(User, admin_id).is_admin = False
+        db.session.commit()
+
+    response = client.get('/admin/reports')
+    assert response.status_code == 302
+    assert response.location.endswith('/teacher/home')
+
+
+def test_deleted_user_is_signed_out(app, client):
+    with app.app_context():
+        _, user_id, teacher_id = _seed()
+    login(client, user_id)
+    assert client.get('/teacher/home').status_code == 200
+
+    with app.app_context():
+        db.session.get(Teacher, teacher_id).user_id = None
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+    response = client.get('/teacher/home')
+    assert response.status_code == 302
+    assert '/login' in response.location
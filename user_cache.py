@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+
+from extensions import db
+from models import User, Teacher
+
+# Other workers see user/teacher edits within this many seconds
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+MAX_ENTRIES = 1024
+
+_lock = threading.Lock()
+_cache = {}  # user_id -> (expires_at, detached User with its Teacher loaded)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def _load(user_id):
+    user = db.session.query(User).options(joinedload(User.teacher)).filter(User.id == user_id).first()
+    if user is None:
+        return None
+
+    # Keep a private detached copy; the request's own session would expire
+    # it on commit
+    if user.teacher is not None:
+        db.session.expunge(user.teacher)
+    db.session.expunge(user)
+    return user
+
+
+def load_user(user_id):
+    """
+    User for Flask-Login's user_loader, from a short-lived process cache.
+
+    The cached User (with its Teacher already loaded) is attached to the
+    request's session with merge(load=False), which copies its state
+    without querying, so an authenticated request costs no queries for
+    the user or current_user.teacher while the entry is fresh.
+
+    Returns:
+        User or None
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+    if entry is None or entry[0] < now:
+        cached = _load(user_id)
+        if cached is None:
+            return None
+        with _lock:
+            if len(_cache) >= MAX_ENTRIES:
+                _cache.clear()
+            _cache[user_id] = (now + USER_CACHE_TTL, cached)
+    else:
+        cached = entry[1]
+
+    # The merge cascades to the loaded teacher, so it is attached as well
+    return db.session.merge(cached, load=False)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_user_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (User, Teacher)):
+            session.info['user_cache_stale'] = True
+            # Drop now as well, so that no request caches the old row
+            # between this flush and the commit
+            clear()
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('user_cache_stale', False):
+        clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('user_cache_stale', None)
@@ -4,3 +4,16 @@ import pytz
 def get_vietnam_time():
     vietnam_tz = pytz.timezone('Asia/Ho_Chi_Minh')
     return datetime.datetime.now(vietnam_tz)
+
+# Vietnamese display names of the shift types
+SHIFT_NAMES_VI = {
+    "morning": "Sáng",
+    "afternoon": "Chiều",
+    "1on1_1h": "1-1 (1 giờ)",
+    "1on1_1.5h": "1-1 (1.5 giờ)",
+    "1on1_2h": "1-1 (2 giờ)",
+    "Học sinh": "Học sinh"
+}
+
+def shift_name_vi(shift_type):
+    return SHIFT_NAMES_VI.get(shift_type, shift_type)